@@ -1,73 +1,37 @@
-import os
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+import time
 
-from dotenv import load_dotenv
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 
 from backend.database import db
-from backend.models import TokenData, User
-
-load_dotenv()
+from backend.models import User
+from backend.services.auth.tokens import TokenError, token_service
+from backend.services.auth.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-SECRET_KEY = os.environ.get("SECRET_KEY", "default_secret_key")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 480
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 
 async def get_user(email: str):
-    user_doc = await db.users.find_one({"email": email})
-    if user_doc:
-        return User(**user_doc)
-    return None
+    return await user_cache.get(db, email)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+async def get_current_user(response: Response, token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    started = time.perf_counter()
+    # Verified tokens and users are cached briefly; see TokenService and UserCache
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: Optional[str] = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
-    if token_data.email is None:
+        email = token_service.verify_access(token)
+    except TokenError:
         raise credentials_exception
         
-    user = await get_user(email=token_data.email)
+    user = await get_user(email=email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    elapsed = time.perf_counter() - started
+    user_cache.observe(elapsed)
+    response.headers["Server-Timing"] = f"auth;dur={elapsed * 1000:.2f}"
+    return user
@@ -0,0 +1,54 @@
+"""
+Benchmark chunk embedding storage formats: BSON size and decode time.
+
+Encodes synthetic 384-dim embeddings as complete document_chunks documents in
+every supported format, then times BSON decoding plus conversion into the
+float32 matrix the vector index consumes.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.embedding_storage_bench [--chunks 1000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import bson
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.utils.embedding_codec import EMBEDDING_FORMATS, decode_embeddings, encode_embedding  # noqa: E402
+
+DIM = 384
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.chunks, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(f"{args.chunks} chunks x {DIM} dims")
+    print(f"{'format':>8} {'bytes/chunk':>12} {'decode ms':>10} {'max abs err':>12}")
+    for fmt in EMBEDDING_FORMATS:
+        raw_docs = [
+            bson.encode({"document_id": "doc", "chunk_index": i, **encode_embedding(v, fmt)})
+            for i, v in enumerate(vectors)
+        ]
+        size = sum(len(d) for d in raw_docs) / len(raw_docs)
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            matrix = decode_embeddings(bson.decode(d) for d in raw_docs)
+            best = min(best, time.perf_counter() - started)
+        err = float(np.max(np.abs(matrix - vectors)))
+        print(f"{fmt:>8} {size:>12.0f} {best * 1000:>10.2f} {err:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
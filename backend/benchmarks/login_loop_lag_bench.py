@@ -0,0 +1,85 @@
+"""
+Event-loop lag during a burst of concurrent logins.
+
+Runs N bcrypt verifications concurrently, the way N /login requests would,
+while a ticker task measures how late the event loop wakes it up. "inline"
+verifies inside the coroutine as the login handler used to; "pool" awaits
+PasswordHasher.verify, which runs bcrypt on its bounded thread pool.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.login_loop_lag_bench [--logins 20] [--rounds 12] [--workers 2]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.auth.hashing import PasswordHasher  # noqa: E402
+
+PASSWORD = "Correct-Horse-42!"
+TICK_SECONDS = 0.005
+
+
+async def measure_lag(run_logins) -> dict:
+    """Run the logins while sampling how late a 5 ms ticker is scheduled."""
+    loop = asyncio.get_running_loop()
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            expected = loop.time() + TICK_SECONDS
+            await asyncio.sleep(TICK_SECONDS)
+            lags.append(max(0.0, loop.time() - expected))
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK_SECONDS * 2)
+    started = time.perf_counter()
+    await run_logins()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick_task
+    lags_ms = np.asarray(lags) * 1000
+    return {
+        "total_ms": elapsed * 1000,
+        "lag_p50_ms": float(np.percentile(lags_ms, 50)),
+        "lag_p95_ms": float(np.percentile(lags_ms, 95)),
+        "lag_max_ms": float(lags_ms.max()),
+    }
+
+
+async def run(args) -> None:
+    hasher = PasswordHasher(rounds=args.rounds, max_workers=args.workers)
+    hashed = hasher.context.hash(PASSWORD)
+
+    async def inline_login():
+        # What the handler did before: bcrypt on the event loop thread
+        hasher.context.verify_and_update(PASSWORD, hashed)
+
+    async def pooled_login():
+        await hasher.verify(PASSWORD, hashed)
+
+    print(f"{args.logins} concurrent logins, bcrypt cost {args.rounds}, {args.workers} hashing threads")
+    print(f"{'mode':>8} {'total ms':>10} {'lag p50':>9} {'lag p95':>9} {'lag max':>9}")
+    for name, login in (("inline", inline_login), ("pool", pooled_login)):
+        result = await measure_lag(lambda: asyncio.gather(*(login() for _ in range(args.logins))))
+        print(f"{name:>8} {result['total_ms']:>10.0f} {result['lag_p50_ms']:>9.1f} "
+              f"{result['lag_p95_ms']:>9.1f} {result['lag_max_ms']:>9.1f}")
+    hasher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
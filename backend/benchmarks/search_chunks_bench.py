@@ -0,0 +1,90 @@
+"""
+Micro-benchmark for the RAG scoring path (similarity, recency boost, MMR).
+
+Compares the per-chunk Python loop that search_chunks used to run against the
+vectorized rank_chunks on synthetic 384-dim embeddings.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.search_chunks_bench [--sizes 1000 10000 100000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.utils.similarity import MAX_BOOST, MMR_LAMBDA, RECENT_DAYS, rank_chunks  # noqa: E402
+
+DIM = 384
+
+
+def legacy_rank(query_vec, embeddings, age_days, top_k=5, threshold=0.7):
+    """The previous per-chunk implementation, kept here as the baseline."""
+    candidates = []
+    for i, row in enumerate(embeddings):
+        chunk_vec = np.array(row, dtype=float)
+        base_sim = float(np.dot(chunk_vec, query_vec) / (np.linalg.norm(chunk_vec) * np.linalg.norm(query_vec)))
+        if base_sim < threshold:
+            continue
+        recency_factor = max(0.0, 1.0 - min(age_days[i] / RECENT_DAYS, 1.0))
+        candidates.append((i, base_sim * (1.0 + MAX_BOOST * recency_factor), chunk_vec))
+    if not candidates:
+        return []
+    pool = sorted(candidates, key=lambda x: x[1], reverse=True)[:max(top_k * 4, top_k)]
+    selected = [pool.pop(0)]
+
+    def cosine_sim(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    while pool and len(selected) < top_k:
+        scores = [
+            MMR_LAMBDA * cand[1] - (1.0 - MMR_LAMBDA) * max(cosine_sim(cand[2], s[2]) for s in selected)
+            for cand in pool
+        ]
+        selected.append(pool.pop(int(np.argmax(scores))))
+    return [(i, sim) for i, sim, _ in selected]
+
+
+def make_corpus(n: int, rng: np.random.Generator):
+    query = rng.standard_normal(DIM).astype(np.float32)
+    # Mix of near-duplicates of the query (above threshold) and unrelated chunks
+    noise_scale = rng.uniform(0.3, 3.0, size=(n, 1)).astype(np.float32)
+    embeddings = query + noise_scale * rng.standard_normal((n, DIM)).astype(np.float32) * 0.1
+    age_days = rng.uniform(0, 14, size=n).astype(np.float32)
+    return query, embeddings, age_days
+
+
+def time_call(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the vectorized path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'vectorized ms':>14} {'legacy ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        query, embeddings, age_days = make_corpus(n, rng)
+        vec_ms = time_call(lambda: rank_chunks(query, embeddings, age_days), args.repeat)
+        if args.skip_legacy:
+            print(f"{n:>8} {vec_ms:>14.2f} {'-':>10} {'-':>8}")
+            continue
+        rows = embeddings.tolist()  # the legacy path received Mongo float lists
+        legacy_ms = time_call(lambda: legacy_rank(query, rows, age_days), 1)
+        print(f"{n:>8} {vec_ms:>14.2f} {legacy_ms:>10.1f} {legacy_ms / vec_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput of issuing and verifying access tokens.
+
+Compares jose called with the secret as a plain string (what backend/auth.py
+and the /chat handler did) against TokenService, which constructs the HMAC key
+once, and against TokenService's verified-token cache (a token reused within
+a request burst).
+
+Usage (from the repository root):
+    python -m backend.benchmarks.token_bench [--count 5000]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from jose import jwt
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from backend.services.auth.tokens import ALGORITHM, TokenService  # noqa: E402
+
+SECRET = "benchmark-secret-key-that-is-long-enough-0123456789"
+
+
+def ops_per_second(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5000)
+    args = parser.parse_args()
+
+    service = TokenService(secret_key=SECRET)
+    emails = [f"user{i}@example.com" for i in range(args.count)]
+    expire = datetime.now(timezone.utc) + timedelta(minutes=30)
+
+    def legacy_issue(email):
+        return jwt.encode({"sub": email, "exp": expire}, SECRET, algorithm=ALGORITHM)
+
+    legacy_tokens = [legacy_issue(email) for email in emails]
+    service_tokens = [service.create_access_token(email) for email in emails]
+
+    rows = [
+        ("issue", "jose + str key", ops_per_second(legacy_issue, emails)),
+        ("issue", "TokenService", ops_per_second(service.create_access_token, emails)),
+        ("verify", "jose + str key",
+         ops_per_second(lambda t: jwt.decode(t, SECRET, algorithms=[ALGORITHM]), legacy_tokens)),
+        # First pass: every token is decoded and its signature checked
+        ("verify", "TokenService", ops_per_second(service.verify_access, service_tokens)),
+        # Same tokens again: answered by the verified-token cache
+        ("verify", "TokenService cached", ops_per_second(service.verify_access, service_tokens)),
+    ]
+
+    print(f"{'op':>7} {'implementation':>20} {'ops/s':>10}")
+    for op, name, rate in rows:
+        print(f"{op:>7} {name:>20} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,11 +42,38 @@ class AppConfig(BaseSettings):
         min_length=1,
         description="Required database name"
     )
+    mongo_startup_ping_timeout_seconds: float = Field(
+        default=5.0,
+        description="How long startup waits for MongoDB before skipping index setup"
+    )
     
     # Authentication settings
     access_token_expire_minutes: int = Field(default=30)
     refresh_token_expire_days: int = Field(default=7)
+    refresh_token_reuse_grace_seconds: float = Field(
+        default=30.0,
+        description="How long the previous refresh token of a login may still refresh (tabs racing); later it revokes the login"
+    )
     password_min_length: int = Field(default=12)
+    bcrypt_rounds: int = Field(
+        default=12,
+        ge=4,
+        le=31,
+        description="bcrypt cost factor; stored hashes with another cost are rehashed at the next login"
+    )
+    password_hash_workers: int = Field(
+        default=2,
+        description="Threads that run bcrypt; bounds how many cores logins can take at once"
+    )
+    auth_user_cache_max_entries: int = Field(default=10000)
+    auth_user_cache_ttl_seconds: float = Field(
+        default=60.0,
+        description="How long an authenticated user's record is reused without reading Mongo"
+    )
+    auth_token_cache_max_entries: int = Field(
+        default=10000,
+        description="Decoded access tokens kept in memory (each at most until it expires)"
+    )
     
     # Search settings
     web_search: dict = Field(
@@ -59,6 +86,57 @@ class AppConfig(BaseSettings):
         },
         description="Web search configuration"
     )
+    web_search_cache_max_entries: int = Field(default=512)
+    web_search_cache_default_ttl_seconds: float = Field(default=600.0)
+    web_search_cache_ttls: dict = Field(
+        default={"duckduckgo": 600, "brave": 900, "sougou": 600},
+        description="Seconds results from each engine stay cached (JSON object in env)"
+    )
+    web_search_cache_negative_ttl_seconds: float = Field(
+        default=30.0,
+        description="How long an empty result is cached, so a failing upstream is not retried per request"
+    )
+    web_search_env_watch_interval_seconds: float = Field(
+        default=5.0,
+        description="How often backend/.env is checked for web search setting changes (0 disables)"
+    )
+    web_search_cache_mongo: bool = Field(
+        default=False,
+        description="Also keep cached results in the web_search_cache collection, shared by all workers"
+    )
+    web_search_deadline_seconds: float = Field(
+        default=6.0,
+        description="Overall time budget for a web search; engines still running then are cancelled"
+    )
+    web_search_blocking_workers: int = Field(
+        default=4,
+        description="Threads for search engines whose SDK has no async client (Sougou)"
+    )
+    web_fetch_enabled: bool = Field(
+        default=False,
+        description="Fetch the top web results and give the LLM their best-matching passages, not just snippets"
+    )
+    web_fetch_top_n: int = Field(default=3, description="How many search results to fetch")
+    web_fetch_passages: int = Field(default=4, description="Passages from fetched pages added to the prompt")
+    web_fetch_min_similarity: float = Field(default=0.3)
+    web_fetch_max_bytes: int = Field(default=1_000_000, description="Bytes read from a page before it is cut off")
+    web_fetch_timeout_seconds: float = Field(default=5.0)
+    web_fetch_deadline_seconds: float = Field(
+        default=6.0,
+        description="Overall time for fetching and ranking pages; the prompt goes without excerpts after that"
+    )
+    web_fetch_max_connections: int = Field(default=16)
+    web_fetch_per_host_connections: int = Field(default=2)
+    web_fetch_cache_max_pages: int = Field(default=256)
+    web_fetch_cache_ttl_seconds: float = Field(default=86400.0)
+    web_fetch_revalidate_seconds: float = Field(
+        default=600.0,
+        description="Cached pages older than this are revalidated with their ETag/Last-Modified"
+    )
+    web_fetch_allow_private_hosts: bool = Field(
+        default=False,
+        description="Allow fetching (and redirects to) loopback, private and link-local addresses"
+    )
     
     # LLM settings
     llm_base_url: Optional[str] = Field(
@@ -73,9 +151,132 @@ class AppConfig(BaseSettings):
     llm_request_timeout_seconds: int = Field(default=60)
     llm_max_retries: int = Field(default=2)
     llm_retry_backoff_seconds: float = Field(default=0.75)
+    llm_pool_max_connections: int = Field(
+        default=100,
+        description="Maximum concurrent connections per LLM endpoint client"
+    )
+    llm_pool_max_keepalive_connections: int = Field(
+        default=20,
+        description="Idle keep-alive connections retained per LLM endpoint client"
+    )
+    llm_pool_keepalive_expiry_seconds: float = Field(default=30.0)
+    llm_http2: bool = Field(
+        default=True,
+        description="Negotiate HTTP/2 with LLM endpoints when the h2 package is installed"
+    )
+    llm_circuit_failure_threshold: int = Field(
+        default=3,
+        description="Consecutive failures before an LLM endpoint's circuit opens"
+    )
+    llm_circuit_cooldown_seconds: float = Field(
+        default=15.0,
+        description="Time an open circuit waits before it is probed again"
+    )
+    llm_health_probe_interval_seconds: float = Field(default=5.0)
     http_proxy: Optional[str] = Field(default=None)
     https_proxy: Optional[str] = Field(default=None)
     
+    # Embedding settings
+    embedding_workers: int = Field(
+        default=1,
+        description="Threads running SentenceTransformer inference off the event loop"
+    )
+    embedding_max_queue: int = Field(
+        default=64,
+        description="Maximum embedding jobs queued or running before callers wait"
+    )
+    embedding_batch_size: int = Field(
+        default=32,
+        description="Texts per encode job; large uploads are split so queries can interleave"
+    )
+    embedding_batch_window_ms: float = Field(
+        default=5.0,
+        description="How long concurrent query embeddings are gathered into one encode call"
+    )
+    embedding_batch_max_size: int = Field(
+        default=32,
+        description="Flush a coalesced query batch early once it reaches this many texts"
+    )
+    embedding_storage_format: str = Field(
+        default="float32",
+        description="How chunk embeddings are stored in Mongo: list, float32, float16 or int8"
+    )
+    embedding_warmup: bool = Field(
+        default=False,
+        description="Load the embedding model during startup instead of on first use"
+    )
+    
+    # Chat settings
+    chat_context_cache_max_conversations: int = Field(
+        default=1000,
+        description="Conversations whose cleaned LLM history is kept in memory"
+    )
+    chat_context_cache_ttl_seconds: float = Field(default=1800.0)
+    chat_context_token_budget: int = Field(
+        default=6000,
+        description="Prompt tokens sent to the LLM per turn; older turns are replaced by a summary"
+    )
+    chat_summary_enabled: bool = Field(
+        default=True,
+        description="Summarize turns that fall outside the token budget in the background"
+    )
+    chat_summary_max_tokens: int = Field(default=400)
+    chat_tokenizer_path: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parent / "models" / "all-MiniLM-L6-v2" / "tokenizer.json",
+        description="Local tokenizer.json used to count prompt tokens (falls back to an estimate if missing)"
+    )
+    
+    # Document ingestion settings
+    document_ttl_hours: int = Field(default=24, description="Uploaded documents expire after this many hours")
+    document_max_upload_mb: int = Field(default=50)
+    document_ingest_batch_size: int = Field(
+        default=64,
+        description="Chunks inserted and embedded together while a document streams in"
+    )
+    document_extract_workers: int = Field(
+        default=0,
+        description="Text extraction processes (0 = one per CPU core, up to 4)"
+    )
+    document_extract_timeout_seconds: float = Field(
+        default=120.0,
+        description="Worker time allowed per extraction job (a PDF page range, or a whole DOCX/XLSX)"
+    )
+    document_extract_max_memory_mb: int = Field(
+        default=1024,
+        description="Address-space cap per extraction process (0 disables the cap)"
+    )
+    document_pdf_pages_per_task: int = Field(
+        default=16,
+        description="PDF pages extracted per process-pool task; ranges run in parallel"
+    )
+    document_cache_max_files: int = Field(
+        default=64,
+        description="Extracted files (text and chunk list) kept in memory, keyed by content hash"
+    )
+    embedding_cache_max_entries: int = Field(
+        default=20000,
+        description="Chunk embeddings kept in memory, keyed by chunk text hash (~1.5KB each)"
+    )
+    
+    # Vector index settings
+    vector_index_dir: Path = Field(
+        default_factory=lambda: Path(__file__).resolve().parent.parent / "data" / "vector_index",
+        description="Directory where per-user vector index partitions are persisted"
+    )
+    vector_index_ivf_min_size: int = Field(
+        default=20000,
+        description="Partitions with at least this many chunks are searched through an IVF index"
+    )
+    vector_index_nprobe: int = Field(default=8)
+    vector_index_reconcile_seconds: float = Field(
+        default=30.0,
+        description="How old a worker's copy of a partition may get before it is re-checked against Mongo"
+    )
+    vector_index_flush_seconds: float = Field(
+        default=10.0,
+        description="How long after a change a partition's file is rewritten; changes in between share one write"
+    )
+    
     # Path configurations
     base_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parent.parent)
     log_dir: Path = Field(default_factory=lambda: Path(__file__).resolve().parent.parent / "logs")
@@ -86,6 +287,13 @@ class AppConfig(BaseSettings):
             raise ValueError("Password minimum length must be at least 8")
         return v
     
+    @field_validator("embedding_storage_format")
+    def validate_embedding_storage_format(cls, v: str) -> str:
+        v = v.lower()
+        if v not in ("list", "float32", "float16", "int8"):
+            raise ValueError("Embedding storage format must be one of: list, float32, float16, int8")
+        return v
+    
     def model_post_init(self, __context) -> None:
         """Validate required fields after initialization"""
         if not self.secret_key:
@@ -1,5 +1,11 @@
+import asyncio
 import os
+from typing import List, NamedTuple, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
+from backend.config import config
+from backend.services.chat.context_cache import conversation_context_cache
+from backend.services.auth.sessions import refresh_sessions
+from backend.services.auth.user_cache import user_cache
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -23,8 +29,9 @@ async def get_db():
 
 async def delete_user(user_email: str):
     # Find all conversations belonging to the user
-    user_conversations = db.conversations.find({"user_email": user_email})
-    conversation_ids = [conv["_id"] async for conv in user_conversations]
+    user_conversations = db.conversations.find({"user_email": user_email}, {"id": 1})
+    # Messages reference the conversation's "id" field, not its Mongo _id
+    conversation_ids = [conv["id"] async for conv in user_conversations]
 
     # Delete all messages associated with these conversations
     if conversation_ids:
@@ -32,28 +39,90 @@ async def delete_user(user_email: str):
 
     # Delete all conversations belonging to the user
     await db.conversations.delete_many({"user_email": user_email})
+    conversation_context_cache.invalidate(conversation_ids)
 
     # Delete the user document
     await db.users.delete_one({"email": user_email})
+    user_cache.invalidate(user_email)
+    await refresh_sessions.revoke_user(db, user_email)
 
 def close_mongo_connection():
     client.close()
 
-async def init_vector_index():
-    """Initialize vector index for document embeddings if supported."""
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, int]]
+    name: str
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None  # TTL index: delete once the date field is this old
+
+
+# Every index the application relies on; ensure_indexes() applies them at startup and
+# `python -m backend.manage index-report` compares them with what the server has and uses.
+INDEXES: List[IndexSpec] = [
+    IndexSpec("users", [("email", 1)], "users_email", unique=True),
+    IndexSpec("users", [("id", 1)], "users_id", unique=True),
+    IndexSpec("refresh_tokens", [("token", 1)], "refresh_tokens_token", unique=True),
+    IndexSpec("refresh_tokens", [("expires_at", 1)], "refresh_tokens_ttl", expire_after_seconds=0),
+    IndexSpec("refresh_sessions", [("email", 1)], "refresh_sessions_email"),
+    IndexSpec("refresh_sessions", [("expires_at", 1)], "refresh_sessions_ttl", expire_after_seconds=0),
+    IndexSpec("conversations", [("id", 1)], "conversations_id", unique=True),
+    IndexSpec("conversations", [("user_email", 1), ("last_updated", -1), ("id", -1)], "conversations_user_recent"),
+    IndexSpec("messages", [("conversation_id", 1), ("timestamp", 1), ("id", 1)], "messages_conversation_timeline"),
+    IndexSpec("documents", [("user_email", 1), ("created_at", -1)], "documents_user_recent"),
+    IndexSpec("documents", [("conversation_id", 1), ("created_at", -1)], "documents_conversation_recent"),
+    IndexSpec("documents", [("content_hash", 1)], "documents_content_hash", sparse=True),
+    IndexSpec("documents", [("expires_at", 1)], "documents_ttl", expire_after_seconds=0),
+    IndexSpec("document_chunks", [("document_id", 1), ("chunk_index", 1)], "document_chunks_document_order"),
+    IndexSpec("document_chunks", [("expires_at", 1)], "document_chunks_ttl", expire_after_seconds=0),
+    IndexSpec("web_search_cache", [("expires_at", 1)], "web_search_cache_ttl", expire_after_seconds=0),
+]
+
+# Indexes created by earlier versions that must not be kept around
+LEGACY_INDEXES: List[Tuple[str, str]] = [
+    # 2dsphere over 384-dim arrays: cannot serve similarity search and rejects non-geo inserts.
+    # Embeddings are searched by backend.services.embeddings.vector_index instead.
+    ("document_chunks", "embedding_vector_idx"),
+    # Superseded by the named registry entries above
+    ("documents", "content_hash_1"),
+    ("conversations", "user_email_1_last_updated_-1_id_-1"),
+    ("messages", "conversation_id_1_timestamp_1_id_1"),
+]
+
+
+async def ensure_indexes() -> bool:
+    """Drop legacy indexes and create every index in INDEXES that does not exist yet.
+
+    A failing index (e.g. duplicate emails blocking a unique index) is reported
+    and skipped so the server still starts. Mongo is pinged first: when it is
+    unreachable the walk is skipped (returns False) rather than waiting out the
+    server selection timeout once per index.
+    """
+    db = await get_db()
     try:
-        db = await get_db()
-        # Check if index already exists
-        indexes = await db.document_chunks.list_indexes().to_list(100)  # Arbitrary high number to get all indexes
-        index_names = [index['name'] for index in indexes]
-        if 'embedding_vector_idx' not in index_names:
-            # Create a vector index for embeddings (assuming MongoDB Atlas or compatible)
-            await db.document_chunks.create_index(
-                [("embedding", "2dsphere")],
-                name="embedding_vector_idx"
-            )
-            print("Vector index created on document_chunks.embedding")
-        else:
-            print("Vector index already exists on document_chunks.embedding")
+        await asyncio.wait_for(db.command("ping"), config.mongo_startup_ping_timeout_seconds)
     except Exception as e:
-        print(f"Error creating vector index: {str(e)}. Vector search may not be supported.")
\ No newline at end of file
+        print(f"Skipping index setup, MongoDB is unreachable: {e!r}")
+        return False
+    for collection, name in LEGACY_INDEXES:
+        try:
+            existing = await db[collection].index_information()
+            if name in existing:
+                await db[collection].drop_index(name)
+                print(f"Dropped legacy index {collection}.{name}")
+        except Exception as e:
+            print(f"Error dropping legacy index {collection}.{name}: {str(e)}")
+    for spec in INDEXES:
+        options = {"name": spec.name}
+        if spec.unique:
+            options["unique"] = True
+        if spec.sparse:
+            options["sparse"] = True
+        if spec.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = spec.expire_after_seconds
+        try:
+            await db[spec.collection].create_index(spec.keys, **options)
+        except Exception as e:
+            print(f"Error creating index {spec.collection}.{spec.name}: {str(e)}")
+    return True
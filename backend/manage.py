@@ -0,0 +1,120 @@
+"""
+Maintenance commands for the ShiancoChat backend.
+
+Usage (from the repository root):
+    python -m backend.manage migrate-embeddings [--format float32] [--batch-size 500] [--dry-run]
+    python -m backend.manage ensure-indexes
+    python -m backend.manage index-report
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from backend.config import config  # noqa: E402
+from backend.database import INDEXES, db, close_mongo_connection, ensure_indexes  # noqa: E402
+from backend.utils.embedding_codec import EMBEDDING_FORMATS, decode_embedding, encode_embedding  # noqa: E402
+
+
+async def migrate_embeddings(fmt: str, batch_size: int, dry_run: bool) -> None:
+    """Re-encode every stored chunk embedding that is not already in ``fmt``."""
+    query = {"embedding": {"$ne": None}, "embedding_format": {"$ne": fmt}}
+    if fmt == "list":
+        # Legacy chunks have no embedding_format but are already float lists
+        query = {"embedding": {"$type": "binData"}, "embedding_format": {"$ne": fmt}}
+    pending = await db.document_chunks.count_documents(query)
+    print(f"{pending} chunk embeddings to convert to '{fmt}'")
+    if dry_run or not pending:
+        return
+
+    converted = 0
+    operations = []
+    cursor = db.document_chunks.find(query, {"embedding": 1, "embedding_format": 1, "embedding_scale": 1})
+    async for chunk in cursor:
+        vector = decode_embedding(chunk)
+        operations.append(UpdateOne({"_id": chunk["_id"]}, {"$set": encode_embedding(vector, fmt)}))
+        if len(operations) >= batch_size:
+            await db.document_chunks.bulk_write(operations, ordered=False)
+            converted += len(operations)
+            operations = []
+            print(f"  converted {converted}/{pending}")
+    if operations:
+        await db.document_chunks.bulk_write(operations, ordered=False)
+        converted += len(operations)
+    print(f"Converted {converted} chunk embeddings to '{fmt}'")
+
+
+async def index_report() -> None:
+    """Compare the index registry with the server and show per-index usage from $indexStats.
+
+    Usage counters reset when mongod restarts, so "unused" means unused since
+    the ``since`` timestamp printed next to it.
+    """
+    expected = {}
+    for spec in INDEXES:
+        expected.setdefault(spec.collection, {})[spec.name] = spec
+    collections = sorted(set(expected) | set(await db.list_collection_names()))
+
+    missing, unexpected, unused = [], [], []
+    for collection in collections:
+        stats = {
+            s["name"]: s
+            async for s in db[collection].aggregate([{"$indexStats": {}}])
+        }
+        print(f"{collection}:")
+        for name, s in sorted(stats.items()):
+            ops = s["accesses"]["ops"]
+            since = s["accesses"]["since"]
+            marker = "" if name == "_id_" or name in expected.get(collection, {}) else "  [not in registry]"
+            print(f"  {name:<40} {ops:>10} ops since {since:%Y-%m-%d %H:%M}{marker}")
+            if name == "_id_":
+                continue
+            if name not in expected.get(collection, {}):
+                unexpected.append(f"{collection}.{name}")
+            # TTL indexes are used by the TTL monitor, which $indexStats does not count
+            elif ops == 0 and expected[collection][name].expire_after_seconds is None:
+                unused.append(f"{collection}.{name}")
+        for name in expected.get(collection, {}):
+            if name not in stats:
+                missing.append(f"{collection}.{name}")
+                print(f"  {name:<40} {'MISSING':>10}")
+
+    print()
+    print(f"Missing ({len(missing)}): {', '.join(missing) or '-'}")
+    print(f"Not in registry ({len(unexpected)}): {', '.join(unexpected) or '-'}")
+    print(f"Unused ({len(unused)}): {', '.join(unused) or '-'}")
+    if missing:
+        print("Run `python -m backend.manage ensure-indexes` (or restart the server) to create missing indexes.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate-embeddings", help="Convert stored chunk embeddings to another format")
+    migrate.add_argument("--format", choices=EMBEDDING_FORMATS, default=config.embedding_storage_format)
+    migrate.add_argument("--batch-size", type=int, default=500)
+    migrate.add_argument("--dry-run", action="store_true", help="Only count the chunks that would change")
+
+    subparsers.add_parser("ensure-indexes", help="Create registry indexes and drop legacy ones")
+    subparsers.add_parser("index-report", help="Report missing, unregistered and unused indexes")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "migrate-embeddings":
+            asyncio.run(migrate_embeddings(args.format, args.batch_size, args.dry_run))
+        elif args.command == "ensure-indexes":
+            if not asyncio.run(ensure_indexes()):
+                sys.exit(1)
+        elif args.command == "index-report":
+            asyncio.run(index_report())
+    finally:
+        close_mongo_connection()
+
+
+if __name__ == "__main__":
+    main()
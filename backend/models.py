@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Union
 import uuid
 from datetime import datetime
 from enum import Enum
@@ -71,6 +71,7 @@ class Message(BaseModel):
     citations: Optional[List[dict]] = None
     web_search_state: Optional[str] = None
     rag_state: Optional[str] = None
+    partial: Optional[bool] = None  # stream ended before the reply was complete
 
 class Conversation(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -79,6 +80,21 @@ class Conversation(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     last_updated: datetime = Field(default_factory=datetime.utcnow)
 
+class ConversationSummary(BaseModel):
+    """Sidebar listing entry; omits the owner, which is always the requesting user"""
+    id: str
+    title: str
+    created_at: datetime
+    last_updated: datetime
+
+class ConversationPage(BaseModel):
+    items: List[ConversationSummary]
+    next_cursor: Optional[str] = None
+
+class MessagePage(BaseModel):
+    items: List[Message]
+    next_cursor: Optional[str] = None
+
 class UpdateConversationTitleRequest(BaseModel):
     new_title: str
 
@@ -103,7 +119,6 @@ class StreamRequestPayload(BaseModel):
     model: str # Model is required to know which LLM to call
     web_search_enabled: Optional[bool] = False
     rag_enabled: Optional[bool] = False
-    token: Optional[str] = None
 class TitleGenerationRequest(BaseModel):
     model: str
 
@@ -112,8 +127,11 @@ class DocumentChunk(BaseModel):
     document_id: str
     chunk_index: int
     content: str
-    embedding: Optional[List[float]] = None
+    embedding: Optional[Union[List[float], bytes]] = None  # float list or packed BinData
+    embedding_format: Optional[str] = None  # list, float32, float16 or int8
+    embedding_scale: Optional[float] = None  # int8 dequantization factor
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None  # copied from the document; drives the TTL index
 
 class Document(BaseModel):
     """Model for storing uploaded documents and their extracted text"""
@@ -125,4 +143,10 @@ class Document(BaseModel):
     expires_at: datetime
     conversation_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    chunk_count: int = 0
\ No newline at end of file
+    size_bytes: Optional[int] = None
+    content_hash: Optional[str] = None  # sha256 of the uploaded bytes, used to reuse earlier uploads
+    status: str = "processing"  # processing, ready or failed
+    segments_processed: int = 0  # pages / sheet blocks extracted so far
+    chunk_count: int = 0
+    embedded_count: int = 0
+    ingest_error: Optional[str] = None
\ No newline at end of file
@@ -1,18 +1,16 @@
-from datetime import timedelta
-from backend.services.auth.tokens import (
-    create_access_token,
-    create_refresh_token,
-    verify_password
-)
+from datetime import timezone
+from backend.services.auth.sessions import refresh_sessions
+from backend.services.auth.tokens import TokenError, token_service
+from backend.services.auth.hashing import password_hasher
 from backend.services.auth.users import UserService
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from backend.auth import get_current_user
+from backend.auth import get_current_user, get_user
+from backend.database import db
 from fastapi import Body
 from backend.models import User, UserCreate, Token, UserUpdate, UserPublic
-from backend.config import config as settings
 from pydantic import BaseModel
 
 class RefreshToken(BaseModel):
@@ -47,18 +45,22 @@ async def register(request: Request, form_data: UserCreate):
 @limiter.limit("5/minute")
 async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     user = await UserService.get_user(form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        # bcrypt runs on the hashing pool; the event loop keeps serving other requests meanwhile
+        valid, new_hash = await password_hasher.verify(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    refresh_token, expires_at = create_refresh_token()
-    await UserService.store_refresh_token(user.email, refresh_token, expires_at)
+    if new_hash:
+        # Stored with a different BCRYPT_ROUNDS; upgrade while we have the plaintext
+        await UserService.set_password_hash(user.email, new_hash)
+    access_token = token_service.create_access_token(user.email)
+    family, expires_at = await refresh_sessions.start(db, user.email)
+    refresh_token, _ = token_service.create_refresh_token(user.email, family, expires_at)
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -68,19 +70,56 @@ async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequ
 @router.post("/refresh", response_model=Token)
 @limiter.limit("5/minute")
 async def refresh_access_token(request: Request, refresh: RefreshToken = Body(...)):
-    token_data = await UserService.validate_refresh_token(refresh.refresh_token)
-    if not token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": token_data.email}, expires_delta=access_token_expires
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        claims = token_service.verify_refresh(refresh.refresh_token)
+    except TokenError:
+        raise invalid_token
+
+    if claims is None:
+        # Issued before refresh tokens were self-contained; those are still recorded in Mongo
+        token_data = await UserService.validate_refresh_token(refresh.refresh_token)
+        if not token_data:
+            raise invalid_token
+        await UserService.revoke_refresh_token(refresh.refresh_token)
+        email = token_data.email
+        family, _ = await refresh_sessions.start(db, email)
+        new_refresh_token, _ = token_service.create_refresh_token(
+            email, family, token_data.expires_at.replace(tzinfo=timezone.utc)
+        )
+    else:
+        # Only the newest token of a login may refresh; an older one revokes the login
+        generation = await refresh_sessions.advance(db, claims)
+        if generation is None:
+            raise invalid_token
+        email = claims.email
+        new_refresh_token, _ = token_service.rotate_refresh_token(claims, generation)
+
+    # A deleted account cannot refresh; this is normally answered by the user cache
+    if await get_user(email) is None:
+        raise invalid_token
+
+    access_token = token_service.create_access_token(email)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": new_refresh_token}
+
+
+@router.post("/logout")
+async def logout(refresh: RefreshToken = Body(...)):
+    # Access tokens are not tracked: one already issued stays valid until it expires
+    try:
+        claims = token_service.verify_refresh(refresh.refresh_token)
+    except TokenError:
+        # Already expired or not ours; there is nothing left to end
+        return {"status": "success"}
+    if claims is None:
+        await UserService.revoke_refresh_token(refresh.refresh_token)
+    else:
+        await refresh_sessions.revoke(db, claims.family)
+    return {"status": "success"}
 
 
 @router.get("/users/me", response_model=UserPublic)
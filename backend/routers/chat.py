@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from backend.database import get_db
-from backend.models import Message, MessageSavePayload, Conversation, ConversationCreate, UpdateConversationTitleRequest, User, TitleGenerationRequest
+from backend.models import Message, MessageSavePayload, Conversation, ConversationCreate, ConversationPage, MessagePage, UpdateConversationTitleRequest, User, TitleGenerationRequest
+from backend.utils.pagination import encode_cursor, keyset_filter
+from backend.services.chat.context_cache import conversation_context_cache
+from backend.services.chat.replies import store_message
 from datetime import datetime, timezone
 from backend import auth # Import auth module for get_current_user
 
@@ -25,32 +28,61 @@ async def create_new_chat(
     await db.conversations.insert_one(new_conversation.dict())
     return new_conversation
 
-@router.get("/conversations", response_model=List[Conversation])
+CONVERSATION_LIST_PROJECTION = {"_id": 0, "id": 1, "title": 1, "created_at": 1, "last_updated": 1}
+
+@router.get("/conversations", response_model=ConversationPage)
 async def fetch_conversations(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     current_user: User = Depends(auth.get_current_user),
     db=Depends(get_db)
 ):
     """
-    Fetches all conversations for the current user.
+    Fetches one page of the current user's conversations, most recently updated first.
+    Pass the returned next_cursor to get the following page; it is null on the last page.
     """
-    conversations = await db.conversations.find({"user_email": current_user.email}).sort("last_updated", -1).to_list(1000)
-    return [Conversation(**conv) for conv in conversations]
+    query = {"user_email": current_user.email}
+    if cursor:
+        query.update(keyset_filter("last_updated", cursor, descending=True))
+    # One extra row tells us whether another page exists
+    conversations = await db.conversations.find(query, CONVERSATION_LIST_PROJECTION).sort(
+        [("last_updated", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(conversations) > limit:
+        conversations = conversations[:limit]
+        next_cursor = encode_cursor(conversations[-1]["last_updated"], conversations[-1]["id"])
+    return {"items": conversations, "next_cursor": next_cursor}
 
-@router.get("/conversations/{conversation_id}/messages", response_model=List[Message])
+@router.get("/conversations/{conversation_id}/messages", response_model=MessagePage)
 async def fetch_messages_for_conversation(
     conversation_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=500),
     current_user: User = Depends(auth.get_current_user),
     db=Depends(get_db)
 ):
     """
-    Fetches messages for a specific conversation, ensuring it belongs to the current user.
+    Fetches one page of messages for a specific conversation, oldest first, ensuring it belongs to the current user.
+    Pass the returned next_cursor to get the following page; it is null on the last page.
     """
-    conversation = await db.conversations.find_one({"id": conversation_id, "user_email": current_user.email})
+    conversation = await db.conversations.find_one(
+        {"id": conversation_id, "user_email": current_user.email}, {"_id": 1}
+    )
     if not conversation:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found or not owned by user")
     
-    messages = await db.messages.find({"conversation_id": conversation_id}).sort("timestamp", 1).to_list(1000)
-    return [Message(**msg) for msg in messages]
+    query = {"conversation_id": conversation_id}
+    if cursor:
+        query.update(keyset_filter("timestamp", cursor, descending=False))
+    messages = await db.messages.find(query, {"_id": 0, "clean_text": 0}).sort(
+        [("timestamp", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1]["timestamp"], messages[-1]["id"])
+    return {"items": messages, "next_cursor": next_cursor}
 
 @router.post("/messages", response_model=Message)
 async def save_message(
@@ -76,15 +108,8 @@ async def save_message(
         web_search_state=message_data.web_search_state,
         rag_state=message_data.rag_state,
     )
-    
-    await db.messages.insert_one(new_message.dict())
-    
-    # Also update the conversation's last_updated timestamp
-    await db.conversations.update_one(
-        {"id": new_message.conversation_id},
-        {"$set": {"last_updated": new_message.timestamp}}
-    )
-    
+    # Also updates the conversation's last_updated timestamp
+    await store_message(db, new_message)
     return new_message
 
 @router.put("/conversations/{conversation_id}", response_model=Conversation)
@@ -124,6 +149,7 @@ async def delete_conversation(
     
     await db.messages.delete_many({"conversation_id": conversation_id})
     await db.conversations.delete_one({"id": conversation_id})
+    conversation_context_cache.invalidate([conversation_id])
     return
 
 @router.post("/conversations/{conversation_id}/generate-title")
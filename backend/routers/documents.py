@@ -1,28 +1,19 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks, Form
 from fastapi.responses import JSONResponse
 import os
-import tempfile
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import Optional, cast
+from typing import Optional
 from pydantic import BaseModel
 from pathlib import Path
 from datetime import datetime, timedelta
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from backend.models import Document, DocumentChunk, User
 from backend.database import get_db
 from backend.auth import get_current_user
+from backend.services.documents.extraction import SUPPORTED_EXTENSIONS
+from backend.services.documents.ingestion import ingest_document, spool_upload
+from backend.services.embeddings.vector_index import vector_index
+from backend.config import config
 import uuid
 
-# Initialize embedding model
-model_path = os.path.join(os.path.dirname(__file__), '..', 'models', 'all-MiniLM-L6-v2')
-embedding_model = SentenceTransformer(model_path)
-
-# Python 3.12-friendly document extractors
-from pypdf import PdfReader
-from docx import Document as DocxDocument
-from openpyxl import load_workbook
-
 import logging
 logger = logging.getLogger(__name__)
 
@@ -35,7 +26,7 @@ router = APIRouter(
 logger.info("Documents router initialized")
 
 # Document expires after 24 hours by default
-DOCUMENT_TTL_HOURS = 24
+DOCUMENT_TTL_HOURS = config.document_ttl_hours
 
 class DocumentResponse(BaseModel):
     filename: str
@@ -44,6 +35,15 @@ class DocumentResponse(BaseModel):
     document_id: str
     expires_at: datetime
 
+class DocumentStatusResponse(BaseModel):
+    document_id: str
+    status: str
+    size_bytes: Optional[int] = None
+    segments_processed: int = 0
+    chunk_count: int = 0
+    embedded_count: int = 0
+    error: Optional[str] = None
+
 class DocumentReference(BaseModel):
     conversation_id: str
     document_id: str
@@ -69,6 +69,8 @@ async def save_document_reference(document_ref: DocumentReference):
             "content_type": document_ref.content_type
         }}
     )
+    if existing.get("user_email"):
+        await vector_index.set_conversation(existing["user_email"], document_ref.document_id, document_ref.conversation_id)
     
     return {"status": "success", "document_id": document_ref.document_id}
 
@@ -79,134 +81,84 @@ async def upload_file(
     current_user: User = Depends(get_current_user),
     conversation_id: Optional[str] = Form(None)
 ):
-    """Handle file upload and text extraction"""
-    tmp_file_path = None  # Initialize before try block
+    """Accept an upload and ingest it in the background; poll /{document_id}/status for progress"""
     # Validate file type
     if not file.filename:
         raise HTTPException(status_code=400, detail="No filename provided")
     
     filepath = Path(file.filename)
     ext = filepath.suffix.lower()
-    if ext not in ['.pdf', '.docx', '.txt', '.xlsx']:
+    if ext not in SUPPORTED_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Unsupported file type")
     
+    # Spool to disk in fixed-size reads instead of holding the whole upload in memory
+    tmp_file_path, size_bytes, content_hash = await spool_upload(file, ext, config.document_max_upload_mb * 1024 * 1024)
     try:
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_file:
-            content = await file.read()
-            if len(content) > 10 * 1024 * 1024:  # 10MB limit
-                raise HTTPException(status_code=400, detail="File too large (max 10MB)")
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
-        # Extract text using Python 3.12-compatible libraries
-        def extract_text_from_file(path: str, ext: str) -> str:
-            try:
-                if ext == '.pdf':
-                    text_parts = []
-                    reader = PdfReader(path)
-                    for page in reader.pages:
-                        page_text = page.extract_text() or ''
-                        if page_text:
-                            text_parts.append(page_text)
-                    return '\n'.join(text_parts)
-                elif ext == '.docx':
-                    doc = DocxDocument(path)
-                    paras = [p.text for p in doc.paragraphs if p.text]
-                    # Extract text from tables as well
-                    for table in getattr(doc, 'tables', []):
-                        for row in table.rows:
-                            paras.append('\t'.join(cell.text for cell in row.cells))
-                    return '\n'.join(paras)
-                elif ext == '.xlsx':
-                    wb = load_workbook(path, data_only=True)
-                    lines = []
-                    for ws in wb.worksheets:
-                        for row in ws.iter_rows(values_only=True):
-                            str_vals = [str(v) for v in row if isinstance(v, (str, int, float)) and v is not None]
-                            if str_vals:
-                                lines.append('\t'.join(str_vals))
-                    return '\n'.join(lines)
-                elif ext == '.txt':
-                    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                        return f.read()
-                else:
-                    return ''
-            except Exception:
-                # Fallthrough on any parsing error
-                return ''
-
-        text = extract_text_from_file(tmp_file_path, ext)
-        if not text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from the uploaded file.")
-        
-        # Chunk text for better handling
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        chunks = text_splitter.split_text(text)
-        
-        # Create document record
+        # Create document record; chunks are added batch by batch as the file is extracted
         document_id = str(uuid.uuid4())
-        expires_at = datetime.utcnow() + timedelta(hours=DOCUMENT_TTL_HOURS)
+        created_at = datetime.utcnow()
+        expires_at = created_at + timedelta(hours=DOCUMENT_TTL_HOURS)
         db = await get_db()
-
-        # Store document and chunks without embeddings first
         document = {
             "_id": document_id,
             "filename": file.filename,
             "user_email": current_user.email,
-            "content": text,
+            "content": "",
             "content_type": file.content_type or "application/octet-stream",
             "expires_at": expires_at,
             "conversation_id": conversation_id,
-            "created_at": datetime.utcnow(),
-            "chunk_count": len(chunks)
+            "created_at": created_at,
+            "size_bytes": size_bytes,
+            "content_hash": content_hash,
+            "status": "processing",
+            "segments_processed": 0,
+            "chunk_count": 0,
+            "embedded_count": 0,
         }
-
-        # Insert document and then chunks (embeddings to be added in background)
         await db.documents.insert_one(document)
-        if chunks:
-            await db.document_chunks.insert_many([
-                {
-                    "document_id": document_id,
-                    "chunk_index": i,
-                    "content": chunk,
-                    "embedding": None,
-                    "created_at": datetime.utcnow()
-                } for i, chunk in enumerate(chunks)
-            ])
-        
-        # Schedule background task for embedding computation
-        if background_tasks:
-            background_tasks.add_task(compute_embeddings, db, document_id, chunks)
-        else:
-            logger.warning("BackgroundTasks not provided, embeddings will not be computed in background")
-        
-        # Clean up
-        os.unlink(tmp_file_path)
-        
-        return JSONResponse({
-            "filename": file.filename,
-            "content": text,
-            "content_type": file.content_type,
-            "document_id": document_id,
-            "expires_at": expires_at.isoformat()
-        })
-        
     except Exception as e:
-        # Clean up if error occurs
-        if tmp_file_path and os.path.exists(tmp_file_path):
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
+        os.unlink(tmp_file_path)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing file: {str(e)}"
         )
 
+    # The ingestion task owns the temp file from here on
+    background_tasks.add_task(
+        ingest_document, db, document_id, tmp_file_path, ext, current_user.email, created_at, expires_at,
+        content_hash
+    )
+    
+    return JSONResponse({
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "document_id": document_id,
+        "expires_at": expires_at.isoformat(),
+        "size_bytes": size_bytes,
+        "status": "processing"
+    })
+
+@router.get("/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(document_id: str, current_user: User = Depends(get_current_user)):
+    """Report ingestion progress for an uploaded document"""
+    db = await get_db()
+    doc = await db.documents.find_one(
+        {"_id": document_id, "user_email": current_user.email},
+        {"status": 1, "size_bytes": 1, "segments_processed": 1, "chunk_count": 1, "embedded_count": 1, "ingest_error": 1}
+    )
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return DocumentStatusResponse(
+        document_id=doc["_id"],
+        # Documents uploaded before streaming ingestion have no status and were processed inline
+        status=doc.get("status", "ready"),
+        size_bytes=doc.get("size_bytes"),
+        segments_processed=doc.get("segments_processed", 0),
+        chunk_count=doc.get("chunk_count", 0),
+        embedded_count=doc.get("embedded_count", 0),
+        error=doc.get("ingest_error")
+    )
+
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(document_id: str, current_user: User = Depends(get_current_user)):
     """Fetch a document by ID for the current user"""
@@ -231,6 +183,7 @@ async def delete_document(document_id: str, current_user: User = Depends(get_cur
     # Only delete chunks if the document delete actually occurred
     if result.deleted_count:
         await db.document_chunks.delete_many({"document_id": document_id})
+        await vector_index.remove_documents(current_user.email, [document_id])
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -255,27 +208,11 @@ async def cleanup_documents():
     # Delete documents and their chunks
     await db.documents.delete_many({"_id": {"$in": doc_ids}})
     await db.document_chunks.delete_many({"document_id": {"$in": doc_ids}})
+    docs_by_user = {}
+    for doc in expired_docs:
+        if doc.get("user_email"):
+            docs_by_user.setdefault(doc["user_email"], []).append(doc["_id"])
+    for user_email, user_doc_ids in docs_by_user.items():
+        await vector_index.remove_documents(user_email, user_doc_ids)
     
     return {"status": "success", "deleted": len(doc_ids)}
-
-async def compute_embeddings(db, document_id: str, chunks: list):
-    """Background task to compute and update chunk embeddings"""
-    try:
-        # Encode all chunks in a single batch for efficiency, returning numpy array.
-        embeddings = cast(np.ndarray, embedding_model.encode(chunks, convert_to_tensor=False))
-        # The result is a 2D numpy array, convert to list of 1D lists.
-        chunk_embeddings = embeddings.tolist()
-        
-        # Update chunks with embeddings
-        from pymongo import UpdateOne
-        operations = [
-            UpdateOne(
-                {"document_id": document_id, "chunk_index": i},
-                {"$set": {"embedding": embedding}}
-            ) for i, embedding in enumerate(chunk_embeddings)
-        ]
-        
-        if operations:
-            await db.document_chunks.bulk_write(operations)
-    except Exception as e:
-        logger.error(f"Error in background embedding task: {str(e)}")
\ No newline at end of file
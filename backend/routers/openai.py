@@ -2,25 +2,50 @@ import os
 import httpx
 import asyncio
 import json
-from urllib.parse import urlparse
 import logging
-import re
+import time
 from datetime import datetime
-from fastapi import APIRouter, Depends, Request
+from typing import Dict, List, NamedTuple, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import StreamingResponse
 from starlette.requests import ClientDisconnect
-from backend.models import StreamRequestPayload
+from backend.models import StreamRequestPayload, User
 from backend.database import get_db
 from backend.utils.web_search.main import perform_web_search
+from backend.utils.web_search.fetcher import web_page_fetcher
+from backend.utils.web_search.models import SearchResult
 from backend.utils.rag import embed_query, search_chunks
-from jose import jwt, JWTError
-from backend.auth import SECRET_KEY, ALGORITHM
+from backend.auth import get_current_user
+from backend.services.llm.client_pool import llm_client_pool, get_llm_endpoints
+from backend.services.llm.endpoint_router import endpoint_router, is_endpoint_failure
+from backend.services.chat.context_cache import conversation_context_cache
+from backend.services.chat.context_window import ContextUsage, context_window
+from backend.services.chat.replies import StreamedReply, reply_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 from backend.config import config
 
+
+class PreparedPrompt(NamedTuple):
+    search_results: List[SearchResult]
+    search_context: Optional[str]
+    rag_context: str
+    rag_chunks: Optional[List[dict]]
+    history: List[Dict[str, str]]
+    usage: ContextUsage
+
+def _error_detail(body: bytes) -> str:
+    """The message of an OpenAI-style error body, on one line so it fits an SSE data field."""
+    text = body[:4096].decode("utf-8", errors="replace")
+    try:
+        error = json.loads(text).get("error")
+        text = error.get("message", text) if isinstance(error, dict) else str(error or text)
+    except (ValueError, AttributeError):
+        pass
+    return " ".join(text.split())[:500]
+
 def should_use_web_search(query: str) -> bool:
     """
     Determines if web search should be triggered based on the user's query.
@@ -67,25 +92,31 @@ def should_use_web_search(query: str) -> bool:
 
     return False
 
+# Ownership check and the fields the context window needs, in one read
+CONVERSATION_CONTEXT_PROJECTION = {"_id": 0, "id": 1, "context_summary": 1, "context_summary_covers": 1}
+
 @router.post("/chat")
-async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Depends(get_db)):
+async def chat_with_openai(
+    input: StreamRequestPayload,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db=Depends(get_db)
+):
     payload = {
         "model": input.model,
         "messages": [],
         "stream": True,
     }
 
-    if input.conversation_id:
-        messages_cursor = db.messages.find({"conversation_id": input.conversation_id}).sort("timestamp", 1)
-        async for msg_doc in messages_cursor:
-            role = 'assistant' if msg_doc["sender"] in ['ai', 'assistant'] else msg_doc["sender"]
-            content = msg_doc["text"]
-            if role == 'assistant':
-                clean_content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
-                clean_content = re.sub(r'<answer>|</answer>', '', clean_content, flags=re.DOTALL).strip()
-                content = clean_content
-            if content:
-                payload["messages"].append({"role": role, "content": content})
+    conversation = await db.conversations.find_one(
+        {"id": input.conversation_id, "user_email": current_user.email}, CONVERSATION_CONTEXT_PROJECTION
+    )
+    if not conversation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found")
+    # Rebuilt from the relayed stream and stored by the server when it ends
+    reply = StreamedReply(input.conversation_id)
+    # Cleaned history is cached per conversation; only messages newer than the cached tail are read
+    payload["messages"] = await conversation_context_cache.get_history(db, input.conversation_id)
 
     # Add the current user message to the payload
     # This should be done after loading conversation history
@@ -108,127 +139,159 @@ async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Dep
 
     logger.info(f"Received web_search_enabled: {input.web_search_enabled}, final decision to search: {perform_search}")
 
-    # Handle web search if enabled
-    search_context = None
+    perform_rag = input.rag_enabled
+
+    # Start the search now; the client hears <websearch>true</websearch> before it finishes
+    search_task = None
     if perform_search and user_query:
         # Let the web search orchestrator determine engines via env (WEB_SEARCH_ENGINES)
-        search_results = await perform_web_search(user_query)
-        if search_results:
-            search_context = "\n\nWeb Search Results:\n"
-            for i, res in enumerate(search_results):
-                search_context += f"{i+1}. Title: {res.title if res.title else 'N/A'}\n"
-                search_context += f"   URL: {res.url if res.url else 'N/A'}\n"
-                search_context += f"   Snippet: {res.snippet if res.snippet else 'N/A'}\n"
-            search_context += "\nBased on the above web search results, answer the following question:\n"
-            # Check if payload["messages"] is not empty before accessing it
-            if payload["messages"]:
-                payload["messages"][-1]["content"] = search_context + user_query
-            else:
-                logger.warning("No messages found in payload, cannot augment with web search results")
-            logger.info(f"Augmented prompt with web search results for OpenAI.")
-        else:
-            logger.warning("Web search was performed but no results were found or an error occurred.")
-            # Check if payload["messages"] is not empty before accessing it
-            if payload["messages"]:
-                payload["messages"][-1]["content"] = "(Web search failed. Answering based on my existing knowledge.)\n\n" + user_query
-            else:
-                logger.warning("No messages found in payload, cannot set web search failure message")
+        search_task = asyncio.create_task(perform_web_search(user_query))
 
-    # Handle RAG if enabled
-    perform_rag = input.rag_enabled
-    rag_context = ""
-    rag_chunks = None
-    if perform_rag and user_query:
-        logger.info(f"RAG enabled for query: '{user_query}'")
-        query_embedding = await embed_query(user_query)
-        if query_embedding:
-            # Try to decode user email from token if provided for per-user filtering
-            user_email = None
-            if input.token:
-                try:
-                    decoded_payload = jwt.decode(input.token, SECRET_KEY, algorithms=[ALGORITHM])
-                    user_email = decoded_payload.get("sub")
-                except JWTError:
-                    logger.warning("Failed to decode JWT from streaming payload; proceeding without user filter")
-
-            chunks = await search_chunks(user_email, query_embedding, top_k=5, threshold=0.7, conversation_id=input.conversation_id)
-            if chunks:
-                rag_chunks = chunks
-                rag_context = "\n\nRelevant Document Chunks:\n"
-                for i, chunk in enumerate(chunks):
-                    rag_context += f"{i+1}. Document ID: {chunk['document_id']}, Chunk {chunk['chunk_index']}\n"
-                    rag_context += f"   Content: {chunk['content'][:200]}...\n"
-                    rag_context += f"   Similarity: {chunk['similarity']:.2f}\n"
-                rag_context += "\nUse the above document chunks to inform your response if relevant:\n"
+    async def prepare_prompt() -> PreparedPrompt:
+        """Augment the user turn with web/RAG context and fit it into the token budget."""
+        # Handle web search if enabled
+        search_context = None
+        search_results = []
+        if search_task is not None:
+            search_results = await search_task
+            if search_results:
+                search_context = "\n\nWeb Search Results:\n"
+                for i, res in enumerate(search_results):
+                    search_context += f"{i+1}. Title: {res.title if res.title else 'N/A'}\n"
+                    search_context += f"   URL: {res.url if res.url else 'N/A'}\n"
+                    search_context += f"   Snippet: {res.snippet if res.snippet else 'N/A'}\n"
+                if config.web_fetch_enabled:
+                    # Snippets are short; add the most relevant passages of the top pages
+                    try:
+                        passages = await asyncio.wait_for(
+                            web_page_fetcher.passages(user_query, search_results), config.web_fetch_deadline_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Fetching web pages exceeded {config.web_fetch_deadline_seconds}s; using snippets only")
+                        passages = []
+                    except Exception as e:
+                        logger.warning(f"Fetching web pages failed: {e}")
+                        passages = []
+                    if passages:
+                        search_context += "\nExcerpts from the result pages:\n"
+                        for i, passage in enumerate(passages):
+                            search_context += f"{i+1}. From: {passage.url}\n   {passage.text}\n"
+                search_context += "\nBased on the above web search results, answer the following question:\n"
+                # Check if payload["messages"] is not empty before accessing it
                 if payload["messages"]:
-                    payload["messages"][-1]["content"] = rag_context + payload["messages"][-1]["content"]
+                    payload["messages"][-1]["content"] = search_context + user_query
                 else:
-                    logger.warning("No messages found in payload, cannot augment with RAG context")
-                logger.info(f"Augmented prompt with RAG document chunks for OpenAI.")
+                    logger.warning("No messages found in payload, cannot augment with web search results")
+                logger.info(f"Augmented prompt with web search results for OpenAI.")
             else:
-                # Fallback: if embeddings not ready yet, try to use recent document chunks by conversation
-                try:
-                    doc_filter = {}
-                    if user_email:
-                        doc_filter["user_email"] = user_email
-                    if input.conversation_id:
-                        doc_filter["conversation_id"] = input.conversation_id
-                    docs_cursor = db.documents.find(doc_filter).sort("created_at", -1)
-                    latest_doc = await docs_cursor.to_list(1)
-                    if latest_doc:
-                        doc_id = latest_doc[0]["_id"]
-                        # Take first few chunks in order as context
-                        raw_chunks = await db.document_chunks.find({"document_id": doc_id}).sort("chunk_index", 1).to_list(5)
-                        if raw_chunks:
-                            rag_chunks = [{
-                                "document_id": c.get("document_id"),
-                                "chunk_index": c.get("chunk_index"),
-                                "content": c.get("content", ""),
-                                "similarity": 1.0,
-                            } for c in raw_chunks]
-                            rag_context = "\n\nDocument Content (raw chunks):\n"
-                            for i, c in enumerate(rag_chunks):
-                                rag_context += f"{i+1}. Document ID: {c['document_id']}, Chunk {c['chunk_index']}\n"
-                                rag_context += f"   Content: {c['content'][:200]}...\n"
-                            rag_context += "\nUse the above document content to summarize as requested.\n"
-                            if payload["messages"]:
-                                payload["messages"][-1]["content"] = rag_context + payload["messages"][-1]["content"]
-                            else:
-                                logger.warning("No messages found in payload, cannot augment with fallback RAG context")
-                            logger.info("RAG fallback used: raw document chunks included due to missing embeddings.")
-                        else:
-                            logger.info("RAG fallback: latest document has no chunks.")
-                    else:
-                        logger.info("RAG fallback: no documents found for conversation/user filter.")
-                except Exception as e:
-                    logger.warning(f"RAG fallback retrieval error: {e}")
-                # If still no rag_context after fallback, annotate the message minimally
-                if not rag_context:
+                logger.warning("Web search was performed but no results were found or an error occurred.")
+                # Check if payload["messages"] is not empty before accessing it
+                if payload["messages"]:
+                    payload["messages"][-1]["content"] = "(Web search failed. Answering based on my existing knowledge.)\n\n" + user_query
+                else:
+                    logger.warning("No messages found in payload, cannot set web search failure message")
+
+        # Handle RAG if enabled
+        rag_context = ""
+        rag_chunks = None
+        if perform_rag and user_query:
+            logger.info(f"RAG enabled for query: '{user_query}'")
+            query_embedding = await embed_query(user_query)
+            if query_embedding:
+                user_email = current_user.email
+                chunks = await search_chunks(user_email, query_embedding, top_k=5, threshold=0.7, conversation_id=input.conversation_id)
+                if chunks:
+                    rag_chunks = chunks
+                    rag_context = "\n\nRelevant Document Chunks:\n"
+                    for i, chunk in enumerate(chunks):
+                        rag_context += f"{i+1}. Document ID: {chunk['document_id']}, Chunk {chunk['chunk_index']}\n"
+                        rag_context += f"   Content: {chunk['content'][:200]}...\n"
+                        rag_context += f"   Similarity: {chunk['similarity']:.2f}\n"
+                    rag_context += "\nUse the above document chunks to inform your response if relevant:\n"
                     if payload["messages"]:
-                        payload["messages"][-1]["content"] = "(No relevant documents found. Answering based on conversation history.)\n\n" + payload["messages"][-1]["content"]
+                        payload["messages"][-1]["content"] = rag_context + payload["messages"][-1]["content"]
                     else:
-                        logger.warning("No messages found in payload, cannot set RAG no-results message")
-        else:
-            logger.warning("Failed to embed query for RAG.")
-            # Check if payload["messages"] is not empty before accessing it
-            if payload["messages"]:
-                payload["messages"][-1]["content"] = "(RAG embedding failed. Answering based on conversation history.)\n\n" + payload["messages"][-1]["content"]
+                        logger.warning("No messages found in payload, cannot augment with RAG context")
+                    logger.info(f"Augmented prompt with RAG document chunks for OpenAI.")
+                else:
+                    # Fallback: if embeddings not ready yet, try to use recent document chunks by conversation
+                    try:
+                        doc_filter = {}
+                        if user_email:
+                            doc_filter["user_email"] = user_email
+                        if input.conversation_id:
+                            doc_filter["conversation_id"] = input.conversation_id
+                        docs_cursor = db.documents.find(doc_filter).sort("created_at", -1)
+                        latest_doc = await docs_cursor.to_list(1)
+                        if latest_doc:
+                            doc_id = latest_doc[0]["_id"]
+                            # Take first few chunks in order as context
+                            raw_chunks = await db.document_chunks.find({"document_id": doc_id}).sort("chunk_index", 1).to_list(5)
+                            if raw_chunks:
+                                rag_chunks = [{
+                                    "document_id": c.get("document_id"),
+                                    "chunk_index": c.get("chunk_index"),
+                                    "content": c.get("content", ""),
+                                    "similarity": 1.0,
+                                } for c in raw_chunks]
+                                rag_context = "\n\nDocument Content (raw chunks):\n"
+                                for i, c in enumerate(rag_chunks):
+                                    rag_context += f"{i+1}. Document ID: {c['document_id']}, Chunk {c['chunk_index']}\n"
+                                    rag_context += f"   Content: {c['content'][:200]}...\n"
+                                rag_context += "\nUse the above document content to summarize as requested.\n"
+                                if payload["messages"]:
+                                    payload["messages"][-1]["content"] = rag_context + payload["messages"][-1]["content"]
+                                else:
+                                    logger.warning("No messages found in payload, cannot augment with fallback RAG context")
+                                logger.info("RAG fallback used: raw document chunks included due to missing embeddings.")
+                            else:
+                                logger.info("RAG fallback: latest document has no chunks.")
+                        else:
+                            logger.info("RAG fallback: no documents found for conversation/user filter.")
+                    except Exception as e:
+                        logger.warning(f"RAG fallback retrieval error: {e}")
+                    # If still no rag_context after fallback, annotate the message minimally
+                    if not rag_context:
+                        if payload["messages"]:
+                            payload["messages"][-1]["content"] = "(No relevant documents found. Answering based on conversation history.)\n\n" + payload["messages"][-1]["content"]
+                        else:
+                            logger.warning("No messages found in payload, cannot set RAG no-results message")
             else:
-                logger.warning("No messages found in payload, cannot set RAG failure message")
+                logger.warning("Failed to embed query for RAG.")
+                # Check if payload["messages"] is not empty before accessing it
+                if payload["messages"]:
+                    payload["messages"][-1]["content"] = "(RAG embedding failed. Answering based on conversation history.)\n\n" + payload["messages"][-1]["content"]
+                else:
+                    logger.warning("No messages found in payload, cannot set RAG failure message")
 
+        # Fit the history (or its rolling summary) and the augmented user turn into the token budget
+        history = payload["messages"][:-1]
+        payload["messages"], context_usage = await context_window.fit(
+            db, input.conversation_id, history, payload["messages"][-1], conversation=conversation
+        )
+        logger.info(f"Prompt context: {context_usage.prompt_tokens}/{context_usage.budget} tokens, "
+                    f"{context_usage.kept_messages}/{context_usage.history_messages} history messages kept")
+        return PreparedPrompt(search_results, search_context, rag_context, rag_chunks, history, context_usage)
 
-    async def generate_stream():
+    client_gone = False
+
+    async def stream_reply():
         """
         Generates the SSE stream including web search state and LLM response.
         """
+        nonlocal prepared, client_gone
         # Signal web search start if needed
         if perform_search:
             yield f"data: <websearch>true</websearch>\n\n"
+            # Only now wait for the search (bounded by its deadline), RAG and the context fit
+            prepared = await prepare_prompt()
+            search_results, search_context = prepared.search_results, prepared.search_context
+            reply.web_search_state = "results" if search_context else "no_results"
             if search_context:
                 yield f"data: <websearch>results</websearch>\n\n"
                 # Emit citations for web search
                 try:
-                    if 'search_results' in locals() and search_results:
+                    if search_results:
                         web_items = [{
                             "type": "web",
                             "title": getattr(res, 'title', None),
@@ -236,6 +299,7 @@ async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Dep
                             "snippet": getattr(res, 'snippet', None),
                             "source": getattr(res, 'source', None)
                         } for res in search_results if res]
+                        reply.citations = web_items
                         yield f"data: <citations>{json.dumps({'items': web_items})}</citations>\n\n"
                 except Exception as e:
                     logger.warning(f"Failed to emit web citations: {e}")
@@ -243,9 +307,12 @@ async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Dep
                 yield f"data: <websearch>no_results</websearch>\n\n"
             yield f"data: <websearch>false</websearch>\n\n"
 
+        rag_context, rag_chunks = prepared.rag_context, prepared.rag_chunks
+
         # Signal RAG start if needed
         if perform_rag:
             yield f"data: <rag>true</rag>\n\n"
+            reply.rag_state = "results" if rag_context else "no_results"
             if rag_context:
                 yield f"data: <rag>results</rag>\n\n"
                 # Emit citations for RAG
@@ -257,6 +324,7 @@ async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Dep
                             "chunk_index": chunk.get('chunk_index'),
                             "snippet": (chunk.get('content') or '')[:200]
                         } for chunk in rag_chunks]
+                        reply.citations = rag_items
                         yield f"data: <citations>{json.dumps({'items': rag_items})}</citations>\n\n"
                 except Exception as e:
                     logger.warning(f"Failed to emit RAG citations: {e}")
@@ -264,76 +332,109 @@ async def chat_with_openai(input: StreamRequestPayload, request: Request, db=Dep
                 yield f"data: <rag>no_results</rag>\n\n"
             yield f"data: <rag>false</rag>\n\n"
 
-        # Stream LLM response with failover and retries
-        endpoints = []
-        if config.llm_base_urls:
-            # Support comma-separated env string or list
-            if isinstance(config.llm_base_urls, list):
-                endpoints = [u.strip() for u in config.llm_base_urls if u]
-            else:
-                endpoints = [u.strip() for u in str(config.llm_base_urls).split(',') if u.strip()]
-        if not endpoints and config.llm_base_url:
-            endpoints = [config.llm_base_url]
-
-        timeout_seconds = max(5, int(config.llm_request_timeout_seconds or 60))
+        # Stream LLM response through the endpoint router. Each round tries the
+        # healthiest, least-loaded endpoints first; endpoints with an open circuit
+        # are skipped, so a dead primary no longer costs retries on every request.
         max_retries = max(0, int(config.llm_max_retries or 0))
         backoff_base = float(config.llm_retry_backoff_seconds or 0.75)
 
-        # Prepare global proxy mapping (applied only to non-local endpoints)
-        global_proxies = None
-        if config.http_proxy or config.https_proxy:
-            global_proxies = {}
-            if config.http_proxy:
-                global_proxies["http://"] = config.http_proxy
-            if config.https_proxy:
-                global_proxies["https://"] = config.https_proxy
-
         success = False
         last_error = None
-        for base_url in endpoints:
-            # Simple retries per endpoint
-            for attempt in range(max_retries + 1):
-                try:
-                    # Bypass proxy for localhost endpoints to avoid routing local LM Studio via proxy
-                    host = urlparse(base_url).hostname or ""
-                    use_proxies = None if host in ("127.0.0.1", "localhost") else global_proxies
-                    async with httpx.AsyncClient(timeout=timeout_seconds, proxies=use_proxies) as client:
-                        url = f"{base_url.rstrip('/')}/v1/chat/completions"
-                        async with client.stream("POST", url, json=payload, headers={"Content-Type": "application/json"}) as response:
-                            if response.status_code >= 400:
+        rejected = None  # a 4xx from the LLM: the request itself is bad, so no endpoint would take it
+        for attempt in range(max_retries + 1):
+            candidates = endpoint_router.candidates()
+            if not candidates:
+                last_error = last_error or "All LLM endpoints are temporarily unavailable (circuit open)."
+                break
+            for base_url in candidates:
+                streamed = False
+                async with endpoint_router.track(base_url) as health:
+                    started = time.monotonic()
+                    try:
+                        client = llm_client_pool.get(base_url)
+                        async with client.stream("POST", "/v1/chat/completions", json=payload) as response:
+                            if is_endpoint_failure(response.status_code):
                                 error_msg = f"LLM service error ({base_url}): {response.status_code}"
                                 logger.error(error_msg)
                                 last_error = error_msg
-                                break  # Move to next endpoint or retry
+                                health.record_failure()
+                                continue  # Try the next endpoint
+                            if response.status_code >= 400:
+                                # The endpoint is fine; pass its answer on instead of failing over
+                                health.record_success(time.monotonic() - started)
+                                rejected = f"LLM rejected the request ({response.status_code}): {_error_detail(await response.aread())}"
+                                logger.warning(f"{rejected} [{base_url}]")
+                                break
                             # Successful, stream bytes through
                             async for chunk in response.aiter_bytes():
+                                if not streamed:
+                                    health.record_success(time.monotonic() - started)
+                                    streamed = True
+                                reply.feed(chunk)
                                 yield chunk
+                            if not streamed:
+                                health.record_success(None)
                             success = True
-                            break
-                except ClientDisconnect:
-                    print("Client disconnected. Stopping OpenAI stream.")
-                    return
-                except (httpx.RequestError, httpx.HTTPError) as e:
-                    last_error = str(e)
-                    logger.error(f"LLM request error on {base_url} (attempt {attempt+1}/{max_retries+1}): {e}")
-                    # Backoff if we have remaining retries on this endpoint
-                    if attempt < max_retries:
-                        await asyncio.sleep(backoff_base * (2 ** attempt))
-                    else:
-                        # Exhausted retries for this endpoint; try next endpoint
-                        break
-            if success:
+                    except ClientDisconnect:
+                        print("Client disconnected. Stopping OpenAI stream.")
+                        client_gone = True
+                        return
+                    except (httpx.RequestError, httpx.HTTPError) as e:
+                        last_error = str(e)
+                        health.record_failure()
+                        logger.error(f"LLM request error on {base_url} (round {attempt+1}/{max_retries+1}): {e}")
+                        if streamed:
+                            # Part of the answer already reached the client; failing over would duplicate it
+                            reply.add_text(f"LLM stream interrupted: {last_error}")
+                            yield f"data: LLM stream interrupted: {last_error}\n\n"
+                            return
+                if success or rejected:
+                    break
+            if success or rejected:
                 break
+            # Every candidate failed this round; back off before re-ranking
+            if attempt < max_retries:
+                await asyncio.sleep(backoff_base * (2 ** attempt))
 
+        if rejected:
+            reply.add_text(rejected)
+            yield f"data: {rejected}\n\n"
+            return
         if not success:
             msg = last_error or "No LLM endpoint reachable. Ensure LM Studio is running at your configured LLM_BASE_URL."
+            reply.add_text(msg)
             yield f"data: {msg}\n\n"
             return
+        # The reply is done, so the LLM is free to fold older turns into the summary
+        context_window.summarize_later(db, input.conversation_id, prepared.history, prepared.usage, input.model)
 
+    async def generate_stream():
+        """Relays stream_reply and stores the assistant reply when it ends."""
+        completed = False
+        try:
+            async for chunk in stream_reply():
+                yield chunk
+            completed = not client_gone
+        finally:
+            if not completed:
+                # Cancelled or closed mid-stream: keep what the client had already received
+                reply_store.save_partial(db, reply)
+        if not completed:
+            return
+        saved = await reply_store.save(db, reply)
+        if saved:
+            # The client adds the reply to its history from this instead of uploading it
+            meta = {"id": saved.id, "timestamp": saved.timestamp.isoformat(), "thinking_duration": saved.thinking_duration}
+            yield f"data: <saved>{json.dumps(meta)}</saved>\n\n"
+
+    # Without a web search the prompt is ready before the response starts and its
+    # token accounting goes out as headers; with one, it is built inside the stream
+    prepared = None if search_task is not None else await prepare_prompt()
     headers = {
         "Cache-Control": "no-cache",
         "Connection": "keep-alive",
         "X-Accel-Buffering": "no",
+        **(prepared.usage.headers() if prepared else {}),
     }
     return StreamingResponse(generate_stream(), media_type="text/event-stream", headers=headers)
 
@@ -346,23 +447,24 @@ async def generate_title(messages: list, model: str):
         "stream": False,
     }
     try:
-        base_url = config.llm_base_url
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(f"{base_url}/v1/chat/completions", json=payload, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
-            data = response.json()
-            title = data.get("choices", [{}])[0].get("message", {}).get("content", "New Chat")
-            # Clean up the title by removing quotes
-            return title.strip().strip('"')
-    except httpx.RequestError as e:
+        base_url = (endpoint_router.candidates() or get_llm_endpoints())[0]
+        client = llm_client_pool.get(base_url)
+        response = await client.post("/v1/chat/completions", json=payload, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        title = data.get("choices", [{}])[0].get("message", {}).get("content", "New Chat")
+        # Clean up the title by removing quotes
+        return title.strip().strip('"')
+    except (httpx.RequestError, httpx.HTTPStatusError) as e:
         logger.error(f"An httpx error occurred during title generation: {e}")
         return "New Chat"
 
 @router.get("/models")
 async def get_models():
     try:
-        base_url = config.llm_base_url
-        response = httpx.get(f"{base_url}/v1/models", timeout=10)
+        base_url = (endpoint_router.candidates() or get_llm_endpoints())[0]
+        client = llm_client_pool.get(base_url)
+        response = await client.get("/v1/models", timeout=10)
         response.raise_for_status()
         models_data = response.json()
         return {"models": [model['id'] for model in models_data.get('data', [])]}
@@ -373,12 +475,6 @@ async def get_models():
 @router.get("/config")
 async def get_llm_config():
     """Expose LLM endpoint configuration (sanitized) for frontend visibility."""
-    endpoints = []
-    if config.llm_base_urls:
-        if isinstance(config.llm_base_urls, list):
-            endpoints = [u for u in config.llm_base_urls if u]
-        else:
-            endpoints = [u.strip() for u in str(config.llm_base_urls).split(',') if u.strip()]
-    elif config.llm_base_url:
-        endpoints = [config.llm_base_url]
-    return {"endpoints": endpoints}
\ No newline at end of file
+    return {
+        "endpoints": get_llm_endpoints(),
+    }
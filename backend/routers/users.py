@@ -5,6 +5,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase # Import the correct type h
 from backend.database import get_db, delete_user
 from backend.models import User, UserRole, UserRoleUpdate, UserPublic # Import UserRoleUpdate
 from backend.auth import get_current_user
+from backend.services.auth.user_cache import user_cache
 from pymongo import ReturnDocument
 
 router = APIRouter(
@@ -51,6 +52,8 @@ async def update_user_role(
         {"$set": {"role": role_update.role}},
         return_document=ReturnDocument.AFTER
     )
+    # The user's next request must see the new role
+    user_cache.invalidate(updated_user_data["email"])
     return UserPublic(**User(**updated_user_data).dict(exclude={"hashed_password"}))
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from backend.auth import get_current_user
+from backend.models import User, UserRole
+from backend.utils.web_search.cache import web_search_cache
+from backend.utils.web_search.registry import web_search_registry
+
+router = APIRouter(
+    tags=["web-search"],
+)
+
+def _require_admin(current_user: User):
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to manage web search"
+        )
+
+@router.get("/engines")
+async def get_engines(current_user: User = Depends(get_current_user)):
+    """Loaded and selected search engines with per-engine latency and error counts."""
+    _require_admin(current_user)
+    return {"registry": web_search_registry.stats(), "cache": web_search_cache.stats()}
+
+@router.post("/reload")
+async def reload_engines(current_user: User = Depends(get_current_user)):
+    """Re-read web search settings from the environment and backend/.env and rebuild the engines."""
+    _require_admin(current_user)
+    return await web_search_registry.reload()
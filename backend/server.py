@@ -6,6 +6,7 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT_DIR))
 logger = logging.getLogger(__name__)
 
+import asyncio
 import os
 import logging
 import re
@@ -14,7 +15,7 @@ from datetime import datetime
 from typing import List
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
 from starlette.middleware.cors import CORSMiddleware
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -29,11 +30,32 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 # Only log environment variables if we're the main process (not reloader)
 if os.environ.get('RUN_MAIN') == 'true' or not os.environ.get('WERKZEUG_RUN_MAIN'):
-    from backend.database import close_mongo_connection
+    from backend.database import close_mongo_connection, ensure_indexes
 else:
-    from backend.database import close_mongo_connection
-from backend.routers import chat, openai, auth, users, documents
-logger.info(f"Imported routers: {[r.__name__ for r in [chat, openai, auth, users, documents]]}")
+    from backend.database import close_mongo_connection, ensure_indexes
+from backend.routers import chat, openai, auth, users, documents, web_search
+from backend.services.llm.client_pool import llm_client_pool
+from backend.services.llm.endpoint_router import endpoint_router
+from backend.services.embeddings.executor import embedding_executor
+from backend.services.embeddings.model_registry import embedding_model_registry
+from backend.services.embeddings.batcher import query_batcher
+from backend.services.embeddings.vector_index import vector_index
+from backend.services.documents.extraction import document_extractor
+from backend.services.documents.ingestion import dedup_stats
+from backend.services.chat.context_cache import conversation_context_cache
+from backend.services.chat.context_window import context_window
+from backend.services.chat.replies import reply_store
+from backend.services.auth.user_cache import user_cache
+from backend.services.auth.hashing import password_hasher
+from backend.services.auth.tokens import token_service
+from backend.services.auth.sessions import refresh_sessions
+from backend.utils.web_search.cache import web_search_cache
+from backend.utils.web_search.registry import web_search_registry
+from backend.utils.web_search.fetcher import web_page_fetcher
+from backend.config import config
+from backend.auth import get_current_user
+from backend.models import User, UserRole
+logger.info(f"Imported routers: {[r.__name__ for r in [chat, openai, auth, users, documents, web_search]]}")
 
 # Get port from environment variable, default to 4100 if not set
 PORT = int(os.environ.get("PORT", 4100))
@@ -41,8 +63,27 @@ PORT = int(os.environ.get("PORT", 4100))
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
+    # Indexes are set up in the background: requests are served meanwhile, and an
+    # unreachable Mongo is reported instead of holding up startup
+    index_setup = asyncio.create_task(ensure_indexes())
+    llm_client_pool.start()
+    endpoint_router.start()
+    web_search_registry.start()
+    if config.embedding_warmup:
+        await embedding_executor.warmup()
     yield
     # Shutdown logic
+    index_setup.cancel()
+    await reply_store.drain()
+    # Partition files are written on a debounce; don't lose the last few seconds of changes
+    await vector_index.flush()
+    await endpoint_router.stop()
+    await web_search_registry.stop()
+    await web_page_fetcher.aclose()
+    embedding_executor.shutdown()
+    document_extractor.shutdown()
+    password_hasher.shutdown()
+    await llm_client_pool.aclose()
     close_mongo_connection()
 
 # Create the main app without a prefix
@@ -60,6 +101,35 @@ api_router = APIRouter(prefix="/api")
 async def get_llm_models():
     return await openai.get_models()
 
+@api_router.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """Runtime counters for the worker's shared subsystems (admins only: they name internal hosts and paths)."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view metrics"
+        )
+    return {
+        "llm_pool": llm_client_pool.stats(),
+        "llm_router": endpoint_router.snapshot(),
+        "embeddings": embedding_executor.stats(),
+        "embedding_model": embedding_model_registry.stats(),
+        "embedding_batches": query_batcher.stats(),
+        "vector_index": vector_index.stats(),
+        "document_extraction": document_extractor.stats(),
+        "document_dedup": dedup_stats(),
+        "chat_context": conversation_context_cache.stats(),
+        "context_window": context_window.stats(),
+        "assistant_replies": reply_store.stats(),
+        "auth": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "tokens": token_service.stats(),
+        "refresh_sessions": refresh_sessions.stats(),
+        "web_search_cache": web_search_cache.stats(),
+        "web_search_engines": web_search_registry.stats(),
+        "web_page_fetch": web_page_fetcher.stats(),
+    }
+
 @api_router.get("/")
 async def root():
     return {"message": "Hello World"}
@@ -71,6 +141,7 @@ app.include_router(openai.router, prefix="/api/openai")
 app.include_router(chat.router, prefix="/api/chat")
 app.include_router(auth.router, prefix="/api/auth")
 app.include_router(users.router, prefix="/api/users")
+app.include_router(web_search.router, prefix="/api/web-search")
 app.include_router(documents.router)
 logger.info("Successfully mounted documents router")
 
@@ -89,6 +160,9 @@ app.add_middleware(
     allow_origins=["http://localhost:4141", "http://localhost:4100"], # Allowed origins
     allow_methods=["*"],
     allow_headers=["*", "Authorization"],
+    # Per-request prompt token accounting set by /api/openai/chat
+    expose_headers=["X-Context-Tokens", "X-Context-Budget", "X-Context-Kept-Messages",
+                    "X-Context-Summarized-Messages", "X-Context-Dropped-Messages", "Server-Timing"],
 )
 
 logging.basicConfig(
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, TypeVar
+
+from passlib.context import CryptContext
+
+from backend.config import config
+from backend.utils.metrics import RollingStats
+
+T = TypeVar("T")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords with bcrypt on a small dedicated thread pool.
+
+    A bcrypt call is tens to hundreds of milliseconds of CPU. Run inline in an
+    async handler it stalls every stream on the worker; here the handler awaits
+    it while bcrypt (which releases the GIL) runs on one of
+    PASSWORD_HASH_WORKERS threads. The cost factor is BCRYPT_ROUNDS, and a
+    stored hash with a different cost is reported for rehashing by
+    :meth:`verify`.
+    """
+
+    def __init__(self, rounds: Optional[int] = None, max_workers: Optional[int] = None):
+        rounds = int(rounds or config.bcrypt_rounds)
+        # min == max == default: any other cost counts as outdated in verify_and_update
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self.rounds = rounds
+        self.max_workers = max(1, int(max_workers or config.password_hash_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self.hashes = 0
+        self.verifications = 0
+        self.failures = 0
+        self.rehashes = 0
+        self.hash_seconds = RollingStats()
+        self.wait_seconds = RollingStats()
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        def timed():
+            started = time.monotonic()
+            return fn(*args), started, time.monotonic()
+
+        submitted = time.monotonic()
+        result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        self.wait_seconds.observe(started - submitted)
+        self.hash_seconds.observe(finished - started)
+        return result
+
+    async def hash(self, password: str) -> str:
+        self.hashes += 1
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+        self.verifications += 1
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if not valid:
+            self.failures += 1
+        elif new_hash:
+            self.rehashes += 1
+        return valid, new_hash
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "workers": self.max_workers,
+            "hashes": self.hashes,
+            "verifications": self.verifications,
+            "failures": self.failures,
+            "rehashes": self.rehashes,
+            "hash_ms": self.hash_seconds.summary(scale=1000, digits=1),
+            "queue_wait_ms": self.wait_seconds.summary(scale=1000, digits=1),
+        }
+
+
+password_hasher = PasswordHasher()
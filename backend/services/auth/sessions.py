@@ -0,0 +1,148 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import config
+from backend.services.auth.tokens import RefreshClaims
+from backend.utils.cache import TTLCache
+
+
+def _aware(value: datetime) -> datetime:
+    # Motor returns naive UTC datetimes unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RefreshSessions:
+    """Tracks which refresh token of each login is the current one.
+
+    Every login starts a family, stored in ``refresh_sessions`` with a
+    generation counter; each refresh token carries its family and
+    generation. /refresh advances the generation with one conditional
+    update, so only the newest token of a family can be used. Presenting an
+    older one means a copy of the token is in someone else's hands: the
+    family is revoked and both holders have to log in again. Two tabs that
+    refresh with the same token within REFRESH_TOKEN_REUSE_GRACE_SECONDS are
+    not a replay; the late one gets a token of the current generation.
+
+    Revoked families are also kept in memory, so a replayed or logged-out
+    token is turned away without a Mongo read; other processes see the
+    revocation in Mongo. Documents expire with the family's last token.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self._revoked: TTLCache[bool] = TTLCache(
+            max_entries or config.auth_token_cache_max_entries,
+            timedelta(days=config.refresh_token_expire_days).total_seconds(),
+        )
+        self.started = 0
+        self.advanced = 0
+        self.grace_reuses = 0
+        self.replays = 0
+        self.revocations = 0
+        self.rejected = 0
+
+    async def start(self, db, email: str) -> Tuple[str, datetime]:
+        """Record a new login; returns the family id and when its tokens stop working."""
+        family = uuid.uuid4().hex
+        expires_at = datetime.now(timezone.utc) + timedelta(days=config.refresh_token_expire_days)
+        await db.refresh_sessions.insert_one({
+            "_id": family,
+            "email": email,
+            "generation": 0,
+            "revoked": False,
+            "rotated_at": datetime.now(timezone.utc),
+            "expires_at": expires_at,
+        })
+        self.started += 1
+        return family, expires_at
+
+    async def advance(self, db, claims: RefreshClaims) -> Optional[int]:
+        """Move the family on from the presented token; returns the generation to issue.
+
+        Returns None when the token may not be refreshed: its family was
+        revoked or has expired, or it is an old token of the family, which
+        revokes the family.
+        """
+        if self._revoked.get(claims.family):
+            self.rejected += 1
+            return None
+        now = datetime.now(timezone.utc)
+        if claims.generation is not None:
+            doc = await db.refresh_sessions.find_one_and_update(
+                {"_id": claims.family, "generation": claims.generation, "revoked": False},
+                {"$inc": {"generation": 1}, "$set": {"rotated_at": now}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is not None:
+                self.advanced += 1
+                return doc["generation"]
+
+        doc = await db.refresh_sessions.find_one({"_id": claims.family})
+        if doc is None:
+            if claims.generation is not None:
+                # Expired and removed by the TTL index
+                self.rejected += 1
+                return None
+            # Issued before families were tracked: adopt it, so any later copy counts as a replay
+            try:
+                await db.refresh_sessions.insert_one({
+                    "_id": claims.family,
+                    "email": claims.email,
+                    "generation": 1,
+                    "revoked": False,
+                    "rotated_at": now,
+                    "expires_at": claims.expires_at,
+                })
+            except DuplicateKeyError:
+                self.rejected += 1
+                return None
+            self.advanced += 1
+            return 1
+        if doc["revoked"]:
+            self._revoked.put(claims.family, True)
+            self.rejected += 1
+            return None
+        if (claims.generation == doc["generation"] - 1
+                and (now - _aware(doc["rotated_at"])).total_seconds() < config.refresh_token_reuse_grace_seconds):
+            # Another tab refreshed with the same token a moment ago
+            self.grace_reuses += 1
+            return doc["generation"]
+        self.replays += 1
+        await self.revoke(db, claims.family)
+        return None
+
+    async def revoke(self, db, family: str) -> None:
+        """End a login; none of its refresh tokens can be used again."""
+        self._revoked.put(family, True)
+        self.revocations += 1
+        await db.refresh_sessions.update_one({"_id": family}, {"$set": {"revoked": True}})
+
+    async def revoke_user(self, db, email: str) -> None:
+        """End every login of a user, e.g. when the account is deleted."""
+        async for doc in db.refresh_sessions.find({"email": email, "revoked": False}, {"_id": 1}):
+            self._revoked.put(doc["_id"], True)
+        result = await db.refresh_sessions.update_many({"email": email}, {"$set": {"revoked": True}})
+        self.revocations += result.modified_count
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "advanced": self.advanced,
+            "grace_reuses": self.grace_reuses,
+            "replays": self.replays,
+            "revocations": self.revocations,
+            "rejected": self.rejected,
+            "revoked_cache": self._revoked.stats(),
+        }
+
+
+refresh_sessions = RefreshSessions()
+
+
+__all__ = [
+    'RefreshSessions',
+    'refresh_sessions'
+]
@@ -1,44 +1,150 @@
+import uuid
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from jose import jwt
-from passlib.context import CryptContext
+from typing import NamedTuple, Optional, Tuple
+
+from jose import JWTError, jwk, jwt
+
 from backend.config import config
+from backend.utils.cache import TTLCache
+
+ALGORITHM = "HS256"
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
+
+class TokenError(Exception):
+    """The token is malformed, expired, badly signed or of the wrong type."""
+
+
+class RefreshClaims(NamedTuple):
+    email: str
+    family: str  # shared by every token rotated from the same login
+    expires_at: datetime
+    generation: Optional[int]  # position in the family; None for tokens from before families were tracked
+
+
+class TokenService:
+    """Issues and verifies the app's JWTs with one signing key.
+
+    The key is constructed once; handed a plain string, jose re-parses it
+    (JSON probe, PEM checks) on every encode and decode. Verified access
+    tokens are cached until they expire, so the request dependency decodes a
+    token once rather than on every call.
+
+    Refresh tokens are signed and name their family (one per login) and
+    generation; /refresh rotates them, issuing the next generation of the
+    family with the family's original expiry, so a session still ends
+    REFRESH_TOKEN_EXPIRE_DAYS after login. Which generation is current is
+    kept by RefreshSessions, not here.
+    """
+
+    def __init__(self, secret_key: Optional[str] = None, algorithm: str = ALGORITHM):
+        secret = secret_key or config.secret_key
+        if not secret:
+            raise ValueError("Secret key is not configured")
+        self.algorithm = algorithm
+        self._key = jwk.construct(str(secret), algorithm)
+        self._verified: TTLCache[str] = TTLCache(
+            config.auth_token_cache_max_entries, config.auth_user_cache_ttl_seconds
+        )
+        self.issued_access = 0
+        self.issued_refresh = 0
+        self.rotations = 0
+        self.decodes = 0
+        self.rejected = 0
+
+    def _encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self._key, algorithm=self.algorithm)
+
+    def _decode(self, token: str) -> dict:
+        self.decodes += 1
+        try:
+            return jwt.decode(token, self._key, algorithms=[self.algorithm])
+        except JWTError as e:
+            self.rejected += 1
+            raise TokenError(str(e)) from e
+
+    def create_access_token(self, email: str, expires_delta: Optional[timedelta] = None) -> str:
+        """Create JWT access token"""
+        expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=config.access_token_expire_minutes))
+        self.issued_access += 1
+        return self._encode({"sub": email, "typ": ACCESS_TOKEN_TYPE, "exp": expire})
+
+    def create_refresh_token(self, email: str, family: str, expires_at: datetime,
+                             generation: int = 0) -> Tuple[str, datetime]:
+        """Create a refresh token of a family started with RefreshSessions.start"""
+        now = datetime.now(timezone.utc)
+        self.issued_refresh += 1
+        token = self._encode({
+            "sub": email,
+            "typ": REFRESH_TOKEN_TYPE,
+            "fam": family,
+            "gen": generation,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": expires_at,
+        })
+        return token, expires_at
+
+    def verify_access(self, token: str) -> str:
+        """Return the email an access token was issued to, or raise TokenError."""
+        email = self._verified.get(token)
+        if email is not None:
+            return email
+        claims = self._decode(token)
+        # Access tokens issued before token types were added carry no "typ"
+        if claims.get("typ", ACCESS_TOKEN_TYPE) != ACCESS_TOKEN_TYPE or not claims.get("sub"):
+            self.rejected += 1
+            raise TokenError("Not an access token")
+        ttl = min(float(config.auth_user_cache_ttl_seconds),
+                  float(claims["exp"]) - datetime.now(timezone.utc).timestamp())
+        if ttl > 0:
+            self._verified.put(token, claims["sub"], ttl)
+        return claims["sub"]
+
+    def verify_refresh(self, token: str) -> Optional[RefreshClaims]:
+        """Return the claims of a refresh token issued by this service.
+
+        Returns None for a validly signed token from before refresh tokens
+        were self-contained (no subject); those are checked against Mongo.
+        """
+        claims = self._decode(token)
+        if "typ" not in claims and "sub" not in claims:
+            return None
+        if claims.get("typ") != REFRESH_TOKEN_TYPE or not claims.get("sub") or not claims.get("fam"):
+            self.rejected += 1
+            raise TokenError("Not a refresh token")
+        generation = claims.get("gen")
+        if generation is not None and not isinstance(generation, int):
+            self.rejected += 1
+            raise TokenError("Malformed refresh token generation")
+        return RefreshClaims(
+            claims["sub"], claims["fam"], datetime.fromtimestamp(claims["exp"], timezone.utc), generation
+        )
+
+    def rotate_refresh_token(self, claims: RefreshClaims, generation: int) -> Tuple[str, datetime]:
+        """Issue ``generation`` of the claims' family, as returned by RefreshSessions.advance"""
+        self.rotations += 1
+        return self.create_refresh_token(claims.email, claims.family, claims.expires_at, generation)
+
+    def stats(self) -> dict:
+        return {
+            "issued_access": self.issued_access,
+            "issued_refresh": self.issued_refresh,
+            "rotations": self.rotations,
+            "decodes": self.decodes,
+            "rejected": self.rejected,
+            "verified_cache": self._verified.stats(),
+        }
+
+
+token_service = TokenService()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=config.access_token_expire_minutes)
-    to_encode.update({"exp": expire})
-    if not config.secret_key:
-        raise ValueError("Secret key is not configured")
-    return jwt.encode(to_encode, str(config.secret_key), algorithm="HS256")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hashed version"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    """Generate password hash"""
-    return pwd_context.hash(password)
-
-def create_refresh_token() -> tuple[str, datetime]:
-    """Create refresh token with expiration"""
-    expires_at = datetime.now(timezone.utc) + timedelta(days=config.refresh_token_expire_days)
-    token = jwt.encode(
-        {"exp": expires_at},
-        str(config.secret_key),
-        algorithm="HS256"
-    )
-    return token, expires_at
 
 __all__ = [
-    'create_access_token',
-    'create_refresh_token',
-    'verify_password',
-    'get_password_hash'
-]
\ No newline at end of file
+    'ALGORITHM',
+    'RefreshClaims',
+    'TokenError',
+    'TokenService',
+    'token_service'
+]
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from backend.config import config
+from backend.models import User
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import RollingStats
+
+
+class UserCache:
+    """Keeps recently authenticated users in memory.
+
+    An authenticated request used to read the user from Mongo every time.
+    Users are cached for AUTH_USER_CACHE_TTL_SECONDS (verified tokens are
+    cached by TokenService), so a burst of requests from one session costs
+    one lookup. UserService.update_user/delete_user, user deletion and role
+    changes call :meth:`invalidate`; changes made from another process
+    (e.g. manage.py) show up once the TTL runs out.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self._users: TTLCache[User] = TTLCache(
+            max_entries or config.auth_user_cache_max_entries,
+            ttl_seconds if ttl_seconds is not None else config.auth_user_cache_ttl_seconds,
+        )
+        # Bumped on every invalidation so a lookup racing with an update does not cache the old record
+        self._version = 0
+        self.user_loads = 0
+        self.invalidations = 0
+        self.auth_seconds = RollingStats()
+
+    async def get(self, db, email: str) -> Optional[User]:
+        """Return the user, from memory when cached; the result is a copy callers may change."""
+        user = self._users.get(email)
+        if user is None:
+            version = self._version
+            self.user_loads += 1
+            user_doc = await db.users.find_one({"email": email})
+            if not user_doc:
+                return None
+            user = User(**user_doc)
+            if self._version == version:
+                self._users.put(email, user)
+        return user.model_copy()
+
+    def invalidate(self, email: str) -> None:
+        self.invalidations += 1
+        self._version += 1
+        self._users.pop(email)
+
+    def observe(self, seconds: float) -> None:
+        self.auth_seconds.observe(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "users": self._users.stats(),
+            "user_loads": self.user_loads,
+            "invalidations": self.invalidations,
+            "auth_ms": self.auth_seconds.summary(scale=1000, digits=3),
+        }
+
+
+user_cache = UserCache()
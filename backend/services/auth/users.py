@@ -5,7 +5,8 @@ from pydantic import EmailStr
 from backend.models import User, RefreshToken
 from backend.localization.departments import Department
 from backend.services.auth.password import PasswordValidator
-from backend.services.auth.tokens import get_password_hash
+from backend.services.auth.hashing import password_hasher
+from backend.services.auth.user_cache import user_cache
 from backend.config import config
 from backend.database import db
 
@@ -31,7 +32,7 @@ class UserService:
                 detail="Email already registered"
             )
 
-        hashed_password = get_password_hash(password)
+        hashed_password = await password_hasher.hash(password)
         user = User(
             name=name,
             email=email,
@@ -48,6 +49,7 @@ class UserService:
             {"email": email},
             {"$set": update_data}
         )
+        user_cache.invalidate(email)
         if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -55,10 +57,17 @@ class UserService:
             )
         return await UserService.get_user_or_404(email)
 
+    @staticmethod
+    async def set_password_hash(email: str, hashed_password: str) -> None:
+        """Replace the stored hash, e.g. after a login with an outdated bcrypt cost"""
+        await db.users.update_one({"email": email}, {"$set": {"hashed_password": hashed_password}})
+        user_cache.invalidate(email)
+
     @staticmethod
     async def delete_user(email: str) -> None:
         """Delete user from database"""
         result = await db.users.delete_one({"email": email})
+        user_cache.invalidate(email)
         if result.deleted_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -82,17 +91,6 @@ class UserService:
             )
         return user
 
-    @staticmethod
-    async def store_refresh_token(email: str, token: str, expires_at: datetime) -> None:
-        """Store refresh token in database"""
-        refresh_token = RefreshToken(
-            token=token,
-            email=email,
-            expires_at=expires_at,
-            is_active=True
-        )
-        await db.refresh_tokens.insert_one(refresh_token.dict())
-
     @staticmethod
     async def validate_refresh_token(token: str) -> Optional[RefreshToken]:
         """Validate refresh token and return token data if valid"""
@@ -0,0 +1,130 @@
+import asyncio
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from backend.config import config
+from backend.utils.cache import TTLCache
+
+_THINK_RE = re.compile(r'<think>.*?</think>', flags=re.DOTALL)
+_ANSWER_TAG_RE = re.compile(r'</?answer>')
+
+HISTORY_PROJECTION = {"_id": 0, "id": 1, "sender": 1, "text": 1, "clean_text": 1, "timestamp": 1}
+
+
+def message_role(sender: str) -> str:
+    return 'assistant' if sender in ['ai', 'assistant'] else sender
+
+
+def clean_message_text(sender: str, text: str) -> str:
+    """Text of a stored message as it is sent back to the LLM: reasoning and answer tags stripped."""
+    if message_role(sender) != 'assistant':
+        return text
+    return _ANSWER_TAG_RE.sub('', _THINK_RE.sub('', text)).strip()
+
+
+def _stored_timestamp(ts: datetime) -> datetime:
+    """Normalize to what Mongo returns: naive UTC, truncated to milliseconds."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(microsecond=ts.microsecond // 1000 * 1000)
+
+
+class _History:
+    def __init__(self):
+        self.messages: List[Dict[str, str]] = []
+        self.last_timestamp: Optional[datetime] = None
+        # Every message held; reads start at last_timestamp inclusive and record_message
+        # can race a read, so the same message may come back more than once
+        self.ids: Set[str] = set()
+        # Serializes incremental reads of this conversation
+        self.lock = asyncio.Lock()
+
+    def append(self, msg_id: str, sender: str, content: str, timestamp: datetime) -> None:
+        if msg_id is not None:
+            if msg_id in self.ids:
+                return
+            self.ids.add(msg_id)
+        if content:
+            self.messages.append({"role": message_role(sender), "content": content})
+        self.last_timestamp = timestamp
+
+
+class ConversationContextCache:
+    """Keeps each active conversation's LLM history, already cleaned, in memory.
+
+    A cached conversation only reads messages newer than the last one it holds,
+    so building the prompt for a turn no longer costs a full history scan plus
+    regex passes over every assistant reply. save_message appends to the cached
+    history; deleting a conversation or a user drops it.
+    """
+
+    def __init__(self, max_conversations: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self._cache: TTLCache[_History] = TTLCache(
+            max_conversations or config.chat_context_cache_max_conversations,
+            ttl_seconds if ttl_seconds is not None else config.chat_context_cache_ttl_seconds,
+        )
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self.messages_read = 0
+
+    async def get_history(self, db, conversation_id: str) -> List[Dict[str, str]]:
+        """Return the conversation as ``[{"role", "content"}]``, oldest first.
+
+        The list and its dicts are copies; callers may modify them freely.
+        """
+        history = self._cache.get(conversation_id)
+        if history is None:
+            # Not shared until it is cached, so a full load needs no lock
+            history = _History()
+            self.full_loads += 1
+            await self._read(db, conversation_id, history)
+        else:
+            self.incremental_loads += 1
+            async with history.lock:
+                await self._read(db, conversation_id, history)
+        self._cache.put(conversation_id, history)
+        return [dict(m) for m in history.messages]
+
+    async def _read(self, db, conversation_id: str, history: _History) -> None:
+        query = {"conversation_id": conversation_id}
+        if history.last_timestamp is not None:
+            query["timestamp"] = {"$gte": history.last_timestamp}
+        cursor = db.messages.find(query, HISTORY_PROJECTION).sort([("timestamp", 1), ("id", 1)])
+        async for msg in cursor:
+            if msg.get("id") is not None and msg["id"] in history.ids:
+                continue
+            self.messages_read += 1
+            content = msg.get("clean_text")
+            if content is None:
+                # Stored before cleaned text was saved alongside the message
+                content = clean_message_text(msg["sender"], msg["text"])
+            history.append(msg.get("id"), msg["sender"], content, msg["timestamp"])
+
+    def record_message(self, conversation_id: str, msg_id: str, sender: str, clean_text: str,
+                       timestamp: datetime) -> None:
+        """Append a just-saved message to the cached history, if that conversation is cached."""
+        history = self._cache.pop(conversation_id)
+        if history is None:
+            return
+        timestamp = _stored_timestamp(timestamp)
+        if history.last_timestamp is not None and timestamp < history.last_timestamp:
+            # Backdated message: it belongs before what we hold, so reload next time
+            return
+        history.append(msg_id, sender, clean_text, timestamp)
+        self._cache.put(conversation_id, history)
+
+    def invalidate(self, conversation_ids: Iterable[str]) -> None:
+        for conversation_id in conversation_ids:
+            self._cache.pop(conversation_id)
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "full_loads": self.full_loads,
+            "incremental_loads": self.incremental_loads,
+            "messages_read": self.messages_read,
+        }
+
+
+conversation_context_cache = ConversationContextCache()
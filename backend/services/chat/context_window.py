@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import httpx
+from pymongo.errors import PyMongoError
+
+from backend.config import config
+from backend.services.chat.context_cache import clean_message_text
+from backend.services.llm.client_pool import llm_client_pool
+from backend.services.llm.endpoint_router import endpoint_router, is_endpoint_failure
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# Role/separator tokens the chat template adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+_CJK_RE = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+SUMMARY_PROMPT = (
+    "Update the running summary of the conversation so far. Keep names, numbers, decisions, "
+    "open questions and anything the user asked to remember; drop small talk. Reply with the "
+    "summary only, in the language of the conversation, in at most {max_tokens} tokens."
+)
+
+
+class TokenCounter:
+    """Counts tokens with a local tokenizer.json, or estimates them when it is unavailable.
+
+    The count approximates the chat model's tokenizer; the budget is a guard
+    against overflowing the context window, not an exact accounting.
+    """
+
+    def __init__(self, tokenizer_path=None):
+        self._tokenizer = None
+        path = tokenizer_path or config.chat_tokenizer_path
+        try:
+            from tokenizers import Tokenizer
+            self._tokenizer = Tokenizer.from_file(str(path))
+            self._tokenizer.no_truncation()
+            self._tokenizer.no_padding()
+        except Exception as e:
+            logger.warning(f"Tokenizer unavailable ({e}); estimating prompt tokens from text length")
+        self.count = lru_cache(maxsize=4096)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def _count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        # CJK characters are roughly one token each; other text averages ~4 characters per token
+        cjk = len(_CJK_RE.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+    def message_tokens(self, message: Dict[str, str]) -> int:
+        return self.count(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_content(body) -> str:
+    """The message text of a non-streamed chat completion; ValueError if it has none."""
+    choices = body.get("choices") if isinstance(body, dict) else None
+    if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+        raise ValueError("malformed summary response")
+    message = choices[0].get("message")
+    content = message.get("content") if isinstance(message, dict) else None
+    if content is not None and not isinstance(content, str):
+        raise ValueError("malformed summary response")
+    return content or ""
+
+
+class Summary(NamedTuple):
+    text: str
+    covers: int  # number of leading history messages folded into the summary
+
+
+class ContextUsage(NamedTuple):
+    prompt_tokens: int
+    budget: int
+    history_messages: int
+    kept_messages: int
+    summarized_messages: int
+    dropped_messages: int  # outside the budget and not (yet) covered by the summary
+    summary_covers: int  # history messages the current summary covers (0 without a summary)
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-Context-Tokens": str(self.prompt_tokens),
+            "X-Context-Budget": str(self.budget),
+            "X-Context-Kept-Messages": str(self.kept_messages),
+            "X-Context-Summarized-Messages": str(self.summarized_messages),
+            "X-Context-Dropped-Messages": str(self.dropped_messages),
+        }
+
+
+class ContextWindow:
+    """Fits conversation history plus the current (RAG/web-augmented) turn into a token budget.
+
+    The newest messages are kept verbatim; older ones are represented by a
+    rolling summary. When the kept window moves past what the summary covers,
+    :meth:`summarize_later` extends the summary in a background task once the
+    turn's response has finished streaming, so no request waits on it and it
+    does not compete with the reply for the LLM.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None):
+        self.counter = counter or TokenCounter()
+        self._summaries: TTLCache[Summary] = TTLCache(
+            config.chat_context_cache_max_conversations, config.chat_context_cache_ttl_seconds
+        )
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.prompt_tokens = RollingStats()
+        self.trimmed_requests = 0
+        self.summaries_generated = 0
+        self.summary_errors = 0
+        self.summary_seconds = RollingStats()
+
+    async def _load_summary(self, db, conversation_id: str, conversation: Optional[dict] = None) -> Optional[Summary]:
+        summary = self._summaries.get(conversation_id)
+        if summary is not None:
+            return summary
+        doc = conversation if conversation is not None else await db.conversations.find_one(
+            {"id": conversation_id}, {"_id": 0, "context_summary": 1, "context_summary_covers": 1}
+        )
+        if doc and doc.get("context_summary"):
+            summary = Summary(doc["context_summary"], int(doc.get("context_summary_covers", 0)))
+            self._summaries.put(conversation_id, summary)
+        return summary
+
+    async def fit(self, db, conversation_id: Optional[str], history: List[Dict[str, str]],
+                  current: Dict[str, str], conversation: Optional[dict] = None) -> Tuple[List[Dict[str, str]], ContextUsage]:
+        """Return the messages to send and how the budget was spent.
+
+        ``conversation`` is the conversation document when the caller already read
+        it (with the context_summary fields); it saves reading it again.
+        """
+        budget = max(1, int(config.chat_context_token_budget))
+        used = self.counter.message_tokens(current)
+        # Walk back from the newest message until the budget runs out
+        start = len(history)
+        while start > 0:
+            cost = self.counter.message_tokens(history[start - 1])
+            if used + cost > budget:
+                break
+            used += cost
+            start -= 1
+
+        summary = None
+        if start > 0 and conversation_id:
+            summary = await self._load_summary(db, conversation_id, conversation)
+            if summary is not None:
+                summary_message = self._summary_message(summary)
+                summary_cost = self.counter.message_tokens(summary_message)
+                # Make room for the summary by giving up the oldest kept messages
+                while start < len(history) and used + summary_cost > budget:
+                    used -= self.counter.message_tokens(history[start])
+                    start += 1
+                used += summary_cost
+
+        messages = ([self._summary_message(summary)] if summary else []) + history[start:] + [current]
+        covered = min(summary.covers, start) if summary else 0
+        usage = ContextUsage(
+            prompt_tokens=used,
+            budget=budget,
+            history_messages=len(history),
+            kept_messages=len(history) - start,
+            summarized_messages=covered,
+            dropped_messages=start - covered,
+            summary_covers=summary.covers if summary else 0,
+        )
+        self.prompt_tokens.observe(used)
+        if start > 0:
+            self.trimmed_requests += 1
+        return messages, usage
+
+    @staticmethod
+    def _summary_message(summary: Summary) -> Dict[str, str]:
+        return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary.text}"}
+
+    def summarize_later(self, db, conversation_id: Optional[str], history: List[Dict[str, str]],
+                        usage: ContextUsage, model: str) -> None:
+        """Extend the summary over messages that fell out of the window, in the background."""
+        window_start = usage.history_messages - usage.kept_messages
+        if not (config.chat_summary_enabled and conversation_id) or window_start <= usage.summary_covers:
+            return
+        if conversation_id in self._refreshing:
+            return
+        self._refreshing.add(conversation_id)
+        summary = self._summaries.get(conversation_id)
+        task = asyncio.create_task(
+            self._refresh(db, conversation_id, history[:window_start], summary, model)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, db, conversation_id: str, older: List[Dict[str, str]],
+                       summary: Optional[Summary], model: str) -> None:
+        started = time.monotonic()
+        try:
+            covered = summary.covers if summary else 0
+            # Fold in at most one budget's worth of messages per call; a long backlog
+            # catches up over the next few turns instead of overflowing the summarizer
+            budget = max(1, int(config.chat_context_token_budget))
+            end, used = covered, 0
+            while end < len(older) and (end == covered or used + self.counter.message_tokens(older[end]) <= budget):
+                used += self.counter.message_tokens(older[end])
+                end += 1
+            new_messages = older[covered:end]
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+            prompt = SUMMARY_PROMPT.format(max_tokens=int(config.chat_summary_max_tokens))
+            messages = [{"role": "system", "content": prompt}]
+            if summary:
+                messages.append({"role": "user", "content": f"Current summary:\n{summary.text}"})
+            messages.append({"role": "user", "content": f"New messages:\n{transcript}"})
+            payload = {
+                "model": model,
+                "messages": messages,
+                "stream": False,
+                "max_tokens": int(config.chat_summary_max_tokens) * 4,  # reasoning models think first
+            }
+            candidates = endpoint_router.candidates()
+            if not candidates:
+                raise ValueError("all LLM endpoints are unavailable (circuit open)")
+            base_url = candidates[0]
+            # Tracked like chat streams, so the router sees this load and its failures
+            async with endpoint_router.track(base_url) as health:
+                try:
+                    client = llm_client_pool.get(base_url)
+                    response = await client.post("/v1/chat/completions", json=payload,
+                                                 timeout=config.llm_request_timeout_seconds)
+                except httpx.RequestError:
+                    health.record_failure()
+                    raise
+                if is_endpoint_failure(response.status_code):
+                    health.record_failure()
+                else:
+                    # The whole response time, not a time to first byte; leave the TTFB score alone
+                    health.record_success(None)
+                response.raise_for_status()
+            text = clean_message_text("assistant", _summary_content(response.json()))
+            if not text:
+                raise ValueError("empty summary")
+            updated = Summary(text, end)
+            self._summaries.put(conversation_id, updated)
+            await db.conversations.update_one(
+                {"id": conversation_id},
+                {"$set": {"context_summary": updated.text, "context_summary_covers": updated.covers}}
+            )
+            self.summaries_generated += 1
+            self.summary_seconds.observe(time.monotonic() - started)
+            logger.info(f"Summarized {len(new_messages)} messages of conversation {conversation_id}")
+        except (httpx.RequestError, httpx.HTTPStatusError, ValueError, IndexError, KeyError, TypeError,
+                PyMongoError) as e:
+            self.summary_errors += 1
+            logger.warning(f"Failed to summarize conversation {conversation_id}: {e}")
+        finally:
+            self._refreshing.discard(conversation_id)
+
+    def stats(self) -> dict:
+        return {
+            "budget": int(config.chat_context_token_budget),
+            "exact_tokenizer": self.counter.exact,
+            "prompt_tokens": self.prompt_tokens.summary(digits=0),
+            "trimmed_requests": self.trimmed_requests,
+            "summaries_generated": self.summaries_generated,
+            "summary_errors": self.summary_errors,
+            "summary_seconds": self.summary_seconds.summary(),
+            "summaries_in_flight": len(self._refreshing),
+        }
+
+
+context_window = ContextWindow()
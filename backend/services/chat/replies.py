@@ -0,0 +1,211 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from backend.models import Message
+from backend.services.chat.context_cache import clean_message_text, conversation_context_cache
+from backend.utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# Tags that switch state, per state; the same machine as parseStreamByTags in the frontend
+_TRANSITIONS = {
+    "seeking": {"<think>": "in_think", "<answer>": "in_answer"},
+    "in_think": {"</think>": "seeking"},
+    "in_answer": {"</answer>": "seeking"},
+}
+
+
+async def store_message(db, message: Message) -> Message:
+    """Insert a message and bump its conversation's last_updated."""
+    # Store the LLM-ready text too, so building chat context never re-cleans old replies
+    clean_text = clean_message_text(message.sender, message.text)
+    await db.messages.insert_one({**message.dict(), "clean_text": clean_text})
+    conversation_context_cache.record_message(
+        message.conversation_id, message.id, message.sender, clean_text, message.timestamp
+    )
+    await db.conversations.update_one(
+        {"id": message.conversation_id},
+        {"$set": {"last_updated": message.timestamp}}
+    )
+    return message
+
+
+class StreamedReply:
+    """The assistant reply, rebuilt from the upstream SSE bytes as they are relayed.
+
+    Chunks are split into SSE lines as they arrive and the ``delta.content``
+    of each ``data:`` line runs through the frontend's think/answer state
+    machine, so the stored text and thinking duration match what the user
+    saw. Non-JSON data lines are answer text, as the frontend shows them.
+    """
+
+    def __init__(self, conversation_id: str, started: Optional[float] = None):
+        self.conversation_id = conversation_id
+        self.started = started if started is not None else time.monotonic()
+        self.thinking: List[str] = []
+        self.answer: List[str] = []
+        self.thinking_duration: Optional[float] = None
+        self.citations: Optional[List[dict]] = None
+        self.web_search_state: Optional[str] = None
+        self.rag_state: Optional[str] = None
+        self._state = "seeking"
+        self._line_tail = b""
+        self._tag_tail = ""  # start of a tag split across deltas
+
+    @property
+    def has_content(self) -> bool:
+        return bool(self.thinking or self.answer or self._tag_tail)
+
+    def feed(self, chunk: bytes) -> None:
+        lines = (self._line_tail + chunk).split(b"\n")
+        self._line_tail = lines.pop()
+        for line in lines:
+            self._feed_line(line)
+
+    def _feed_line(self, line: bytes) -> None:
+        line = line.rstrip(b"\r")
+        if not line.startswith(b"data:"):
+            return
+        data = line[5:].decode("utf-8", errors="replace")
+        if data.startswith(" "):
+            data = data[1:]
+        if not data or data.startswith("[DONE]"):
+            return
+        try:
+            parsed = json.loads(data)
+        except ValueError:
+            self.add_text(data)
+            return
+        try:
+            content = parsed["choices"][0]["delta"].get("content")
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return
+        if content:
+            self.add_text(content)
+
+    def add_text(self, text: str) -> None:
+        """Append model output (or a notice shown in its place) to the reply."""
+        buffer = self._tag_tail + text
+        self._tag_tail = ""
+        i = 0
+        while i < len(buffer):
+            lt = buffer.find("<", i)
+            if lt == -1:
+                self._append(buffer[i:])
+                return
+            self._append(buffer[i:lt])
+            transitions = _TRANSITIONS[self._state]
+            tag = next((t for t in transitions if buffer.startswith(t, lt)), None)
+            if tag is not None:
+                self._state = transitions[tag]
+                i = lt + len(tag)
+            elif any(t.startswith(buffer[lt:]) for t in transitions):
+                self._tag_tail = buffer[lt:]
+                return
+            else:
+                self._append("<")
+                i = lt + 1
+
+    def _append(self, text: str) -> None:
+        if not text:
+            return
+        if self._state == "in_think":
+            self.thinking.append(text)
+            return
+        if self.thinking and self.thinking_duration is None:
+            # Thinking ends with the first answer token
+            self.thinking_duration = time.monotonic() - self.started
+        self.answer.append(text)
+
+    def finish(self) -> None:
+        if self._line_tail:
+            self._feed_line(self._line_tail)
+            self._line_tail = b""
+        if self._tag_tail:
+            tail, self._tag_tail = self._tag_tail, ""
+            self._append(tail)
+        if self.thinking_duration is None:
+            self.thinking_duration = time.monotonic() - self.started
+
+    def to_message(self, partial: bool = False) -> Message:
+        return Message(
+            conversation_id=self.conversation_id,
+            sender="assistant",
+            text=f"<think>{''.join(self.thinking)}</think><answer>{''.join(self.answer)}</answer>",
+            timestamp=datetime.now(timezone.utc),
+            thinking_duration=self.thinking_duration,
+            citations=self.citations or [],
+            web_search_state=self.web_search_state,
+            rag_state=self.rag_state,
+            partial=True if partial else None,
+        )
+
+
+class ReplyStore:
+    """Writes streamed assistant replies to Mongo from the chat stream.
+
+    The client used to POST the finished reply back to /api/chat/messages: a
+    second authenticated request, ownership check and upload of the whole
+    text per turn. The stream handler now stores it when the stream ends, or
+    stores what was received, marked partial, when the client goes away.
+    Saves run as tasks so a cancelled stream cannot interrupt them halfway;
+    :meth:`drain` waits for the ones still running at shutdown.
+    """
+
+    def __init__(self):
+        self._pending: Set[asyncio.Task] = set()
+        self.saved = 0
+        self.partial = 0
+        self.failures = 0
+        self.save_seconds = RollingStats()
+
+    def _spawn(self, db, reply: StreamedReply, partial: bool) -> "asyncio.Task[Optional[Message]]":
+        reply.finish()
+        task = asyncio.create_task(self._store(db, reply.to_message(partial)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _store(self, db, message: Message) -> Optional[Message]:
+        started = time.monotonic()
+        try:
+            await store_message(db, message)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to store assistant reply for conversation {message.conversation_id}: {e}")
+            return None
+        self.save_seconds.observe(time.monotonic() - started)
+        if message.partial:
+            self.partial += 1
+        else:
+            self.saved += 1
+        return message
+
+    async def save(self, db, reply: StreamedReply) -> Optional[Message]:
+        """Store a finished reply; returns None if the write failed."""
+        return await asyncio.shield(self._spawn(db, reply, partial=False))
+
+    def save_partial(self, db, reply: StreamedReply) -> None:
+        """Store what arrived before the client disconnected, without waiting for it."""
+        if reply.has_content:
+            self._spawn(db, reply, partial=True)
+
+    async def drain(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "saved": self.saved,
+            "partial": self.partial,
+            "failures": self.failures,
+            "pending": len(self._pending),
+            "save_ms": self.save_seconds.summary(scale=1000, digits=1),
+        }
+
+
+reply_store = ReplyStore()
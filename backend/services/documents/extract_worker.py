@@ -0,0 +1,135 @@
+import logging
+from typing import Iterator, List
+
+# Python 3.12-friendly document extractors
+from pypdf import PdfReader
+from docx import Document as DocxDocument
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# Granularity of the segments handed to the splitter
+DOCX_PARAGRAPHS_PER_SEGMENT = 50
+XLSX_ROWS_PER_SEGMENT = 200
+TXT_CHARS_PER_SEGMENT = 64 * 1024
+
+
+def _pdf_segments(path: str) -> Iterator[str]:
+    reader = PdfReader(path)
+    for page in reader.pages:
+        page_text = page.extract_text() or ''
+        if page_text:
+            yield page_text
+
+
+def _docx_segments(path: str) -> Iterator[str]:
+    doc = DocxDocument(path)
+    paras = []
+    for p in doc.paragraphs:
+        if p.text:
+            paras.append(p.text)
+        if len(paras) >= DOCX_PARAGRAPHS_PER_SEGMENT:
+            yield '\n'.join(paras)
+            paras = []
+    # Extract text from tables as well
+    for table in getattr(doc, 'tables', []):
+        for row in table.rows:
+            paras.append('\t'.join(cell.text for cell in row.cells))
+        if len(paras) >= DOCX_PARAGRAPHS_PER_SEGMENT:
+            yield '\n'.join(paras)
+            paras = []
+    if paras:
+        yield '\n'.join(paras)
+
+
+def _xlsx_segments(path: str) -> Iterator[str]:
+    # read_only streams rows instead of materializing every sheet
+    wb = load_workbook(path, data_only=True, read_only=True)
+    try:
+        for ws in wb.worksheets:
+            lines = []
+            for row in ws.iter_rows(values_only=True):
+                str_vals = [str(v) for v in row if isinstance(v, (str, int, float)) and v is not None]
+                if str_vals:
+                    lines.append('\t'.join(str_vals))
+                if len(lines) >= XLSX_ROWS_PER_SEGMENT:
+                    yield '\n'.join(lines)
+                    lines = []
+            if lines:
+                yield '\n'.join(lines)
+    finally:
+        wb.close()
+
+
+def _txt_segments(path: str) -> Iterator[str]:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            block = f.read(TXT_CHARS_PER_SEGMENT)
+            if not block:
+                break
+            yield block
+
+
+_EXTRACTORS = {
+    '.pdf': _pdf_segments,
+    '.docx': _docx_segments,
+    '.xlsx': _xlsx_segments,
+    '.txt': _txt_segments,
+}
+
+
+def text_segments(path: str, ext: str) -> Iterator[str]:
+    """Yield the text of a file piece by piece: PDF pages, DOCX paragraph blocks, XLSX row blocks."""
+    extractor = _EXTRACTORS.get(ext)
+    if extractor is None:
+        return iter(())
+    return extractor(path)
+
+
+# --- Worker process entry points (must stay importable without backend.config) ---
+
+def init_worker(max_memory_mb: int) -> None:
+    """Cap the address space of an extraction worker so one hostile file cannot exhaust the host."""
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        # Not supported on this platform (e.g. Windows, or macOS rejecting RLIMIT_AS)
+        pass
+
+
+def serve(conn, max_memory_mb: int) -> None:
+    """Worker process loop: run ``(fn, args)`` jobs received on ``conn`` until the parent closes it."""
+    init_worker(max_memory_mb)
+    conn.send((True, None))  # ready: imports done, so job timeouts exclude start-up
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            result = (True, fn(*args))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or the exception did not pickle
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+def pdf_page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def pdf_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Extract pages ``[start, stop)``; empty pages are returned as empty strings."""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, min(stop, len(reader.pages)))]
+
+
+def extract_segments(path: str, ext: str) -> List[str]:
+    return list(text_segments(path, ext))
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Set
+
+from backend.config import config
+from backend.services.documents import extract_worker
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.xlsx')
+WORKER_START_TIMEOUT_SECONDS = 60.0
+
+
+class ExtractionTimeout(Exception):
+    """Raised when a worker job takes longer than DOCUMENT_EXTRACT_TIMEOUT_SECONDS."""
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised when an extraction worker dies mid-job (e.g. it hit the memory cap)."""
+
+
+class _Worker:
+    """One extraction process; the extractor owns it, so a stuck job can be killed on its own."""
+
+    def __init__(self, ctx, max_memory_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=extract_worker.serve, args=(child, max_memory_mb), name="document-extract", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        """Blocking: wait for the process to finish importing the parsers."""
+        if not self.conn.poll(WORKER_START_TIMEOUT_SECONDS):
+            raise EOFError("Extraction worker did not start")
+        self.conn.recv()
+        self.ready = True
+
+    def run(self, fn, args):
+        """Blocking: send one job and wait for its ``(ok, value)`` reply."""
+        self.conn.send((fn, args))
+        return self.conn.recv()
+
+    def kill(self) -> None:
+        # The thread blocked in run() sees EOF once the process is gone; the pipe closes with the object
+        self.process.terminate()
+
+
+class FormatStats:
+    def __init__(self):
+        self.files = 0
+        self.failures = 0
+        self.segments = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "files": self.files,
+            "failures": self.failures,
+            "segments": self.segments,
+            "segments_per_sec": round(self.segments / self.seconds, 2) if self.seconds else None,
+            "mb_per_sec": round(self.bytes / (1024 * 1024) / self.seconds, 3) if self.seconds else None,
+        }
+
+
+class DocumentExtractor:
+    """Extracts document text on a bounded pool of worker processes.
+
+    pypdf, python-docx and openpyxl are pure Python and hold the GIL, so they
+    run in separate processes. PDFs are cut into page ranges that are
+    extracted in parallel and yielded back in page order. Each worker has an
+    address-space cap, and each job (a page count, a page range, a whole
+    DOCX/XLSX) gets DOCUMENT_EXTRACT_TIMEOUT_SECONDS of worker time. A job
+    that overruns has its own process terminated and replaced; jobs of other
+    uploads on the other workers carry on.
+    """
+
+    def __init__(self):
+        workers = int(config.document_extract_workers) or min(4, os.cpu_count() or 1)
+        self.max_workers = max(1, workers)
+        # spawn avoids forking a parent that already runs torch and event-loop threads
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._idle: List[_Worker] = []
+        self._workers: Set[_Worker] = set()
+        self.stats_by_format: Dict[str, FormatStats] = defaultdict(FormatStats)
+        self.timeouts = 0
+        self.crashes = 0
+
+    def _take_worker(self) -> _Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.process.is_alive():
+                return worker
+            self._discard(worker)
+        worker = _Worker(self._ctx, int(config.document_extract_max_memory_mb))
+        self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker) -> None:
+        self._workers.discard(worker)
+        worker.kill()
+
+    async def _call(self, fn, *args):
+        async with self._slots:
+            worker = self._take_worker()
+            try:
+                if not worker.ready:
+                    await asyncio.to_thread(worker.wait_ready)
+                ok, value = await asyncio.wait_for(
+                    asyncio.to_thread(worker.run, fn, args), float(config.document_extract_timeout_seconds)
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._discard(worker)
+                raise ExtractionTimeout(
+                    f"Text extraction exceeded {config.document_extract_timeout_seconds:.0f}s"
+                ) from None
+            except (EOFError, OSError) as e:
+                self.crashes += 1
+                self._discard(worker)
+                raise WorkerCrashed("Extraction worker exited mid-job") from e
+            except BaseException:
+                # Cancelled: the job is still running, so the worker cannot be handed to the next caller
+                self._discard(worker)
+                raise
+            self._idle.append(worker)
+        if not ok:
+            raise value
+        return value
+
+    async def _pdf_segments(self, path: str) -> AsyncIterator[str]:
+        page_count = await self._call(extract_worker.pdf_page_count, path)
+        step = max(1, int(config.document_pdf_pages_per_task))
+        ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+        # Keep at most one range per worker in flight so one PDF cannot monopolize the queue
+        in_flight: List[asyncio.Task] = []
+        next_range = 0
+        try:
+            while next_range < len(ranges) or in_flight:
+                while next_range < len(ranges) and len(in_flight) < self.max_workers:
+                    start, stop = ranges[next_range]
+                    in_flight.append(asyncio.ensure_future(
+                        self._call(extract_worker.pdf_page_range, path, start, stop)
+                    ))
+                    next_range += 1
+                pages = await in_flight.pop(0)
+                for page_text in pages:
+                    if page_text:
+                        yield page_text
+        finally:
+            # Consumer stopped early or a range failed: drop the ranges still queued
+            for task in in_flight:
+                task.cancel()
+
+    async def _txt_segments(self, path: str) -> AsyncIterator[str]:
+        # Plain text needs no parsing; read blocks on a thread instead of a worker process
+        segments = extract_worker.text_segments(path, '.txt')
+        done = object()
+        while True:
+            segment = await asyncio.to_thread(next, segments, done)
+            if segment is done:
+                break
+            yield segment
+
+    async def _worker_segments(self, path: str, ext: str) -> AsyncIterator[str]:
+        # DOCX and XLSX parse as a whole; the worker returns all of the file's segments at once
+        for segment in await self._call(extract_worker.extract_segments, path, ext):
+            yield segment
+
+    async def iter_segments(self, path: str, ext: str) -> AsyncIterator[str]:
+        """Yield a file's text piece by piece without blocking the event loop."""
+        stats = self.stats_by_format[ext]
+        stats.files += 1
+        started = time.monotonic()
+        paused = 0.0  # time spent suspended in the consumer, excluded from throughput
+        try:
+            if ext == '.pdf':
+                source = self._pdf_segments(path)
+            elif ext == '.txt':
+                source = self._txt_segments(path)
+            else:
+                source = self._worker_segments(path, ext)
+            async for segment in source:
+                stats.segments += 1
+                yielded_at = time.monotonic()
+                yield segment
+                paused += time.monotonic() - yielded_at
+            stats.bytes += os.path.getsize(path)
+        except Exception:
+            stats.failures += 1
+            raise
+        finally:
+            stats.seconds += time.monotonic() - started - paused
+
+    def shutdown(self) -> None:
+        for worker in list(self._workers):
+            self._discard(worker)
+        self._idle.clear()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "running": len(self._workers),
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "formats": {ext.lstrip('.'): s.summary() for ext, s in self.stats_by_format.items()},
+        }
+
+
+document_extractor = DocumentExtractor()
+
+
+def iter_text_segments(path: str, ext: str) -> AsyncIterator[str]:
+    return document_extractor.iter_segments(path, ext)
@@ -0,0 +1,316 @@
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from backend.config import config
+from backend.services.documents.extraction import iter_text_segments
+from backend.services.embeddings.cache import chunk_embedding_cache
+from backend.services.embeddings.vector_index import vector_index
+from backend.utils.cache import TTLCache
+from backend.utils.embedding_codec import EMBEDDING_FIELDS, decode_embeddings, encode_embedding
+
+logger = logging.getLogger(__name__)
+
+SPOOL_READ_BYTES = 1024 * 1024
+# Text is buffered up to this size before splitting, so chunks can span page boundaries
+SPLIT_BUFFER_CHARS = 8000
+# Extracted text kept on the document record for GET /api/documents/{id}
+DOCUMENT_CONTENT_MAX_CHARS = 1_000_000
+
+
+async def spool_upload(file: UploadFile, suffix: str, max_bytes: int) -> Tuple[str, int, str]:
+    """Copy an upload to a temp file in fixed-size reads; returns (path, size, sha256 hex digest)."""
+    size = 0
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        try:
+            while True:
+                block = await file.read(SPOOL_READ_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large (max {max_bytes // (1024 * 1024)}MB)"
+                    )
+                digest.update(block)
+                tmp_file.write(block)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    return tmp_file.name, size, digest.hexdigest()
+
+
+class ChunkAccumulator:
+    """Splits a stream of text segments into chunks.
+
+    The last chunk of every split is held back and re-split together with
+    the next segment, so a paragraph crossing a page boundary still ends up
+    in one chunk.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._buffer = ""
+
+    def feed(self, segment: str) -> List[str]:
+        self._buffer = f"{self._buffer}\n{segment}" if self._buffer else segment
+        if len(self._buffer) < SPLIT_BUFFER_CHARS:
+            return []
+        chunks = self.splitter.split_text(self._buffer)
+        if not chunks:
+            self._buffer = ""
+            return []
+        self._buffer = chunks[-1]
+        return chunks[:-1]
+
+    def flush(self) -> List[str]:
+        chunks = self.splitter.split_text(self._buffer) if self._buffer.strip() else []
+        self._buffer = ""
+        return chunks
+
+
+class DocumentDeletedError(Exception):
+    """The document record disappeared while its upload was still being ingested."""
+
+
+class ExtractedFile(NamedTuple):
+    content: str
+    chunks: List[str]
+    segments: int
+
+
+# Content hash -> extracted text and chunk list; entries live as long as the documents they serve
+extracted_file_cache: TTLCache[ExtractedFile] = TTLCache(
+    config.document_cache_max_files, config.document_ttl_hours * 3600
+)
+dedup_counters = {"uploads": 0, "memory_hits": 0, "stored_copies": 0}
+
+
+def dedup_stats() -> dict:
+    uploads = dedup_counters["uploads"]
+    reused = dedup_counters["memory_hits"] + dedup_counters["stored_copies"]
+    return {
+        **dedup_counters,
+        "dedup_rate": round(reused / uploads, 3) if uploads else None,
+        "files": extracted_file_cache.stats(),
+        "chunk_embeddings": chunk_embedding_cache.stats(),
+    }
+
+
+async def _store_batch(db, document_id: str, user_email: str, start_index: int, chunks: List[str],
+                       created_at: datetime, expires_at: datetime) -> None:
+    """Embed one batch of chunks and write it with its vectors in a single insert."""
+    embeddings = await chunk_embedding_cache.embed(chunks)
+    now = datetime.utcnow()
+    await db.document_chunks.insert_many([
+        {
+            "document_id": document_id,
+            "chunk_index": start_index + i,
+            "content": chunk,
+            "created_at": now,
+            # Chunks expire with their document through the document_chunks TTL index
+            "expires_at": expires_at,
+            **encode_embedding(embeddings[i], config.embedding_storage_format),
+        } for i, chunk in enumerate(chunks)
+    ])
+    # Progress update also returns the current conversation, which the client may attach mid-ingestion
+    doc = await db.documents.find_one_and_update(
+        {"_id": document_id},
+        {"$inc": {"chunk_count": len(chunks), "embedded_count": len(chunks)}},
+        projection={"conversation_id": 1},
+    )
+    if doc is None:
+        raise DocumentDeletedError(document_id)
+    await vector_index.add_chunks(
+        user_email, document_id, doc.get("conversation_id"),
+        list(range(start_index, start_index + len(chunks))), embeddings, created_at, expires_at
+    )
+
+
+async def _mark_ready(db, document_id: str, content: str, segments: int) -> None:
+    await db.documents.update_one(
+        {"_id": document_id},
+        {"$set": {
+            "status": "ready",
+            "content": content,
+            "segments_processed": segments,
+            "completed_at": datetime.utcnow(),
+        }}
+    )
+
+
+async def _ingest_cached(db, document_id: str, user_email: str, cached: ExtractedFile,
+                         created_at: datetime, expires_at: datetime) -> None:
+    """Store a file whose text and chunks are already in memory; embeddings come from the chunk cache."""
+    batch_size = max(1, int(config.document_ingest_batch_size))
+    for start in range(0, len(cached.chunks), batch_size):
+        await _store_batch(db, document_id, user_email, start, cached.chunks[start:start + batch_size],
+                           created_at, expires_at)
+    await _mark_ready(db, document_id, cached.content, cached.segments)
+
+
+async def _copy_stored_document(db, document_id: str, user_email: str, content_hash: str,
+                                created_at: datetime, expires_at: datetime) -> bool:
+    """Copy chunks and vectors from a live document with the same content hash.
+
+    Returns False when there is no complete copy to reuse; any partial copy is
+    removed so the caller can fall back to extracting the file.
+    """
+    source = await db.documents.find_one(
+        {
+            "content_hash": content_hash,
+            "status": "ready",
+            "_id": {"$ne": document_id},
+            "expires_at": {"$gt": datetime.utcnow()},
+        },
+        {"content": 1, "chunk_count": 1, "segments_processed": 1},
+    )
+    if not source or not source.get("chunk_count"):
+        return False
+
+    batch_size = max(1, int(config.document_ingest_batch_size))
+    projection = {"_id": 0, "chunk_index": 1, "content": 1, **{field: 1 for field in EMBEDDING_FIELDS}}
+    cursor = db.document_chunks.find({"document_id": source["_id"]}, projection).sort("chunk_index", 1)
+    chunks: List[str] = []
+    copied = 0
+    try:
+        async for batch in _batched(cursor, batch_size):
+            now = datetime.utcnow()
+            await db.document_chunks.insert_many([
+                {**chunk, "document_id": document_id, "created_at": now, "expires_at": expires_at}
+                for chunk in batch
+            ])
+            embeddings = decode_embeddings(batch)
+            texts = [chunk["content"] for chunk in batch]
+            chunk_embedding_cache.put_many(texts, embeddings)
+            chunks.extend(texts)
+            doc = await db.documents.find_one_and_update(
+                {"_id": document_id},
+                {"$inc": {"chunk_count": len(batch), "embedded_count": len(batch)}},
+                projection={"conversation_id": 1},
+            )
+            if doc is None:
+                raise DocumentDeletedError(document_id)
+            await vector_index.add_chunks(
+                user_email, document_id, doc.get("conversation_id"),
+                [chunk["chunk_index"] for chunk in batch], embeddings, created_at, expires_at
+            )
+            copied += len(batch)
+    finally:
+        complete = copied == source["chunk_count"]
+        if not complete:
+            # The source was deleted (or its chunks expired) mid-copy
+            await db.document_chunks.delete_many({"document_id": document_id})
+            await vector_index.remove_documents(user_email, [document_id])
+            await db.documents.update_one(
+                {"_id": document_id}, {"$set": {"chunk_count": 0, "embedded_count": 0}}
+            )
+    if not complete:
+        return False
+
+    content = source.get("content", "")
+    segments = source.get("segments_processed", 0)
+    await _mark_ready(db, document_id, content, segments)
+    if len(content) < DOCUMENT_CONTENT_MAX_CHARS:
+        extracted_file_cache.put(content_hash, ExtractedFile(content, chunks, segments))
+    return True
+
+
+async def _batched(cursor, size: int):
+    batch = []
+    async for item in cursor:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest_document(db, document_id: str, path: str, ext: str, user_email: str,
+                          created_at: datetime, expires_at: datetime,
+                          content_hash: Optional[str] = None) -> None:
+    """Extract, split, embed and store an uploaded file as it is read.
+
+    Progress is written to the document record (``status``, ``chunk_count``,
+    ``embedded_count``) after every batch and served by the status endpoint.
+    A file whose content hash was seen before skips extraction: its chunks
+    come from the in-memory cache or are copied from the earlier upload.
+    """
+    batch_size = max(1, int(config.document_ingest_batch_size))
+    accumulator = ChunkAccumulator()
+    pending: List[str] = []
+    all_chunks: List[str] = []
+    next_index = 0
+    content_parts: List[str] = []
+    content_chars = 0
+    segments = 0
+    try:
+        if content_hash:
+            dedup_counters["uploads"] += 1
+            cached = extracted_file_cache.get(content_hash)
+            if cached is not None:
+                dedup_counters["memory_hits"] += 1
+                await _ingest_cached(db, document_id, user_email, cached, created_at, expires_at)
+                logger.info(f"Ingested document {document_id} from cache: {len(cached.chunks)} chunks")
+                return
+            if await _copy_stored_document(db, document_id, user_email, content_hash, created_at, expires_at):
+                dedup_counters["stored_copies"] += 1
+                logger.info(f"Ingested document {document_id} by copying a stored upload with the same content")
+                return
+
+        async for segment in iter_text_segments(path, ext):
+            segments += 1
+            if content_chars < DOCUMENT_CONTENT_MAX_CHARS:
+                content_parts.append(segment[:DOCUMENT_CONTENT_MAX_CHARS - content_chars])
+                content_chars += len(content_parts[-1])
+            pending.extend(accumulator.feed(segment))
+            while len(pending) >= batch_size:
+                batch, pending = pending[:batch_size], pending[batch_size:]
+                await _store_batch(db, document_id, user_email, next_index, batch, created_at, expires_at)
+                next_index += len(batch)
+                all_chunks.extend(batch)
+            await db.documents.update_one({"_id": document_id}, {"$set": {"segments_processed": segments}})
+        pending.extend(accumulator.flush())
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            await _store_batch(db, document_id, user_email, next_index, batch, created_at, expires_at)
+            next_index += len(batch)
+            all_chunks.extend(batch)
+
+        if next_index == 0:
+            await db.documents.update_one(
+                {"_id": document_id},
+                {"$set": {"status": "failed", "ingest_error": "Could not extract text from the uploaded file."}}
+            )
+            return
+        content = '\n'.join(content_parts)
+        await _mark_ready(db, document_id, content, segments)
+        # Only files whose full text fits on the record are cached, which also bounds cache memory
+        if content_hash and content_chars < DOCUMENT_CONTENT_MAX_CHARS:
+            extracted_file_cache.put(content_hash, ExtractedFile(content, all_chunks, segments))
+        logger.info(f"Ingested document {document_id}: {segments} segments, {next_index} chunks")
+    except DocumentDeletedError:
+        logger.info(f"Document {document_id} was deleted during ingestion; discarding its chunks")
+        await db.document_chunks.delete_many({"document_id": document_id})
+        await vector_index.remove_documents(user_email, [document_id])
+    except Exception as e:
+        logger.error(f"Error ingesting document {document_id}: {str(e)}")
+        await db.documents.update_one(
+            {"_id": document_id},
+            {"$set": {"status": "failed", "ingest_error": str(e)}}
+        )
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.config import config
+from backend.services.embeddings.executor import EmbeddingExecutor, embedding_executor
+from backend.utils.metrics import Histogram, RollingStats
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+WAIT_BUCKETS_SECONDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1]
+
+
+class QueryBatcher:
+    """Coalesces concurrent single-text embeddings into one encode call.
+
+    The first caller opens a short window; everyone arriving before it closes
+    (or before ``max_batch`` texts are pending) shares a single batch on the
+    embedding executor, and each caller gets its own row back.
+    """
+
+    def __init__(self, executor: EmbeddingExecutor, window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None):
+        self.executor = executor
+        self.window_seconds = max(0.0, float(window_ms if window_ms is not None else config.embedding_batch_window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch or config.embedding_batch_max_size))
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+        self.errors = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_histogram = Histogram(WAIT_BUCKETS_SECONDS)
+        self.wait_seconds = RollingStats()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed one text, sharing the model call with concurrent callers."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        # Identical concurrent queries are encoded once
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        dispatched = time.perf_counter()
+        self.batches += 1
+        self.texts += len(batch)
+        self.batch_sizes.observe(len(unique_texts))
+        for _, _, enqueued in batch:
+            self.wait_seconds.observe(dispatched - enqueued)
+            self.wait_histogram.observe(dispatched - enqueued)
+        try:
+            vectors = await self.executor.embed(unique_texts)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Batched embedding of {len(unique_texts)} texts failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        rows = {text: vectors[i] for i, text in enumerate(unique_texts)}
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(rows[text])
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window_seconds * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "texts": self.texts,
+            "errors": self.errors,
+            "texts_per_batch": round(self.texts / self.batches, 2) if self.batches else None,
+            "batch_size": self.batch_sizes.summary(),
+            "wait_ms": self.wait_seconds.summary(scale=1000),
+            "wait_ms_histogram": self.wait_histogram.summary(scale=1000),
+        }
+
+
+query_batcher = QueryBatcher(embedding_executor)
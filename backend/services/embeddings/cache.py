@@ -0,0 +1,60 @@
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.config import config
+from backend.services.embeddings.executor import EmbeddingExecutor, embedding_executor
+from backend.utils.cache import TTLCache
+
+
+def chunk_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class ChunkEmbeddingCache:
+    """Embeds document chunks, reusing vectors of chunk texts seen recently.
+
+    Re-uploads of the same handbook, or of a new revision that only touches a
+    few pages, mostly produce chunk texts that were already embedded. Entries
+    live as long as the documents they came from (``DOCUMENT_TTL_HOURS``).
+    """
+
+    def __init__(self, executor: EmbeddingExecutor, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.executor = executor
+        self._cache: TTLCache[np.ndarray] = TTLCache(
+            max_entries or config.embedding_cache_max_entries,
+            ttl_seconds if ttl_seconds is not None else config.document_ttl_hours * 3600,
+        )
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` and return a ``(len(texts), dim)`` float32 array."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [chunk_key(text) for text in texts]
+        rows = [self._cache.get(key) for key in keys]
+        missing: Dict[bytes, str] = {}
+        for key, text, row in zip(keys, texts, rows):
+            if row is None:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = await self.executor.embed(list(missing.values()))
+            fresh = {}
+            for key, vector in zip(missing, vectors):
+                # Copy so the cache does not pin the whole batch array through a row view
+                fresh[key] = vector.copy()
+                self._cache.put(key, fresh[key])
+            rows = [fresh[key] if row is None else row for key, row in zip(keys, rows)]
+        return np.vstack(rows)
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """Seed the cache with vectors that were already computed (e.g. read back from Mongo)."""
+        for text, vector in zip(texts, embeddings):
+            self._cache.put(chunk_key(text), np.asarray(vector, dtype=np.float32).copy())
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+chunk_embedding_cache = ChunkEmbeddingCache(embedding_executor)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from backend.config import config
+from backend.services.embeddings.model_registry import embedding_model_registry
+from backend.utils.metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingExecutor:
+    """Runs SentenceTransformer inference on a dedicated thread pool.
+
+    ``encode`` releases the GIL inside torch, so a small thread pool keeps the
+    event loop responsive while a model call is running. Admission is bounded
+    by ``max_queue`` and large inputs are split into ``batch_size`` jobs, so a
+    burst of uploads queues behind itself instead of in front of every chat
+    query.
+
+    A slot is held until the job leaves the pool, not until its caller stops
+    waiting: a caller cancelled mid-encode (a disconnected SSE client) does
+    not free a slot while its job still runs. Callers waiting for a slot are
+    not bounded; they are suspended coroutines, costing memory but no pool
+    threads or model time.
+    """
+
+    def __init__(self, model_provider: Callable[[], Any], max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None, batch_size: Optional[int] = None):
+        self.model_provider = model_provider
+        self.max_workers = max(1, int(max_workers or config.embedding_workers))
+        self.max_queue = max(1, int(max_queue or config.embedding_max_queue))
+        self.batch_size = max(1, int(batch_size or config.embedding_batch_size))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="embedding")
+        self._slots = asyncio.Semaphore(self.max_queue)
+        self.admitted = 0  # jobs holding a slot: queued in the pool or running
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.texts_embedded = 0
+        self.errors = 0
+        self.wait_seconds = RollingStats()
+        self.encode_seconds = RollingStats()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # The provider loads the model lazily, so a cold start also happens off the event loop
+        vectors = self.model_provider().encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def _run_job(self, texts: List[str]) -> np.ndarray:
+        enqueued = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await self._slots.acquire()
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            self.wait_seconds.observe(started - enqueued)
+            self.admitted += 1
+            try:
+                job = self._pool.submit(self._encode, texts)
+            except BaseException:
+                self._release()
+                raise
+            # Released when the job finishes (or is cancelled before it starts), even if we stop waiting
+            job.add_done_callback(lambda _: self._release_threadsafe(loop))
+            vectors = await asyncio.wrap_future(job)
+            self.encode_seconds.observe(time.perf_counter() - started)
+            self.texts_embedded += len(texts)
+            return vectors
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.queue_depth -= 1
+
+    def _release(self) -> None:
+        self.admitted -= 1
+        self._slots.release()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop has closed (shutdown cancelled queued jobs); nothing waits on the slots anymore
+            pass
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` and return a ``(len(texts), dim)`` float32 array."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        parts = [
+            await self._run_job(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return parts[0] if len(parts) == 1 else np.vstack(parts)
+
+    async def warmup(self) -> None:
+        """Load the model and run one encode so the first real query is not a cold start."""
+        await self._run_job(["warmup"])
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "max_queue_depth": self.max_queue_depth,
+            "texts_embedded": self.texts_embedded,
+            "errors": self.errors,
+            "wait_ms": self.wait_seconds.summary(scale=1000),
+            "encode_ms": self.encode_seconds.summary(scale=1000),
+        }
+
+
+embedding_executor = EmbeddingExecutor(embedding_model_registry.get)
@@ -0,0 +1,76 @@
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'models', 'all-MiniLM-L6-v2')
+
+
+def _rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class EmbeddingModelRegistry:
+    """Process-wide owner of the SentenceTransformer model.
+
+    The model (and torch) is imported on first use rather than at import
+    time, so workers that never embed anything start at plain FastAPI speed.
+    Set EMBEDDING_WARMUP to load it eagerly during startup instead.
+    """
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH):
+        self.model_path = os.path.abspath(model_path)
+        self._model: Optional[Any] = None
+        self._lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.rss_delta_mb: Optional[float] = None
+        self.parameter_mb: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Any:
+        """Return the shared model, loading it on the calling thread if needed."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def _load(self) -> Any:
+        from sentence_transformers import SentenceTransformer
+
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        model = SentenceTransformer(self.model_path)
+        self.load_seconds = time.perf_counter() - started
+        self.rss_delta_mb = max(0.0, _rss_mb() - rss_before)
+        try:
+            self.parameter_mb = sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024)
+        except Exception:
+            self.parameter_mb = None
+        logger.info(
+            f"Loaded embedding model from {self.model_path} in {self.load_seconds:.2f}s "
+            f"(rss +{self.rss_delta_mb:.1f} MB)"
+        )
+        return model
+
+    def stats(self) -> dict:
+        return {
+            "model_path": self.model_path,
+            "loaded": self.loaded,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "rss_delta_mb": round(self.rss_delta_mb, 1) if self.rss_delta_mb is not None else None,
+            "parameter_mb": round(self.parameter_mb, 1) if self.parameter_mb is not None else None,
+        }
+
+
+embedding_model_registry = EmbeddingModelRegistry()
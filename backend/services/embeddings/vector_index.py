@@ -0,0 +1,554 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from backend.config import config
+from backend.database import get_db
+from backend.utils.embedding_codec import decode_embeddings
+from backend.utils.metrics import RollingStats
+from backend.utils.similarity import normalize_rows, rank_chunks
+
+logger = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE_PER_LIST = 64
+MIN_CAPACITY = 1024
+STRING_COLUMNS = ("document_ids", "conversation_ids")
+
+
+def _epoch(value: Optional[datetime], default: float) -> float:
+    """Mongo returns naive UTC datetimes; convert to epoch seconds."""
+    if not isinstance(value, datetime):
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def train_ivf(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """k-means over a sample of unit rows; returns ``(centroids, list of every row)``.
+
+    Seconds of CPU on a large partition, so it runs on a thread.
+    """
+    n = vectors.shape[0]
+    rng = np.random.default_rng(0)
+    nlist = max(1, int(np.sqrt(n)))
+    sample = vectors[rng.choice(n, min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False)]
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        filled = counts > 0
+        centroids[filled] = sums[filled]
+        centroids = normalize_rows(centroids)
+    return centroids, assign_lists(vectors, centroids)
+
+
+class IndexPartition:
+    """Every chunk vector owned by one user, stored as parallel arrays.
+
+    Vectors are unit-length float32 rows, so relevance is a plain dot product.
+    Conversation and expiry are per-row columns: a query for one
+    conversation is a mask over the user's partition. Partitions that grow
+    past VECTOR_INDEX_IVF_MIN_SIZE also get an IVF coarse quantizer (k-means
+    centroids plus one list assignment per row) and only the closest
+    VECTOR_INDEX_NPROBE lists are scored.
+
+    Rows live in buffers that double in capacity, so a streamed batch is a
+    slice assignment rather than a copy of the whole matrix. Removing rows
+    builds new arrays instead of compacting in place: a view of the first n
+    rows never changes, which lets the quantizer train, and a snapshot be
+    written to disk, on a thread while batches keep arriving.
+    """
+
+    def __init__(self, user_email: str):
+        self.user_email = user_email
+        self._size = 0
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._columns: Dict[str, np.ndarray] = {
+            "document_ids": np.empty(0, dtype="<U36"),
+            "chunk_indices": np.empty(0, dtype=np.int32),
+            "conversation_ids": np.empty(0, dtype="<U36"),
+            "created_at": np.empty(0, dtype=np.float64),
+            "expires_at": np.empty(0, dtype=np.float64),
+        }
+        self._assignments = np.empty(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.ivf_built_size = 0
+        self.ivf_building = False
+        # Bumped whenever rows are removed: row numbers shift, so a quantizer trained before is void
+        self.generation = 0
+        self.reconciled_at = 0.0
+        self.refreshing = False
+        # Changed since it was last written to disk
+        self.dirty = False
+        self.lock = asyncio.Lock()
+        # Serializes writes of this partition's file, which happen outside ``lock``
+        self.save_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    @property
+    def document_ids(self) -> np.ndarray:
+        return self._columns["document_ids"][:self._size]
+
+    @property
+    def chunk_indices(self) -> np.ndarray:
+        return self._columns["chunk_indices"][:self._size]
+
+    @property
+    def conversation_ids(self) -> np.ndarray:
+        return self._columns["conversation_ids"][:self._size]
+
+    @property
+    def created_at(self) -> np.ndarray:
+        return self._columns["created_at"][:self._size]
+
+    @property
+    def expires_at(self) -> np.ndarray:
+        return self._columns["expires_at"][:self._size]
+
+    @property
+    def assignments(self) -> Optional[np.ndarray]:
+        return self._assignments[:self._size] if self.centroids is not None else None
+
+    def document_rows(self) -> Dict[str, Tuple[int, str]]:
+        """``{document_id: (row count, conversation_id)}`` for every indexed document."""
+        if not self._size:
+            return {}
+        ids, first, counts = np.unique(self.document_ids, return_index=True, return_counts=True)
+        conversations = self.conversation_ids[first]
+        return {str(d): (int(c), str(conv)) for d, c, conv in zip(ids, counts, conversations)}
+
+    def _reserve(self, extra: int, dim: int) -> None:
+        if self._size == 0 and self._vectors.shape[1] != dim:
+            self._vectors = np.empty((0, dim), dtype=np.float32)
+        needed = self._size + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, MIN_CAPACITY)
+        vectors = np.empty((capacity, dim), dtype=np.float32)
+        vectors[:self._size] = self.vectors
+        self._vectors = vectors
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        assignments = np.empty(capacity, dtype=np.int32)
+        assignments[:self._size] = self._assignments[:self._size]
+        self._assignments = assignments
+
+    def _fit_string(self, name: str, value: str) -> None:
+        column = self._columns[name]
+        width = column.dtype.itemsize // 4
+        if len(value) > width:
+            self._columns[name] = column.astype(f"<U{max(len(value), 2 * width)}")
+
+    def add(self, document_id: str, conversation_id: Optional[str], chunk_indices: List[int],
+            vectors: np.ndarray, created_at: float, expires_at: float, replace: bool = True) -> None:
+        # Re-embedding a document replaces its rows; streamed batches append
+        if replace:
+            self.remove([document_id])
+        vectors = normalize_rows(vectors)
+        n = vectors.shape[0]
+        if n == 0:
+            return
+        conversation_id = conversation_id or ""
+        self._reserve(n, vectors.shape[1])
+        self._fit_string("document_ids", document_id)
+        self._fit_string("conversation_ids", conversation_id)
+        start, stop = self._size, self._size + n
+        self._vectors[start:stop] = vectors
+        self._columns["document_ids"][start:stop] = document_id
+        self._columns["chunk_indices"][start:stop] = np.asarray(chunk_indices, dtype=np.int32)
+        self._columns["conversation_ids"][start:stop] = conversation_id
+        self._columns["created_at"][start:stop] = created_at
+        self._columns["expires_at"][start:stop] = expires_at
+        if self.centroids is not None:
+            self._assignments[start:stop] = assign_lists(vectors, self.centroids)
+        self._size = stop
+        self.dirty = True
+
+    def _keep(self, mask: np.ndarray) -> None:
+        rows = np.flatnonzero(mask)
+        self._vectors = self.vectors[rows]
+        for name, column in self._columns.items():
+            self._columns[name] = column[:self._size][rows]
+        self._assignments = self._assignments[:self._size][rows]
+        self._size = int(rows.size)
+        self.generation += 1
+        self.dirty = True
+        if self._size < config.vector_index_ivf_min_size:
+            self.centroids = None
+            self.ivf_built_size = 0
+
+    def remove(self, document_ids: Iterable[str]) -> int:
+        document_ids = list(document_ids)
+        if not len(self) or not document_ids:
+            return 0
+        mask = ~np.isin(self.document_ids, document_ids)
+        removed = len(self) - int(mask.sum())
+        if removed:
+            self._keep(mask)
+        return removed
+
+    def prune_expired(self, now: float) -> int:
+        if not len(self):
+            return 0
+        mask = self.expires_at > now
+        removed = len(self) - int(mask.sum())
+        if removed:
+            self._keep(mask)
+        return removed
+
+    def set_conversation(self, document_id: str, conversation_id: Optional[str]) -> bool:
+        if not len(self):
+            return False
+        conversation_id = conversation_id or ""
+        rows = (self.document_ids == document_id) & (self.conversation_ids != conversation_id)
+        if not rows.any():
+            return False
+        self._fit_string("conversation_ids", conversation_id)
+        self.conversation_ids[rows] = conversation_id
+        self.dirty = True
+        return True
+
+    def ivf_due(self) -> bool:
+        """The partition is large enough for a quantizer and has doubled since the last one."""
+        n = len(self)
+        if self.ivf_building or n < config.vector_index_ivf_min_size:
+            return False
+        return self.centroids is None or n >= 2 * self.ivf_built_size
+
+    def install_ivf(self, centroids: np.ndarray, assignments: np.ndarray, built_size: int, generation: int) -> bool:
+        """Swap in a quantizer trained on the first ``built_size`` rows; False if rows were removed since."""
+        if generation != self.generation or self._size < built_size:
+            return False
+        merged = np.empty(self._vectors.shape[0], dtype=np.int32)
+        merged[:built_size] = assignments
+        # Rows appended while it trained
+        merged[built_size:self._size] = assign_lists(self._vectors[built_size:self._size], centroids)
+        self._assignments = merged
+        self.centroids = centroids
+        self.ivf_built_size = built_size
+        return True
+
+    def search(self, query: np.ndarray, top_k: int, threshold: float,
+               conversation_id: Optional[str], now: float) -> List[Tuple[str, int, float]]:
+        if not len(self) or query.shape[0] != self.vectors.shape[1]:
+            return []
+        mask = self.expires_at > now
+        if conversation_id:
+            mask &= self.conversation_ids == conversation_id
+        if self.centroids is not None and int(mask.sum()) >= config.vector_index_ivf_min_size:
+            nprobe = max(1, int(config.vector_index_nprobe))
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            mask &= np.isin(self.assignments, probe)
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return []
+        age_days = (now - self.created_at[rows]) / 86400.0
+        ranked = rank_chunks(query, self.vectors[rows], age_days, top_k=top_k, threshold=threshold, normalized=True)
+        return [(str(self.document_ids[rows[i]]), int(self.chunk_indices[rows[i]]), similarity) for i, similarity in ranked]
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """The arrays :meth:`write` stores, safe to write on a thread while the partition changes.
+
+        Rows are only ever appended past the current size or removed by
+        building new arrays, so views stay valid; conversation ids are
+        rewritten in place and are copied.
+        """
+        return {
+            "vectors": self.vectors,
+            "document_ids": self.document_ids,
+            "chunk_indices": self.chunk_indices,
+            "conversation_ids": self.conversation_ids.copy(),
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+    @staticmethod
+    def write(path: Path, arrays: Dict[str, np.ndarray]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temp name: several workers may save the same partition at once
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def save(self, path: Path) -> None:
+        self.write(path, self.snapshot())
+        self.dirty = False
+
+    @classmethod
+    def load(cls, user_email: str, path: Path) -> "IndexPartition":
+        part = cls(user_email)
+        with np.load(path, allow_pickle=False) as data:
+            part._vectors = data["vectors"].astype(np.float32, copy=False)
+            part._size = part._vectors.shape[0]
+            for name in part._columns:
+                part._columns[name] = data[name]
+            part._assignments = np.empty(part._size, dtype=np.int32)
+        return part
+
+
+class VectorIndex:
+    """In-process vector index over document_chunks, partitioned per user.
+
+    Partitions are loaded on first use from VECTOR_INDEX_DIR and reconciled
+    against the documents collection, so a restart does not re-read every
+    embedding. Each worker process keeps its own copy in memory and
+    reconciles a partition again once it is VECTOR_INDEX_RECONCILE_SECONDS
+    old, picking up documents other workers ingested or deleted. Quantizer
+    training, file I/O and embedding decoding run on threads.
+
+    Changes mark a partition dirty rather than rewriting its file: the file
+    is written VECTOR_INDEX_FLUSH_SECONDS after the first unsaved change,
+    outside the partition lock, and every dirty partition is written by
+    :meth:`flush` at shutdown. A crash loses at most that window, which the
+    reconcile against Mongo restores on the next load.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or config.vector_index_dir)
+        self._partitions: Dict[str, IndexPartition] = {}
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._flush_timers: Dict[str, asyncio.Task] = {}
+        self.reconciles = 0
+        self.ivf_builds = 0
+        self.flushes = 0
+        self.search_seconds = RollingStats()
+
+    def _path(self, user_email: str) -> Path:
+        return self.directory / f"{hashlib.sha1(user_email.encode('utf-8')).hexdigest()}.npz"
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _partition(self, user_email: str) -> IndexPartition:
+        part = self._partitions.get(user_email)
+        if part is None:
+            # Per user: one user's first load does not hold up everyone else's
+            lock = self._load_locks.setdefault(user_email, asyncio.Lock())
+            async with lock:
+                part = self._partitions.get(user_email)
+                if part is None:
+                    part = await self._load(user_email)
+                    self._partitions[user_email] = part
+            self._load_locks.pop(user_email, None)
+        elif (not part.refreshing
+              and time.monotonic() - part.reconciled_at > float(config.vector_index_reconcile_seconds)):
+            part.refreshing = True
+            self._spawn(self._refresh(part))
+        return part
+
+    async def _load(self, user_email: str) -> IndexPartition:
+        path = self._path(user_email)
+        part = None
+        if path.exists():
+            try:
+                part = await asyncio.to_thread(IndexPartition.load, user_email, path)
+            except Exception as e:
+                logger.warning(f"Discarding unreadable vector index partition {path.name}: {e}")
+        if part is None:
+            part = IndexPartition(user_email)
+        async with part.lock:
+            await self._reconcile(part)
+        self._mark_dirty(part)
+        self._maybe_build_ivf(part)
+        return part
+
+    async def _refresh(self, part: IndexPartition) -> None:
+        try:
+            async with part.lock:
+                await self._reconcile(part)
+            self._mark_dirty(part)
+            self._maybe_build_ivf(part)
+        except Exception as e:
+            logger.warning(f"Failed to reconcile vector index for {part.user_email}: {e}")
+        finally:
+            part.refreshing = False
+
+    async def _reconcile(self, part: IndexPartition) -> bool:
+        """Sync a partition with Mongo; returns True if anything changed. Call with ``part.lock`` held."""
+        part.reconciled_at = time.monotonic()
+        self.reconciles += 1
+        db = await get_db()
+        docs = await db.documents.find(
+            {"user_email": part.user_email},
+            {"conversation_id": 1, "created_at": 1, "expires_at": 1, "status": 1, "embedded_count": 1},
+        ).to_list(None)
+        live = {doc["_id"]: doc for doc in docs if doc.get("status", "ready") != "failed"}
+        indexed = part.document_rows()
+        changed = part.remove(set(indexed) - set(live)) > 0
+        for doc_id, doc in live.items():
+            # A document still being ingested is indexed batch by batch by the worker ingesting it
+            if doc.get("status", "ready") != "ready":
+                continue
+            rows, conversation_id = indexed.get(doc_id, (0, ""))
+            if rows:
+                if conversation_id != (doc.get("conversation_id") or ""):
+                    changed = part.set_conversation(doc_id, doc.get("conversation_id")) or changed
+                if rows >= doc.get("embedded_count", rows):
+                    continue
+            chunks = await db.document_chunks.find(
+                {"document_id": doc_id, "embedding": {"$ne": None}},
+                {"chunk_index": 1, "embedding": 1, "embedding_format": 1, "embedding_scale": 1},
+            ).to_list(None)
+            if not chunks:
+                continue
+            part.add(
+                doc_id,
+                doc.get("conversation_id"),
+                [c["chunk_index"] for c in chunks],
+                await asyncio.to_thread(decode_embeddings, chunks),
+                _epoch(doc.get("created_at"), np.nan),
+                _epoch(doc.get("expires_at"), np.inf),
+            )
+            changed = True
+        return changed
+
+    def _maybe_build_ivf(self, part: IndexPartition) -> None:
+        if part.ivf_due():
+            part.ivf_building = True
+            self._spawn(self._build_ivf(part))
+
+    async def _build_ivf(self, part: IndexPartition) -> None:
+        """Train the quantizer on a thread and swap it in; searches use the old one (or none) meanwhile."""
+        try:
+            while len(part) >= config.vector_index_ivf_min_size:
+                generation, size = part.generation, len(part)
+                centroids, assignments = await asyncio.to_thread(train_ivf, part.vectors)
+                async with part.lock:
+                    if part.install_ivf(centroids, assignments, size, generation):
+                        self.ivf_builds += 1
+                        return
+                # Rows were removed while it trained; their row numbers no longer line up
+        except Exception as e:
+            logger.warning(f"Failed to build the IVF index for {part.user_email}: {e}")
+        finally:
+            part.ivf_building = False
+
+    def _mark_dirty(self, part: IndexPartition) -> None:
+        """Write the partition out a little later, once, however many changes come in meanwhile."""
+        if part.dirty and part.user_email not in self._flush_timers:
+            self._flush_timers[part.user_email] = asyncio.create_task(self._flush_later(part))
+
+    async def _flush_later(self, part: IndexPartition) -> None:
+        try:
+            await asyncio.sleep(max(0.0, float(config.vector_index_flush_seconds)))
+        finally:
+            if self._flush_timers.get(part.user_email) is asyncio.current_task():
+                del self._flush_timers[part.user_email]
+        await self._write(part)
+
+    async def _write(self, part: IndexPartition) -> None:
+        """Write a dirty partition's file; the snapshot is taken under ``part.lock``, the write is not."""
+        async with part.save_lock:
+            async with part.lock:
+                if not part.dirty:
+                    return
+                part.prune_expired(time.time())
+                arrays = part.snapshot()
+                part.dirty = False
+            try:
+                await asyncio.to_thread(IndexPartition.write, self._path(part.user_email), arrays)
+                self.flushes += 1
+            except Exception as e:
+                part.dirty = True
+                logger.warning(f"Failed to persist vector index for {part.user_email}: {e}")
+
+    async def add_document(self, user_email: str, document_id: str, conversation_id: Optional[str],
+                           chunk_indices: List[int], embeddings: np.ndarray,
+                           created_at: Optional[datetime], expires_at: Optional[datetime]) -> None:
+        part = await self._partition(user_email)
+        async with part.lock:
+            part.add(document_id, conversation_id, chunk_indices, embeddings,
+                     _epoch(created_at, np.nan), _epoch(expires_at, np.inf))
+        self._mark_dirty(part)
+        self._maybe_build_ivf(part)
+
+    async def add_chunks(self, user_email: str, document_id: str, conversation_id: Optional[str],
+                         chunk_indices: List[int], embeddings: np.ndarray,
+                         created_at: Optional[datetime], expires_at: Optional[datetime]) -> None:
+        """Append one batch of a document's chunks."""
+        part = await self._partition(user_email)
+        async with part.lock:
+            part.add(document_id, conversation_id, chunk_indices, embeddings,
+                     _epoch(created_at, np.nan), _epoch(expires_at, np.inf), replace=False)
+        self._mark_dirty(part)
+        self._maybe_build_ivf(part)
+
+    async def persist(self, user_email: str) -> None:
+        """Write the user's partition now if it has unsaved changes."""
+        part = self._partitions.get(user_email)
+        if part is not None:
+            await self._write(part)
+
+    async def flush(self) -> None:
+        """Write every dirty partition; called at shutdown."""
+        for timer in list(self._flush_timers.values()):
+            timer.cancel()
+        self._flush_timers.clear()
+        for user_email in list(self._partitions):
+            await self.persist(user_email)
+
+    async def remove_documents(self, user_email: str, document_ids: List[str]) -> None:
+        part = await self._partition(user_email)
+        async with part.lock:
+            part.remove(document_ids)
+        self._mark_dirty(part)
+
+    async def set_conversation(self, user_email: str, document_id: str, conversation_id: Optional[str]) -> None:
+        part = await self._partition(user_email)
+        async with part.lock:
+            part.set_conversation(document_id, conversation_id)
+        self._mark_dirty(part)
+
+    async def search(self, user_email: str, query_embedding: np.ndarray, top_k: int = 5,
+                     threshold: float = 0.7, conversation_id: Optional[str] = None) -> List[Tuple[str, int, float]]:
+        """Return ``(document_id, chunk_index, similarity)`` for the best chunks, MMR-ordered."""
+        part = await self._partition(user_email)
+        started = time.perf_counter()
+        query = normalize_rows(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        results = part.search(query, top_k, threshold, conversation_id, time.time())
+        self.search_seconds.observe(time.perf_counter() - started)
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "partitions": len(self._partitions),
+            "vectors": sum(len(p) for p in self._partitions.values()),
+            "ivf_partitions": sum(1 for p in self._partitions.values() if p.centroids is not None),
+            "ivf_builds": self.ivf_builds,
+            "reconciles": self.reconciles,
+            "flushes": self.flushes,
+            "dirty_partitions": sum(1 for p in self._partitions.values() if p.dirty),
+            "search_ms": self.search_seconds.summary(scale=1000, digits=3),
+        }
+
+
+vector_index = VectorIndex()
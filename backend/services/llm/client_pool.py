@@ -0,0 +1,113 @@
+import importlib.util
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from backend.config import config
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost")
+
+
+def get_llm_endpoints() -> List[str]:
+    """Return the configured LLM base URLs in priority order."""
+    endpoints: List[str] = []
+    if config.llm_base_urls:
+        # Support comma-separated env string or list
+        if isinstance(config.llm_base_urls, list):
+            endpoints = [u.strip() for u in config.llm_base_urls if u and u.strip()]
+        else:
+            endpoints = [u.strip() for u in str(config.llm_base_urls).split(',') if u.strip()]
+    if not endpoints and config.llm_base_url:
+        endpoints = [config.llm_base_url]
+    return [u.rstrip('/') for u in endpoints]
+
+
+class LLMClientPool:
+    """Long-lived httpx clients, one per LLM endpoint.
+
+    Each client keeps its own keep-alive connection pool so consecutive chat
+    turns, title generation and model listing reuse established TCP/TLS
+    connections instead of paying a new handshake per request.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.hits = 0
+        self.misses = 0
+        self.http2_enabled = bool(config.llm_http2) and importlib.util.find_spec("h2") is not None
+        if config.llm_http2 and not self.http2_enabled:
+            logger.info("LLM_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1 keep-alive")
+
+    def _proxies_for(self, base_url: str) -> Optional[dict]:
+        # Bypass proxy for localhost endpoints to avoid routing local LM Studio via proxy
+        host = urlparse(base_url).hostname or ""
+        if host in LOCAL_HOSTS:
+            return None
+        if not (config.http_proxy or config.https_proxy):
+            return None
+        proxies = {}
+        if config.http_proxy:
+            proxies["http://"] = config.http_proxy
+        if config.https_proxy:
+            proxies["https://"] = config.https_proxy
+        return proxies
+
+    def _build_client(self, base_url: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=config.llm_pool_max_connections,
+            max_keepalive_connections=config.llm_pool_max_keepalive_connections,
+            keepalive_expiry=config.llm_pool_keepalive_expiry_seconds,
+        )
+        timeout_seconds = max(5, int(config.llm_request_timeout_seconds or 60))
+        return httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout_seconds,
+            limits=limits,
+            http2=self.http2_enabled,
+            proxies=self._proxies_for(base_url),
+            headers={"Content-Type": "application/json"},
+        )
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        """Return the shared client for ``base_url``, creating it on first use."""
+        key = base_url.rstrip('/')
+        client = self._clients.get(key)
+        if client is not None and not client.is_closed:
+            self.hits += 1
+            return client
+        self.misses += 1
+        client = self._build_client(key)
+        self._clients[key] = client
+        return client
+
+    def start(self, endpoints: Optional[List[str]] = None) -> None:
+        """Pre-create clients for every configured endpoint."""
+        for base_url in endpoints if endpoints is not None else get_llm_endpoints():
+            key = base_url.rstrip('/')
+            if key not in self._clients or self._clients[key].is_closed:
+                self._clients[key] = self._build_client(key)
+        logger.info(f"LLM client pool started for endpoints: {list(self._clients)} (http2={self.http2_enabled})")
+
+    async def aclose(self) -> None:
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "endpoints": list(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "http2": self.http2_enabled,
+            "max_connections": config.llm_pool_max_connections,
+            "max_keepalive_connections": config.llm_pool_max_keepalive_connections,
+        }
+
+
+llm_client_pool = LLMClientPool()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend.config import config
+from backend.services.llm.client_pool import llm_client_pool, get_llm_endpoints
+
+logger = logging.getLogger(__name__)
+
+# Smoothing factor for the exponentially weighted error rate and TTFB
+EWMA_ALPHA = 0.2
+# TTFB assumed for endpoints that have not served a stream yet
+DEFAULT_TTFB_SECONDS = 1.0
+
+
+def is_endpoint_failure(status_code: int) -> bool:
+    """Whether an HTTP status says the endpoint is unwell rather than that the request was bad.
+
+    5xx and 429 count against the endpoint's circuit; other 4xx (context too
+    long, unknown model) would be rejected by every endpoint alike.
+    """
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class EndpointHealth:
+    """Rolling health statistics and circuit state for one LLM endpoint."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.state = CircuitState.CLOSED
+        self.error_rate = 0.0
+        self.ttfb_seconds: Optional[float] = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def score(self) -> float:
+        """Lower is better: expected latency weighted by load and recent errors."""
+        ttfb = self.ttfb_seconds if self.ttfb_seconds is not None else DEFAULT_TTFB_SECONDS
+        return (1 + self.in_flight) * ttfb * (1 + 4 * self.error_rate)
+
+    def record_success(self, ttfb: Optional[float]) -> None:
+        self.total_requests += 1
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate
+        if ttfb is not None:
+            if self.ttfb_seconds is None:
+                self.ttfb_seconds = ttfb
+            else:
+                self.ttfb_seconds = (1 - EWMA_ALPHA) * self.ttfb_seconds + EWMA_ALPHA * ttfb
+        self.consecutive_failures = 0
+        if self.state != CircuitState.CLOSED:
+            logger.info(f"LLM endpoint {self.base_url} recovered; closing circuit")
+        self.state = CircuitState.CLOSED
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.total_requests += 1
+        self.total_failures += 1
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA
+        self.consecutive_failures += 1
+        threshold = max(1, int(config.llm_circuit_failure_threshold))
+        if self.state == CircuitState.HALF_OPEN or self.consecutive_failures >= threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Opening circuit for LLM endpoint {self.base_url} after {self.consecutive_failures} failures")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+    def cooldown_elapsed(self) -> bool:
+        if self.opened_at is None:
+            return True
+        return time.monotonic() - self.opened_at >= float(config.llm_circuit_cooldown_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.base_url,
+            "state": self.state.value,
+            "error_rate": round(self.error_rate, 4),
+            "ttfb_ms": round(self.ttfb_seconds * 1000, 1) if self.ttfb_seconds is not None else None,
+            "in_flight": self.in_flight,
+            "consecutive_failures": self.consecutive_failures,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+            "score": round(self.score(), 4),
+        }
+
+
+class EndpointRouter:
+    """Routes new LLM streams to the healthiest, least-loaded endpoint.
+
+    Endpoints whose circuit is open are skipped until a background probe
+    (or the cooldown expiring with nothing else available) lets a single
+    trial request through.
+    """
+
+    def __init__(self, endpoints: Optional[List[str]] = None):
+        self._health: Dict[str, EndpointHealth] = {}
+        for base_url in endpoints if endpoints is not None else get_llm_endpoints():
+            self._health[base_url] = EndpointHealth(base_url)
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def health(self, base_url: str) -> EndpointHealth:
+        if base_url not in self._health:
+            self._health[base_url] = EndpointHealth(base_url)
+        return self._health[base_url]
+
+    def candidates(self) -> List[str]:
+        """Return endpoints to try for a new stream, best first."""
+        available = [h for h in self._health.values() if h.state == CircuitState.CLOSED]
+        available.sort(key=lambda h: h.score())
+        ordered = [h.base_url for h in available]
+        # Half-open endpoints get at most one trial stream at a time
+        for h in self._health.values():
+            if h.state == CircuitState.HALF_OPEN and h.in_flight == 0:
+                ordered.append(h.base_url)
+        if not ordered:
+            # Everything is open: fall back to the circuits that have cooled down, oldest first
+            cooled = [h for h in self._health.values() if h.state == CircuitState.OPEN and h.cooldown_elapsed()]
+            cooled.sort(key=lambda h: h.opened_at or 0.0)
+            ordered = [h.base_url for h in cooled]
+        return ordered
+
+    @asynccontextmanager
+    async def track(self, base_url: str):
+        """Count a stream against ``base_url`` for least-loaded selection."""
+        health = self.health(base_url)
+        health.in_flight += 1
+        try:
+            yield health
+        finally:
+            health.in_flight -= 1
+
+    async def _probe(self, health: EndpointHealth) -> None:
+        health.state = CircuitState.HALF_OPEN
+        started = time.monotonic()
+        try:
+            client = llm_client_pool.get(health.base_url)
+            response = await client.get("/v1/models", timeout=5)
+            response.raise_for_status()
+            health.record_success(time.monotonic() - started)
+        except (httpx.RequestError, httpx.HTTPStatusError) as e:
+            logger.info(f"Health probe failed for LLM endpoint {health.base_url}: {e}")
+            health.record_failure()
+
+    async def _probe_loop(self) -> None:
+        interval = max(0.5, float(config.llm_health_probe_interval_seconds))
+        while True:
+            await asyncio.sleep(interval)
+            due = [h for h in self._health.values() if h.state == CircuitState.OPEN and h.cooldown_elapsed()]
+            if due:
+                await asyncio.gather(*(self._probe(h) for h in due), return_exceptions=True)
+
+    def start(self) -> None:
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def snapshot(self) -> List[dict]:
+        return [h.snapshot() for h in self._health.values()]
+
+
+endpoint_router = EndpointRouter()
@@ -0,0 +1,59 @@
+from typing import Iterable, List, Optional
+
+import numpy as np
+from bson.binary import Binary
+
+# "list" is the legacy BSON array of doubles; the others are packed BinData
+EMBEDDING_FORMATS = ("list", "float32", "float16", "int8")
+# Chunk fields written by encode_embedding, for projections that read vectors back
+EMBEDDING_FIELDS = ("embedding", "embedding_format", "embedding_scale")
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def encode_embedding(vector: np.ndarray, fmt: str) -> dict:
+    """Return the document fields that store ``vector`` in ``fmt``.
+
+    int8 uses symmetric per-vector quantization: ``vector ~= int8 * scale``.
+    """
+    if fmt not in EMBEDDING_FORMATS:
+        raise ValueError(f"Unknown embedding format '{fmt}'. Expected one of {EMBEDDING_FORMATS}")
+    vector = np.asarray(vector, dtype=np.float32)
+    if fmt == "list":
+        return {"embedding": vector.tolist(), "embedding_format": "list", "embedding_scale": None}
+    scale = None
+    if fmt == "int8":
+        peak = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        packed = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+    else:
+        packed = vector.astype(_DTYPES[fmt])
+    return {"embedding": Binary(packed.tobytes()), "embedding_format": fmt, "embedding_scale": scale}
+
+
+def decode_embedding(doc: dict) -> Optional[np.ndarray]:
+    """Return a chunk's embedding as a 1-D array.
+
+    float32 BinData is viewed in place with ``np.frombuffer`` (read-only, no
+    copy); float16 and int8 are widened to float32.
+    """
+    raw = doc.get("embedding")
+    if raw is None:
+        return None
+    fmt = doc.get("embedding_format")
+    if isinstance(raw, (bytes, bytearray)):
+        fmt = fmt or "float32"
+        values = np.frombuffer(raw, dtype=_DTYPES[fmt])
+        if fmt == "float32":
+            return values
+        if fmt == "int8":
+            return values.astype(np.float32) * np.float32(doc.get("embedding_scale") or 1.0)
+        return values.astype(np.float32)
+    return np.asarray(raw, dtype=np.float32)
+
+
+def decode_embeddings(docs: Iterable[dict]) -> np.ndarray:
+    """Stack the embeddings of ``docs`` into one ``(n, dim)`` float32 matrix."""
+    rows: List[np.ndarray] = [decode_embedding(doc) for doc in docs]
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack(rows).astype(np.float32, copy=False)
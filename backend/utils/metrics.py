@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+
+class RollingStats:
+    """Keeps the most recent samples of a measurement and summarizes them."""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def summary(self, scale: float = 1.0, digits: int = 2) -> dict:
+        """Summarize the window; ``scale`` converts units (e.g. 1000 for s -> ms)."""
+        if not self._samples:
+            return {"count": self.count, "mean": None, "p50": None, "p95": None, "max": None}
+        window_mean = sum(self._samples) / len(self._samples)
+        return {
+            "count": self.count,
+            "mean": round(window_mean * scale, digits),
+            "p50": round(self.percentile(50) * scale, digits),
+            "p95": round(self.percentile(95) * scale, digits),
+            "max": round(max(self._samples) * scale, digits),
+        }
+
+
+class Histogram:
+    """Counts observations into fixed buckets keyed by their upper bound."""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self._counts[i] += 1
+                return
+        self._counts[-1] += 1
+
+    def summary(self, scale: float = 1.0) -> dict:
+        labels = [f"<={b * scale:g}" for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, 3) if self.count else None,
+            "buckets": dict(zip(labels, self._counts)),
+        }
@@ -0,0 +1,28 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(sort_value: datetime, item_id: str) -> str:
+    """Opaque keyset cursor pointing just past the row with ``(sort_value, item_id)``."""
+    payload = json.dumps({"t": sort_value.isoformat(), "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_filter(field: str, cursor: str, descending: bool) -> dict:
+    """Match rows after ``cursor`` in ``(field, id)`` order; ``id`` breaks ties on equal timestamps."""
+    sort_value, item_id = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [{field: {op: sort_value}}, {field: sort_value, "id": {op: item_id}}]}
@@ -0,0 +1,84 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Recency boost: up to +10% for content created within the last 7 days
+RECENT_DAYS = 7.0
+MAX_BOOST = 0.10
+# Favor relevance but keep some diversity when re-ranking with MMR
+MMR_LAMBDA = 0.7
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return ``matrix`` as float32 with every row scaled to unit length (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def recency_boost(age_days: np.ndarray) -> np.ndarray:
+    """Multiplicative boost per chunk; ``NaN`` ages (unknown creation time) get no boost."""
+    factor = 1.0 - np.minimum(np.maximum(age_days, 0.0) / RECENT_DAYS, 1.0)
+    factor = np.where(np.isnan(factor), 0.0, factor)
+    return 1.0 + MAX_BOOST * factor
+
+
+def rank_chunks(
+    query_vec: np.ndarray,
+    embeddings: np.ndarray,
+    age_days: Optional[np.ndarray] = None,
+    top_k: int = 5,
+    threshold: float = 0.7,
+    mmr_lambda: float = MMR_LAMBDA,
+    normalized: bool = False,
+) -> List[Tuple[int, float]]:
+    """Score chunk embeddings against a query and pick ``top_k`` with MMR.
+
+    Relevance is one matrix-vector product over unit-length rows. Candidates
+    below ``threshold`` are dropped, the rest are boosted for recency, and a
+    pool of the best ``4 * top_k`` is re-ranked with Maximal Marginal
+    Relevance. The MMR loop keeps a running max-similarity-to-selected vector,
+    so each step costs one pool-sized product instead of pairwise Python calls.
+
+    Returns ``(row_index, similarity)`` pairs in selection order.
+    """
+    if embeddings.size == 0 or top_k <= 0:
+        return []
+    query = normalize_rows(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))[0]
+    matrix = np.asarray(embeddings, dtype=np.float32) if normalized else normalize_rows(embeddings)
+
+    base = matrix @ query
+    idx = np.flatnonzero(base >= threshold)
+    if idx.size == 0:
+        return []
+    sims = base[idx]
+    if age_days is not None:
+        sims = sims * recency_boost(np.asarray(age_days, dtype=np.float32)[idx])
+
+    # Take a manageable pool (4x top_k) of the most similar candidates for MMR
+    pool_size = min(idx.size, max(top_k * 4, top_k))
+    if idx.size > pool_size:
+        part = np.argpartition(-sims, pool_size - 1)[:pool_size]
+    else:
+        part = np.arange(idx.size)
+    order = part[np.argsort(-sims[part], kind="stable")]
+    pool_rows = idx[order]
+    pool_sims = sims[order]
+    pool_emb = matrix[pool_rows]
+
+    # Seed with the most similar, then maximize: lambda * sim(q, d) - (1 - lambda) * max_sim(d, selected)
+    selected = [0]
+    available = np.ones(pool_size, dtype=bool)
+    available[0] = False
+    max_sim_selected = pool_emb @ pool_emb[0]
+    relevance = mmr_lambda * pool_sims
+    while len(selected) < min(top_k, pool_size):
+        scores = relevance - (1.0 - mmr_lambda) * max_sim_selected
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_sim_selected, pool_emb @ pool_emb[best], out=max_sim_selected)
+
+    return [(int(pool_rows[i]), float(pool_sims[i])) for i in selected]
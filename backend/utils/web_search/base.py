@@ -19,6 +19,10 @@ class SearchEngine(ABC):
         """
         pass
     
+    async def aclose(self) -> None:
+        """Release the engine's HTTP client; called when the engine registry replaces or drops it."""
+        pass
+    
 def get_search_engine(engine_name: str = "") -> 'SearchEngine':
     """
     Factory function to get a search engine instance based on configuration or name.
@@ -27,20 +31,14 @@ def get_search_engine(engine_name: str = "") -> 'SearchEngine':
         engine_name: Optional name of the search engine to use. If None, uses the configured default.
     
     Returns:
-        SearchEngine: An instance of a concrete search engine class.
+        SearchEngine: The shared engine instance from the registry (DuckDuckGo if the named one is not loaded).
     """
     from backend.config import config
-    from .duckduckgo import DuckDuckGoEngine
-    from .sougou import SougouEngine
+    from .registry import web_search_registry
     
     if not engine_name:
         engine_name = config.web_search["default_engine"]
     
-    engine_name = engine_name.lower()
-    if engine_name == 'duckduckgo':
-        return DuckDuckGoEngine()
-    elif engine_name == 'sougou' and config.web_search.get("sougou_api_key"):
-        return SougouEngine()
-    else:
-        # Default to DuckDuckGo
-        return DuckDuckGoEngine()
\ No newline at end of file
+    engine = web_search_registry.get(engine_name.lower())
+    # Default to DuckDuckGo
+    return engine or web_search_registry.get("duckduckgo")
@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from backend.config import config
+from backend.database import get_db
+from backend.utils.cache import TTLCache
+from .models import SearchResult
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_PUNCT_RE = re.compile(r'[\s?？!！.。,，]+$')
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, width and spacing so trivially different phrasings share a cache entry."""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return _TRAILING_PUNCT_RE.sub("", text)
+
+
+def cache_key(query: str, engines: Sequence[str], max_results: int, domain_filter: Optional[str]) -> str:
+    raw = "\x1f".join([normalize_query(query), ",".join(sorted(engines)), str(max_results), domain_filter or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchOutcome(NamedTuple):
+    results: List[SearchResult]
+    complete: bool  # False when some engine was cut off by the search deadline
+
+
+class _Entry(NamedTuple):
+    results: List[SearchResult]
+    upstream_seconds: float  # what the original search cost; a hit saves this much
+
+
+class _LeaderCancelled(Exception):
+    """The request running a shared search was cancelled before it finished."""
+
+
+class WebSearchCache:
+    """Caches web search results per normalized query and collapses concurrent identical searches.
+
+    Entries live in a bounded in-memory LRU and, when WEB_SEARCH_CACHE_MONGO is
+    set, in the ``web_search_cache`` collection so all workers and restarts
+    share them. The TTL is the shortest configured TTL among the engines used.
+    Empty and deadline-truncated results are kept only briefly (in memory), so
+    an outage is not hammered by retries and a slow engine gets another chance.
+    """
+
+    def __init__(self):
+        self._memory: TTLCache[_Entry] = TTLCache(
+            config.web_search_cache_max_entries, config.web_search_cache_default_ttl_seconds
+        )
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.misses = 0
+        self.partial = 0
+        self.saved_seconds = 0.0
+        self.upstream_seconds = 0.0
+
+    @staticmethod
+    def ttl_for(engines: Sequence[str]) -> float:
+        ttls = config.web_search_cache_ttls or {}
+        default = float(config.web_search_cache_default_ttl_seconds)
+        return min((float(ttls.get(engine, default)) for engine in engines), default=default)
+
+    async def _mongo_get(self, key: str) -> Optional[_Entry]:
+        try:
+            db = await get_db()
+            doc = await db.web_search_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"Web search cache read failed: {e}")
+            return None
+        if not doc:
+            return None
+        return _Entry([SearchResult(**r) for r in doc["results"]], doc.get("upstream_seconds", 0.0))
+
+    async def _mongo_put(self, key: str, entry: _Entry, ttl: float) -> None:
+        try:
+            db = await get_db()
+            await db.web_search_cache.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "results": [r.model_dump() for r in entry.results],
+                    "upstream_seconds": entry.upstream_seconds,
+                    "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"Web search cache write failed: {e}")
+
+    async def get_or_search(self, key: str, engines: Sequence[str],
+                            search: Callable[[], Awaitable[SearchOutcome]]) -> List[SearchResult]:
+        while True:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self.memory_hits += 1
+                self.saved_seconds += entry.upstream_seconds
+                return list(entry.results)
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                return await self._lead(key, engines, search)
+            # Someone is already searching for this; share their answer. Shielded so a
+            # follower giving up does not cancel the search the others are waiting on
+            self.coalesced += 1
+            try:
+                entry = await asyncio.shield(pending)
+            except _LeaderCancelled:
+                # The searching request went away; the next one through searches again
+                self.coalesced -= 1
+                self.retried += 1
+                continue
+            self.saved_seconds += entry.upstream_seconds
+            return list(entry.results)
+
+    async def _lead(self, key: str, engines: Sequence[str],
+                    search: Callable[[], Awaitable[SearchOutcome]]) -> List[SearchResult]:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            entry = await self._load_or_search(key, engines, search)
+            future.set_result(entry)
+            return list(entry.results)
+        except asyncio.CancelledError:
+            # Not cancel(): that would cancel the followers too, though nobody cancelled them
+            self._in_flight.pop(key, None)
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    async def _load_or_search(self, key: str, engines: Sequence[str],
+                              search: Callable[[], Awaitable[SearchOutcome]]) -> _Entry:
+        ttl = self.ttl_for(engines)
+        if config.web_search_cache_mongo:
+            entry = await self._mongo_get(key)
+            if entry is not None:
+                self.mongo_hits += 1
+                self.saved_seconds += entry.upstream_seconds
+                self._memory.put(key, entry, ttl)
+                return entry
+
+        self.misses += 1
+        started = time.monotonic()
+        results, complete = await search()
+        elapsed = time.monotonic() - started
+        self.upstream_seconds += elapsed
+        entry = _Entry(results, elapsed)
+        if not complete:
+            self.partial += 1
+        if not results or not complete:
+            ttl = min(ttl, float(config.web_search_cache_negative_ttl_seconds))
+        self._memory.put(key, entry, ttl)
+        if config.web_search_cache_mongo and results and complete:
+            await self._mongo_put(key, entry, ttl)
+        return entry
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.mongo_hits + self.coalesced + self.misses
+        hits = lookups - self.misses
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "misses": self.misses,
+            "partial": self.partial,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "in_flight": len(self._in_flight),
+            "saved_upstream_seconds": round(self.saved_seconds, 2),
+            "upstream_seconds": round(self.upstream_seconds, 2),
+            "evictions": self._memory.evictions,
+        }
+
+
+web_search_cache = WebSearchCache()
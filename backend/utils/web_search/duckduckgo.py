@@ -1,62 +1,71 @@
+import asyncio
 import logging
-import os
-from duckduckgo_search import DDGS
-from typing import List
+from duckduckgo_search import AsyncDDGS
+from typing import Dict, List, Optional
 from .base import SearchEngine
 from .models import SearchResult
-from itertools import islice
+
+# The api backend often answers 202 for a while; html and lite are scraped pages that keep working
+DDG_BACKENDS = ("api", "html", "lite")
 
 class DuckDuckGoEngine(SearchEngine):
-    """DuckDuckGo search engine implementation."""
-    
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
-    async def search(self, query: str, max_results: int = 5, timeout: int = 10) -> List[SearchResult]:
-        try:
-            # Explicitly pass proxies from environment to improve reliability behind corporate/GFW proxies
-            proxies = None
-            http_proxy = os.getenv("HTTP_PROXY")
-            https_proxy = os.getenv("HTTPS_PROXY")
-            if http_proxy or https_proxy:
-                proxies = {}
-                if http_proxy:
-                    proxies["http://"] = http_proxy
-                if https_proxy:
-                    proxies["https://"] = https_proxy
+    """DuckDuckGo search engine implementation on the non-blocking AsyncDDGS client."""
 
-            # Try multiple DDG backends to mitigate persistent 202 responses on the API backend
-            backends_to_try = ["api", "html", "lite"]
+    def __init__(self, proxies: Optional[Dict[str, str]] = None, timeout: int = 10):
+        self.logger = logging.getLogger(__name__)
+        # One client for the engine's lifetime so connections through the proxy are reused.
+        # Proxies are passed explicitly to improve reliability behind corporate/GFW proxies.
+        self._ddgs = AsyncDDGS(timeout=timeout, proxies=proxies)
+        self.backend_wins: Dict[str, int] = {backend: 0 for backend in DDG_BACKENDS}
 
-            with DDGS(timeout=timeout, proxies=proxies) as ddgs:
-                for backend in backends_to_try:
-                    try:
-                        # ddgs.text returns a generator in 3.9.x; slice it to max_results
-                        try:
-                            results_iter = ddgs.text(query, backend=backend, max_results=max_results)
-                        except TypeError:
-                            # Fallback if older signature without max_results
-                            results_iter = islice(ddgs.text(query, backend=backend), max_results)
+    async def aclose(self) -> None:
+        await self._ddgs.__aexit__(None, None, None)
 
-                        parsed = []
-                        for result in islice(results_iter, max_results):
-                            title = result.get('title')
-                            url = result.get('href')
-                            snippet = result.get('body')
-                            if title and url and snippet:
-                                parsed.append(SearchResult(title=title, url=url, snippet=snippet, source="duckduckgo"))
+    async def _search_backend(self, backend: str, query: str, max_results: int) -> List[SearchResult]:
+        parsed = []
+        async for result in self._ddgs.text(query, backend=backend, max_results=max_results):
+            title = result.get('title')
+            url = result.get('href')
+            snippet = result.get('body')
+            if title and url and snippet:
+                parsed.append(SearchResult(title=title, url=url, snippet=snippet, source="duckduckgo"))
+            if len(parsed) >= max_results:
+                break
+        return parsed
 
-                        if parsed:
-                            self.logger.info(f"DuckDuckGo backend '{backend}' returned {len(parsed)} results")
-                            return parsed
-                        else:
-                            self.logger.warning(f"DuckDuckGo backend '{backend}' returned 0 results; trying next backend")
-                    except Exception as e:
-                        self.logger.warning(f"DuckDuckGo backend '{backend}' failed: {e}")
+    async def search(self, query: str, max_results: int = 5, timeout: int = 10) -> List[SearchResult]:
+        """Race all DDG backends; the first one with results wins and the others are cancelled."""
+        tasks = {
+            asyncio.ensure_future(self._search_backend(backend, query, max_results)): backend
+            for backend in DDG_BACKENDS
+        }
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.logger.error(f"DuckDuckGo search timed out after {timeout}s for query '{query}'")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    backend = tasks[task]
+                    if task.exception() is not None:
+                        self.logger.warning(f"DuckDuckGo backend '{backend}' failed: {task.exception()}")
                         continue
-
-            # All backends failed or returned no results
-            return []
-        except Exception as e:
-            self.logger.error(f"DuckDuckGo search failed for query '{query}': {str(e)}")
-            return []
\ No newline at end of file
+                    parsed = task.result()
+                    if parsed:
+                        self.backend_wins[backend] += 1
+                        self.logger.info(f"DuckDuckGo backend '{backend}' returned {len(parsed)} results")
+                        return parsed
+                    self.logger.warning(f"DuckDuckGo backend '{backend}' returned 0 results")
+        finally:
+            # Losers (and everything, if we were cancelled) stop here instead of finishing in the background
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark retrieved; a loser that failed was already logged or is moot
+        # All backends failed or returned no results
+        return []
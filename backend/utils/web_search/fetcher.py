@@ -0,0 +1,353 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import socket
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from backend.config import config
+from backend.services.embeddings.batcher import query_batcher
+from backend.services.embeddings.cache import ChunkEmbeddingCache
+from backend.services.embeddings.executor import embedding_executor
+from backend.utils.cache import TTLCache
+from backend.utils.metrics import RollingStats
+from backend.utils.similarity import rank_chunks
+from .models import SearchResult
+from .registry import web_search_registry
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (compatible; ShiancoChat/1.0)"
+TEXT_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+# Navigation, scripts and page chrome never carry the answer
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer",
+    "aside", "form", "button", "select",
+}
+_BLOCK_TAGS = {
+    "p", "div", "section", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6", "br", "tr",
+    "td", "th", "table", "pre", "blockquote", "dd", "dt", "figcaption",
+}
+_MAIN_TAGS = {"main", "article"}
+MIN_BLOCK_CHARS = 20  # shorter blocks are menu items, buttons and bylines
+MIN_MAIN_CHARS = 200  # a <main>/<article> with less text than this is not the page's content
+PASSAGE_CHARS = 800
+PASSAGE_OVERLAP = 100
+MAX_PASSAGES_PER_PAGE = 40
+MAX_REDIRECTS = 5
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class _MainTextParser(HTMLParser):
+    """Collects the text blocks of a page, remembering which ones sat inside <main>/<article>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title_parts: List[str] = []
+        self.blocks: List[str] = []
+        self.main_blocks: List[str] = []
+        self._current: List[str] = []
+        self._skip = 0
+        self._main = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in _MAIN_TAGS:
+            self.flush()
+            self._main += 1
+        elif tag in _BLOCK_TAGS:
+            self.flush()
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in _MAIN_TAGS:
+            self.flush()
+            self._main = max(0, self._main - 1)
+        elif tag in _BLOCK_TAGS:
+            self.flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+        elif not self._skip:
+            self._current.append(data)
+
+    def flush(self):
+        text = _WHITESPACE_RE.sub(" ", "".join(self._current)).strip()
+        self._current = []
+        if len(text) >= MIN_BLOCK_CHARS:
+            self.blocks.append(text)
+            if self._main:
+                self.main_blocks.append(text)
+
+
+def extract_main_text(html: str) -> Tuple[str, str]:
+    """Return ``(title, text)`` of an HTML page, preferring its <main>/<article> content."""
+    parser = _MainTextParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        # Keep whatever was parsed before the markup went bad
+        logger.debug(f"HTML parse stopped early: {e}")
+    parser.flush()
+    blocks = parser.main_blocks if sum(map(len, parser.main_blocks)) >= MIN_MAIN_CHARS else parser.blocks
+    title = _WHITESPACE_RE.sub(" ", "".join(parser.title_parts)).strip()
+    return title, "\n\n".join(blocks)
+
+
+class BlockedURL(Exception):
+    """The URL is not http(s) or its host resolves to a non-public address."""
+
+
+async def check_public_url(url: str) -> None:
+    """Raise BlockedURL unless ``url`` is http(s) and every address of its host is public.
+
+    Search results and their redirects are attacker-controlled; without this
+    a result could point the fetcher at loopback, the cloud metadata service
+    (169.254.169.254) or intranet hosts and put their pages in the prompt.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise BlockedURL(f"Unsupported URL {url!r}")
+    if config.web_fetch_allow_private_hosts:
+        return
+    try:
+        addresses = {ipaddress.ip_address(parts.hostname)}
+    except ValueError:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            parts.hostname, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+        # Drop IPv6 zone ids ("fe80::1%eth0")
+        addresses = {ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos}
+    for address in addresses:
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global:
+            raise BlockedURL(f"{parts.hostname} resolves to non-public address {address}")
+
+
+class FetchedPage(NamedTuple):
+    url: str
+    title: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class WebPassage(NamedTuple):
+    url: str
+    title: str
+    text: str
+    similarity: float
+
+
+class WebPageFetcher:
+    """Fetches the top web results and picks the passages most relevant to the query.
+
+    Pages are fetched concurrently over one pooled client (through the web
+    search proxy), at most WEB_FETCH_PER_HOST_CONNECTIONS at a time per host,
+    and reading stops at WEB_FETCH_MAX_BYTES. Redirects are followed by hand
+    so every hop's host is checked with :func:`check_public_url`. Extracted
+    text is cached per URL; after WEB_FETCH_REVALIDATE_SECONDS a cached page
+    is revalidated with its ETag/Last-Modified, so an unchanged page costs a
+    304 instead of a download. Passages are ranked with the local embedding
+    model; their vectors have a cache of their own, so web pages cannot
+    evict document chunks from the chunk embedding cache.
+    """
+
+    def __init__(self):
+        self._pages: TTLCache[FetchedPage] = TTLCache(
+            config.web_fetch_cache_max_pages, config.web_fetch_cache_ttl_seconds
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_proxies: Optional[Dict[str, str]] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Counter = Counter()
+        self._splitter = RecursiveCharacterTextSplitter(chunk_size=PASSAGE_CHARS, chunk_overlap=PASSAGE_OVERLAP)
+        self._passage_vectors = ChunkEmbeddingCache(
+            embedding_executor,
+            max_entries=config.web_fetch_cache_max_pages * MAX_PASSAGES_PER_PAGE,
+            ttl_seconds=config.web_fetch_cache_ttl_seconds,
+        )
+        self.fetches = 0
+        self.blocked = 0
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.truncated = 0
+        self.errors = 0
+        self.bytes_read = 0
+        self.fetch_seconds = RollingStats()
+        self.rank_seconds = RollingStats()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        proxies = web_search_registry.settings.proxies if web_search_registry.settings else None
+        if self._client is None or proxies != self._client_proxies:
+            if self._client is not None:
+                # The web search proxy was reloaded; let in-flight fetches finish on the old client
+                asyncio.get_running_loop().create_task(self._client.aclose())
+            self._client = httpx.AsyncClient(
+                proxies=proxies,
+                headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9"},
+                follow_redirects=False,  # followed in _stream, checking each hop
+                limits=httpx.Limits(max_connections=max(1, int(config.web_fetch_max_connections)),
+                                    max_keepalive_connections=8),
+            )
+            self._client_proxies = proxies
+        return self._client
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(max(1, int(config.web_fetch_per_host_connections)))
+        self._host_users[host] += 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            self._host_users[host] -= 1
+            if not self._host_users[host]:
+                del self._host_users[host]
+                self._hosts.pop(host, None)
+
+    @asynccontextmanager
+    async def _stream(self, url: str, headers: Dict[str, str]):
+        """GET ``url``, following redirects only to public hosts; yields the final response."""
+        client = self._get_client()
+        for _ in range(MAX_REDIRECTS + 1):
+            await check_public_url(url)
+            async with client.stream("GET", url, headers=headers, timeout=config.web_fetch_timeout_seconds) as response:
+                location = response.headers.get("location")
+                if not (response.is_redirect and location):
+                    yield response
+                    return
+                url = str(response.url.join(location))
+        raise httpx.TooManyRedirects(f"More than {MAX_REDIRECTS} redirects")
+
+    async def fetch(self, url: str) -> Optional[FetchedPage]:
+        """Fetch one page's main text, from the cache when it is fresh or unchanged."""
+        cached = self._pages.get(url)
+        if cached is not None and time.time() - cached.fetched_at < config.web_fetch_revalidate_seconds:
+            self.cache_hits += 1
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        started = time.monotonic()
+        self.fetches += 1
+        try:
+            async with self._host_slot(urlsplit(url).hostname or ""):
+                async with self._stream(url, headers) as response:
+                    if response.status_code == 304 and cached is not None:
+                        self.not_modified += 1
+                        page = cached._replace(fetched_at=time.time())
+                        self._pages.put(url, page)
+                        return page
+                    response.raise_for_status()
+                    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                    if content_type and content_type not in TEXT_CONTENT_TYPES:
+                        logger.info(f"Skipping {url}: content type {content_type}")
+                        return None
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= config.web_fetch_max_bytes:
+                            del body[config.web_fetch_max_bytes:]
+                            self.truncated += 1
+                            break
+                    self.bytes_read += len(body)
+                    raw = bytes(body).decode(response.charset_encoding or "utf-8", errors="replace")
+                    etag = response.headers.get("etag")
+                    last_modified = response.headers.get("last-modified")
+        except BlockedURL as e:
+            self.blocked += 1
+            logger.warning(f"Not fetching {url}: {e}")
+            return None
+        except (httpx.HTTPError, httpx.StreamError, OSError) as e:
+            self.errors += 1
+            logger.warning(f"Failed to fetch {url}: {e}")
+            return None
+        finally:
+            self.fetch_seconds.observe(time.monotonic() - started)
+
+        if content_type == "text/plain":
+            title, text = "", _WHITESPACE_RE.sub(" ", raw).strip()
+        else:
+            # Parsing a large page is CPU work; keep it off the event loop
+            title, text = await asyncio.get_running_loop().run_in_executor(None, extract_main_text, raw)
+        page = FetchedPage(url, title, text, etag, last_modified, time.time())
+        self._pages.put(url, page)
+        return page
+
+    async def passages(self, query: str, results: List[SearchResult]) -> List[WebPassage]:
+        """Fetch the top results and return their passages most similar to ``query``."""
+        urls = list(dict.fromkeys(r.url for r in results if r.url))[:max(0, int(config.web_fetch_top_n))]
+        if not urls:
+            return []
+        pages = [page for page in await asyncio.gather(*(self.fetch(url) for url in urls)) if page and page.text]
+        titles = {r.url: r.title for r in results}
+        candidates: List[Tuple[FetchedPage, str]] = []
+        for page in pages:
+            chunks = self._splitter.split_text(page.text)[:MAX_PASSAGES_PER_PAGE]
+            candidates.extend((page, chunk) for chunk in chunks)
+        if not candidates:
+            return []
+
+        started = time.monotonic()
+        # Passage vectors are cached, so a page seen again is not re-embedded
+        query_vec = await query_batcher.embed(query)
+        matrix = await self._passage_vectors.embed([text for _, text in candidates])
+        ranked = rank_chunks(query_vec, matrix, top_k=int(config.web_fetch_passages),
+                             threshold=float(config.web_fetch_min_similarity))
+        self.rank_seconds.observe(time.monotonic() - started)
+        return [
+            WebPassage(candidates[i][0].url, candidates[i][0].title or titles.get(candidates[i][0].url, ""),
+                       candidates[i][1], similarity)
+            for i, similarity in ranked
+        ]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": config.web_fetch_enabled,
+            "fetches": self.fetches,
+            "cache_hits": self.cache_hits,
+            "not_modified": self.not_modified,
+            "truncated": self.truncated,
+            "errors": self.errors,
+            "blocked": self.blocked,
+            "bytes_read": self.bytes_read,
+            "cached_pages": len(self._pages),
+            "passage_vectors": self._passage_vectors.stats(),
+            "fetch_seconds": self.fetch_seconds.summary(),
+            "rank_seconds": self.rank_seconds.summary(),
+        }
+
+
+web_page_fetcher = WebPageFetcher()
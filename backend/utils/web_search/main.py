@@ -1,18 +1,21 @@
 import os
-from pathlib import Path
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from pydantic import SecretStr
 from .models import SearchResult
-from .duckduckgo import DuckDuckGoEngine
+from .cache import SearchOutcome, cache_key, web_search_cache
+from .registry import web_search_registry
 import logging
 import asyncio
 from typing import List, Optional
-from dotenv import load_dotenv
+
+from backend.config import config
 
 logger = logging.getLogger(__name__)
 
+def _requested_engines(engines: Optional[List[str]]) -> List[str]:
+    # If caller passed engines, respect that; else use the registry's WEB_SEARCH_ENGINES selection
+    if engines:
+        return [e.strip().lower() for e in engines if e]
+    return web_search_registry.selected
+
 async def perform_web_search(
     query: str,
     max_results: int = 5,
@@ -22,6 +25,11 @@ async def perform_web_search(
     """
     Perform concurrent web searches using multiple engines.
     
+    Results are cached per normalized query and engine set, and identical
+    searches already in flight are shared instead of repeated. The search has
+    an overall deadline (WEB_SEARCH_DEADLINE_SECONDS): engines that have not
+    answered by then are cancelled and the results gathered so far are used.
+    
     Args:
         query (str): The search query.
         max_results (int): Maximum number of results to return.
@@ -31,116 +39,99 @@ async def perform_web_search(
     Returns:
         List[SearchResult]: Combined results from all engines, sorted by relevance.
     """
+    requested = _requested_engines(engines)
+    key = cache_key(query, requested, max_results, domain_filter)
+    try:
+        return await web_search_cache.get_or_search(
+            key, requested, lambda: _search_uncached(query, max_results, requested, domain_filter)
+        )
+    except Exception as e:
+        logger.error(f"Web search failed: {str(e)}")
+        return []
+
+async def _search_uncached(
+    query: str,
+    max_results: int,
+    requested: List[str],
+    domain_filter: Optional[str]
+) -> SearchOutcome:
     try:
-        # Ensure latest env vars (e.g., WEB_SEARCH_ENGINES, BRAVE_API_KEY) are loaded without requiring server restart
-        # This file lives at backend/utils/web_search/main.py; we need backend/.env (go up 2 levels: utils/web_search -> utils -> backend)
-        env_path = Path(__file__).resolve().parents[2] / '.env'
-        load_dotenv(env_path, override=True)
-        # Build engine map lazily to avoid import errors for optional providers
-        engine_map = {
-            "duckduckgo": DuckDuckGoEngine()
-        }
-        # Optionally include Sougou if requested and dependency is available
-        requested_engines_env = os.getenv("WEB_SEARCH_ENGINES", "").strip()
-        requested_engines = []
-        if requested_engines_env:
-            requested_engines = [e.strip().lower() for e in requested_engines_env.split(',') if e.strip()]
-        # If caller passed engines, respect that; else use env list; else default to ddg
-        if engines and len(engines) > 0:
-            selected_engines = [e.strip().lower() for e in engines if e]
-        elif requested_engines:
-            selected_engines = requested_engines
-        else:
-            selected_engines = ["duckduckgo"]
-        # Attempt to register Sougou engine if selected
-        if "sougou" in selected_engines and "sougou" not in engine_map:
-            try:
-                from .sougou import SougouEngine  # type: ignore
-                engine_map["sougou"] = SougouEngine()
-            except Exception as e:
-                logger.warning(f"Sougou engine requested but unavailable: {e}")
-                # Remove from selection to avoid task errors
-                selected_engines = [e for e in selected_engines if e != "sougou"]
-        # Attempt to register Brave engine if selected
-        if "brave" in selected_engines and "brave" not in engine_map:
-            try:
-                from .brave import BraveEngine  # type: ignore
-                engine_map["brave"] = BraveEngine()
-            except Exception as e:
-                logger.warning(f"Brave engine requested but unavailable: {e}")
-                selected_engines = [e for e in selected_engines if e != "brave"]
-        
         # China-friendly gating: only run external search when proxy is configured
-        use_proxy = os.getenv("HTTP_PROXY") or os.getenv("HTTPS_PROXY")
-        if not use_proxy:
+        if not web_search_registry.proxy_configured:
             logger.info("No HTTP(S)_PROXY detected; skipping external web search. Configure a proxy to enable web search.")
-            return []
+            return SearchOutcome([], True)
 
-        # Filter out unknown engines and log the final list
-        selected_engines = [e for e in selected_engines if e in engine_map]
+        # Engines are built once by the registry; skip any that are not configured
+        selected_engines = [e for e in requested if web_search_registry.get(e) is not None]
         if not selected_engines:
             selected_engines = ["duckduckgo"]
         logger.info(f"Web search engines selected: {selected_engines}")
 
+        # One deadline covers every engine, retry and fallback; whatever has answered by then is used
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + float(config.web_search_deadline_seconds)
+
+        def remaining() -> float:
+            return deadline - loop.time()
+
         async def _run_with_retry(engine_name: str, tries: int = 2) -> List[SearchResult]:
             delay = 0.5
             for attempt in range(tries):
+                if remaining() <= 0:
+                    break
                 try:
-                    return await engine_map[engine_name].search(query, max_results + 2, timeout=10)
+                    return await web_search_registry.search(engine_name, query, max_results + 2, timeout=remaining())
                 except Exception as e:
                     logger.error(f"Engine {engine_name} attempt {attempt+1}/{tries} failed: {e}")
-                    if attempt < tries - 1:
+                    if attempt < tries - 1 and remaining() > delay:
                         await asyncio.sleep(delay)
                         delay *= 2
             return []
 
-        tasks = [
-            _run_with_retry(engine)
-            for engine in selected_engines
-            if engine in engine_map
-        ]
+        tasks = {asyncio.ensure_future(_run_with_retry(engine)): engine for engine in selected_engines}
         
-        # Run all searches concurrently and handle exceptions
+        # Run all searches concurrently; engines still running at the deadline are cancelled
         logger.info(f"Starting web search for: '{query}'")
-        results_lists = await asyncio.gather(*tasks, return_exceptions=True)
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, remaining()))
+        complete = not pending
+        for task in pending:
+            task.cancel()
+            logger.warning(f"Engine {tasks[task]} missed the {config.web_search_deadline_seconds}s web search deadline")
         raw_results: List[SearchResult] = []
-        for i, engine_results in enumerate(results_lists):
-            if isinstance(engine_results, BaseException):
-                engine_name = selected_engines[i]
-                logger.error(f"Web search failed: {str(engine_results)}")
+        for task in done:
+            if task.exception() is not None:
+                logger.error(f"Web search failed: {str(task.exception())}")
                 continue
+            engine_results = task.result()
             if hasattr(engine_results, '__iter__') and not isinstance(engine_results, str):
                 # Validate results before adding
                 valid_results = [
                     r for r in engine_results
                     if isinstance(r, SearchResult) and r.title and r.url and r.snippet
                 ]
-                logger.info(f"Engine {selected_engines[i]} returned {len(valid_results)} valid results")
+                logger.info(f"Engine {tasks[task]} returned {len(valid_results)} valid results")
                 raw_results.extend(valid_results)
         
-        # If no results from selected engines, try a best-effort fallback
+        # If no results from selected engines, try a best-effort fallback with the time that is left
         if not raw_results:
-            # Prefer trying an engine that wasn't selected but is readily available
-            try:
-                # If Brave key is present, try Brave once
-                if os.getenv("BRAVE_API_KEY"):
-                    try:
-                        from .brave import BraveEngine  # type: ignore
-                        logger.info("No results; attempting Brave fallback")
-                        brave_results = await BraveEngine().search(query, max_results + 2)
-                        raw_results.extend(brave_results)
-                    except Exception as e:
-                        logger.warning(f"Brave fallback failed: {e}")
-                # If still empty and ddg wasn't selected, try ddg once
-                if not raw_results and "duckduckgo" not in selected_engines:
-                    logger.info("No results; attempting DuckDuckGo fallback")
-                    try:
-                        ddg_results = await DuckDuckGoEngine().search(query, max_results + 2)
-                        raw_results.extend(ddg_results)
-                    except Exception as e:
-                        logger.error(f"DuckDuckGo fallback failed: {e}")
-            except Exception:
-                pass
+            fallbacks = [
+                name for name in ("brave", "duckduckgo")
+                if name not in selected_engines and web_search_registry.get(name) is not None
+            ]
+            for name in fallbacks:
+                if remaining() <= 0:
+                    complete = False
+                    break
+                logger.info(f"No results; attempting {name} fallback")
+                try:
+                    raw_results.extend(await asyncio.wait_for(_run_with_retry(name, tries=1), remaining()))
+                except asyncio.TimeoutError:
+                    complete = False
+                    logger.warning(f"{name} fallback missed the web search deadline")
+                except Exception as e:
+                    logger.warning(f"{name} fallback failed: {e}")
+                if raw_results:
+                    break
         
         # Apply domain filter if specified
         if domain_filter:
@@ -166,13 +157,19 @@ async def perform_web_search(
             reverse=True
         )
         
-        return sorted_results[:max_results]
+        return SearchOutcome(sorted_results[:max_results], complete)
     except Exception as e:
         logger.error(f"Web search failed: {str(e)}")
-        return []
+        return SearchOutcome([], False)
 
 # Add RAG indexing function
 def index_knowledge(docs: List[str]):  # Assuming docs is a list of strings or Documents
+    # Imported here so the web search path does not pull in langchain/FAISS at server startup
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_openai import OpenAIEmbeddings
+    from langchain_community.vectorstores import FAISS
+    from pydantic import SecretStr
+
     splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
     chunks = splitter.split_text('\n\n'.join(docs))  # Use split_text for list of strings
     openai_api_key = os.getenv('OPENAI_API_KEY', '')
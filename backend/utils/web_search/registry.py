@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from dotenv import dotenv_values
+
+from backend.config import config
+from backend.utils.metrics import RollingStats
+from .base import SearchEngine
+from .models import SearchResult
+
+logger = logging.getLogger(__name__)
+
+ENV_PATH = Path(__file__).resolve().parents[2] / '.env'
+# Settings the registry reads; everything else in .env is left to the rest of the app
+WEB_SEARCH_ENV_KEYS = (
+    "WEB_SEARCH_ENGINES", "HTTP_PROXY", "HTTPS_PROXY", "BRAVE_API_KEY", "SOUGOU_API_SID", "SOUGOU_API_SK",
+)
+
+
+class WebSearchSettings(NamedTuple):
+    engines: List[str]
+    proxies: Optional[Dict[str, str]]
+    brave_api_key: Optional[str]
+    sougou_sid: Optional[str]
+    sougou_sk: Optional[str]
+
+    @classmethod
+    def from_env(cls, env: Dict[str, Optional[str]]) -> "WebSearchSettings":
+        engines = [e.strip().lower() for e in (env.get("WEB_SEARCH_ENGINES") or "").split(',') if e.strip()]
+        proxies = {}
+        if env.get("HTTP_PROXY"):
+            proxies["http://"] = env["HTTP_PROXY"]
+        if env.get("HTTPS_PROXY"):
+            proxies["https://"] = env["HTTPS_PROXY"]
+        return cls(
+            engines=engines or ["duckduckgo"],
+            proxies=proxies or None,
+            brave_api_key=env.get("BRAVE_API_KEY") or None,
+            sougou_sid=env.get("SOUGOU_API_SID") or None,
+            sougou_sk=env.get("SOUGOU_API_SK") or None,
+        )
+
+
+def _read_env() -> Dict[str, Optional[str]]:
+    """Process environment overlaid with backend/.env, so edits to the file win without a restart."""
+    env = {key: os.environ.get(key) for key in WEB_SEARCH_ENV_KEYS}
+    if ENV_PATH.exists():
+        file_values = dotenv_values(ENV_PATH)
+        env.update({key: file_values[key] for key in WEB_SEARCH_ENV_KEYS if key in file_values})
+    return env
+
+
+class EngineStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.empty = 0
+        self.latency = RollingStats(window=500)
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "empty": self.empty,
+            "latency_ms": self.latency.summary(scale=1000, digits=1),
+        }
+
+
+class WebSearchEngineRegistry:
+    """Builds the configured search engines once and shares them across requests.
+
+    Each engine owns a persistent HTTP client (pooled connections through the
+    proxy). Settings come from the environment and backend/.env; they are
+    re-read only on :meth:`reload`, which the .env watcher and the admin
+    endpoint call. Engines replaced by a reload are closed afterwards.
+    """
+
+    def __init__(self):
+        self.settings: Optional[WebSearchSettings] = None
+        self._engines: Dict[str, SearchEngine] = {}
+        self.stats_by_engine: Dict[str, EngineStats] = {}
+        self.reloads = 0
+        self.loaded_at: Optional[float] = None
+        self._env_mtime: Optional[float] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    def _build_engines(self, settings: WebSearchSettings) -> Dict[str, SearchEngine]:
+        engines: Dict[str, SearchEngine] = {}
+        try:
+            from .duckduckgo import DuckDuckGoEngine
+            engines["duckduckgo"] = DuckDuckGoEngine(proxies=settings.proxies)
+        except Exception as e:
+            logger.warning(f"DuckDuckGo engine unavailable: {e}")
+        if settings.brave_api_key:
+            try:
+                from .brave import BraveEngine
+                engines["brave"] = BraveEngine(settings.brave_api_key, proxies=settings.proxies)
+            except Exception as e:
+                logger.warning(f"Brave engine unavailable: {e}")
+        if settings.sougou_sid and settings.sougou_sk:
+            try:
+                from .sougou import SougouEngine
+                engines["sougou"] = SougouEngine(
+                    settings.sougou_sid, settings.sougou_sk,
+                    max_workers=max(1, int(config.web_search_blocking_workers))
+                )
+            except Exception as e:
+                logger.warning(f"Sougou engine unavailable: {e}")
+        for name in settings.engines:
+            if name not in engines:
+                logger.warning(f"Web search engine '{name}' is selected but not configured or unavailable")
+        return engines
+
+    def _load(self) -> Dict[str, SearchEngine]:
+        """Swap in freshly built engines; returns the previous ones for the caller to close."""
+        settings = WebSearchSettings.from_env(_read_env())
+        engines = self._build_engines(settings)
+        previous, self._engines, self.settings = self._engines, engines, settings
+        for name in engines:
+            self.stats_by_engine.setdefault(name, EngineStats())
+        self.loaded_at = time.time()
+        self._env_mtime = self._current_env_mtime()
+        logger.info(f"Web search engines loaded: {sorted(engines)} (selected: {self.selected})")
+        return previous
+
+    def ensure_loaded(self) -> None:
+        if self.settings is None:
+            self._load()
+
+    async def reload(self) -> dict:
+        previous = self._load()
+        self.reloads += 1
+        await self._close(previous)
+        return self.stats()
+
+    @staticmethod
+    async def _close(engines: Dict[str, SearchEngine]) -> None:
+        for name, engine in engines.items():
+            try:
+                await engine.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing web search engine '{name}': {e}")
+
+    @staticmethod
+    def _current_env_mtime() -> Optional[float]:
+        try:
+            return ENV_PATH.stat().st_mtime
+        except OSError:
+            return None
+
+    async def _watch_env(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._current_env_mtime() != self._env_mtime:
+                    logger.info(f"{ENV_PATH} changed; reloading web search engines")
+                    await self.reload()
+            except Exception as e:
+                logger.error(f"Web search engine reload failed: {e}")
+
+    def start(self) -> None:
+        self.ensure_loaded()
+        interval = float(config.web_search_env_watch_interval_seconds)
+        if interval > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch_env(interval))
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        engines, self._engines, self.settings = self._engines, {}, None
+        await self._close(engines)
+
+    @property
+    def selected(self) -> List[str]:
+        self.ensure_loaded()
+        return [name for name in self.settings.engines if name in self._engines] or (
+            ["duckduckgo"] if "duckduckgo" in self._engines else []
+        )
+
+    @property
+    def proxy_configured(self) -> bool:
+        self.ensure_loaded()
+        return bool(self.settings.proxies)
+
+    def get(self, name: str) -> Optional[SearchEngine]:
+        self.ensure_loaded()
+        return self._engines.get(name)
+
+    async def search(self, name: str, query: str, max_results: int, timeout: int = 10) -> List[SearchResult]:
+        """Run one engine and record its latency; raises if the engine is not loaded."""
+        engine = self.get(name)
+        if engine is None:
+            raise KeyError(f"Web search engine '{name}' is not loaded")
+        stats = self.stats_by_engine[name]
+        stats.requests += 1
+        started = time.monotonic()
+        try:
+            results = await engine.search(query, max_results, timeout=timeout)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.latency.observe(time.monotonic() - started)
+        if not results:
+            stats.empty += 1
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "loaded": sorted(self._engines),
+            "selected": self.selected if self.settings else [],
+            "proxy_configured": bool(self.settings and self.settings.proxies),
+            "reloads": self.reloads,
+            "loaded_at": self.loaded_at,
+            "engines": {name: s.summary() for name, s in self.stats_by_engine.items()},
+            "duckduckgo_backend_wins": getattr(self._engines.get("duckduckgo"), "backend_wins", None),
+        }
+
+
+web_search_registry = WebSearchEngineRegistry()
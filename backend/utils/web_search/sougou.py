@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Optional
 from tencentcloud.common import credential
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
@@ -14,43 +16,48 @@ from .utils import get_filtered_results
 class SougouEngine(SearchEngine):
     """Sougou search engine implementation using Tencent Cloud API."""
     
-    def __init__(self):
+    def __init__(self, sid: str, sk: str, timeout: int = 10, max_workers: int = 4):
         self.logger = logging.getLogger(__name__)
+        # Built once; the SDK client keeps its HTTP session (and connections) between calls
+        cred = credential.Credential(sid, sk)
+        http_profile = HttpProfile(
+            endpoint="tms.tencentcloudapi.com",
+            # The SDK is blocking; a request timeout lets a thread give up when we do
+            reqTimeout=timeout
+        )
         
-    async def search(self, query: str, max_results: int = 5,
+        client_profile = ClientProfile(
+            httpProfile=http_profile
+        )
+        
+        self._client = CommonClient(
+            "tms",
+            "2020-12-29",
+            cred,
+            "",
+            profile=client_profile
+        )
+        # Tencent Cloud has no async client, so calls run on a small pool of our own
+        # instead of blocking the event loop or filling the default executor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sougou-search")
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def search(self, query: str, max_results: int = 5, timeout: int = 10,
                    filter_list: Optional[List[str]] = None) -> List[SearchResult]:
         """Search using Tencent Cloud's Sougou API."""
         try:
-            # Get credentials from config
-            sid = os.getenv("SOUGOU_API_SID")
-            sk = os.getenv("SOUGOU_API_SK")
-            if not sid or not sk:
-                self.logger.error("Sougou API credentials not configured")
-                return []
-
-            cred = credential.Credential(sid, sk)
-            http_profile = HttpProfile(
-                endpoint="tms.tencentcloudapi.com"
-            )
-            
-            client_profile = ClientProfile(
-                httpProfile=http_profile
-            )
-            
             params = {
                 "Query": query,
                 "Cnt": min(max_results, 20)  # API max is 20
             }
             
-            common_client = CommonClient(
-                "tms",
-                "2020-12-29",
-                cred,
-                "",
-                profile=client_profile
+            loop = asyncio.get_running_loop()
+            response = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, partial(self._client.call_json, "SearchPro", params)),
+                timeout
             )
-            
-            response = common_client.call_json("SearchPro", params)
             results = [
                 json.loads(page)
                 for page in response["Response"]["Pages"]
@@ -76,6 +83,8 @@ class SougouEngine(SearchEngine):
                 for result in sorted_results[:max_results]
             ]
             
+        except asyncio.TimeoutError:
+            self.logger.error(f"Sougou search timed out after {timeout}s for query '{query}'")
         except TencentCloudSDKException as e:
             self.logger.error(f"Tencent Cloud API error: {e}")
         except Exception as e:
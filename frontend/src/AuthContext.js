@@ -1,6 +1,5 @@
 import React, { createContext, useState, useEffect } from 'react';
-import axios from 'axios';
-import { setAuthHeader, login as apiLogin, register as apiRegister, getCurrentUser } from './services/apiService';
+import { setAuthHeader, login as apiLogin, logout as apiLogout, register as apiRegister, getCurrentUser, refreshAccessToken } from './services/apiService';
 
 export const AuthContext = createContext();
 
@@ -20,21 +19,11 @@ export const AuthProvider = ({ children }) => {
         } catch (error) {
           // If token is invalid, try to refresh
           try {
-            const refreshToken = localStorage.getItem('refresh_token');
-            if (refreshToken) {
-              const refreshResponse = await axios.post(
-                `${process.env.REACT_APP_BACKEND_URL || 'http://localhost:4100'}/api/auth/refresh`,
-                { refresh_token: refreshToken }
-              );
-              const { access_token } = refreshResponse.data;
-              localStorage.setItem('access_token', access_token);
-              setAuthHeader(access_token);
-              setToken(access_token);
-              const userResponse = await getCurrentUser();
-              setUser(userResponse.data);
-            } else {
-              throw error;
-            }
+            // Same routine as the API client, so the rotated refresh token is kept
+            const access_token = await refreshAccessToken();
+            setToken(access_token);
+            const userResponse = await getCurrentUser();
+            setUser(userResponse.data);
           } catch (refreshError) {
             localStorage.removeItem('access_token');
             localStorage.removeItem('refresh_token');
@@ -64,11 +53,9 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('access_token');
-    localStorage.removeItem('refresh_token');
+    apiLogout();
     setToken(null);
     setUser(null);
-    setAuthHeader(null);
   };
 
   return (
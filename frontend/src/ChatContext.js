@@ -24,6 +24,10 @@ const _processAssistantMessage = (msg) => {
   } else {
     answerContent = msg.text;
   }
+  if (msg.partial) {
+    // Stored by the backend after the stream was stopped
+    answerContent = answerContent ? `${answerContent} [Stopped]` : 'Generation stopped.';
+  }
 
   // Map persisted snake_case fields to camelCase for UI
   const webSearchState = msg.webSearchState || msg.web_search_state;
@@ -98,7 +102,8 @@ export const ChatProvider = ({ children }) => {
       return [];
     }
     try {
-      const response = await apiService.fetchConversations();
+      // Render the sidebar as soon as the first page arrives; older pages fill in behind it
+      const response = await apiService.fetchConversations(setConversations);
       setConversations(response.data);
       return response.data;
     } catch (error) {
@@ -279,6 +284,10 @@ export const ChatProvider = ({ children }) => {
             finalMessageState.citations = event.data?.items || [];
             updateAIResponse(msg => ({ ...msg, citations: finalMessageState.citations }));
             break;
+          case 'message.saved':
+            // The backend stored the reply itself; keep its id, timestamp and timing
+            finalMessageState.saved = event.data;
+            break;
           case 'thread.run.completed':
             if (finalMessageState.isPreparing) {
               finalMessageState.isPreparing = false;
@@ -289,22 +298,16 @@ export const ChatProvider = ({ children }) => {
               finalMessageState.thinkingDuration = (Date.now() - finalMessageState.thinkingStartTime) / 1000;
             }
             
-            // --- 4. Save Final AI Message ---
-            const messageToSave = {
+            // --- 4. Final AI Message (stored by the backend at the end of the stream) ---
+            const saved = finalMessageState.saved || {};
+            const processedMessage = _processAssistantMessage({
+              id: saved.id || aiResponseId,
               conversation_id: finalMessageState.conversation_id,
               sender: 'assistant',
               text: `<think>${finalMessageState.thinking}</think><answer>${finalMessageState.answer}</answer>`,
-              thinking_duration: finalMessageState.thinkingDuration,
-              timestamp: new Date().toISOString(),
-              // Persist citations and states for history
-              citations: finalMessageState.citations || [],
-              web_search_state: finalMessageState.webSearchState === 'false' ? undefined : finalMessageState.webSearchState,
-              rag_state: finalMessageState.ragState,
-            };
-
-            const savedAssistantMessage = await apiService.saveMessage(messageToSave);
-            
-            const processedMessage = _processAssistantMessage(savedAssistantMessage.data);
+              thinking_duration: saved.thinking_duration ?? finalMessageState.thinkingDuration,
+              timestamp: saved.timestamp || new Date().toISOString(),
+            });
             // Preserve citations and web/rag states in the final rendered message
             const mergedMessage = {
               ...processedMessage,
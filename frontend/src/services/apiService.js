@@ -30,7 +30,7 @@ const scheduleTokenRefresh = (token) => {
     
     if (timeUntilExpiry > refreshThreshold) {
       refreshTimer = setTimeout(() => {
-        refreshAccessToken();
+        refreshAccessToken().catch(error => console.error('Token refresh failed:', error));
       }, timeUntilExpiry - refreshThreshold);
     }
   } catch (error) {
@@ -38,21 +38,44 @@ const scheduleTokenRefresh = (token) => {
   }
 };
 
-const refreshAccessToken = async () => {
-  try {
-    const refreshToken = localStorage.getItem('refresh_token');
-    if (!refreshToken) return;
+const clearTokens = () => {
+  localStorage.removeItem('access_token');
+  localStorage.removeItem('refresh_token');
+  setAuthHeader(null);
+};
 
-    const response = await apiClient.post('/api/auth/refresh', { refresh_token: refreshToken });
-    const { access_token } = response.data;
-    
-    localStorage.setItem('access_token', access_token);
-    setAuthHeader(access_token);
-    scheduleTokenRefresh(access_token);
-  } catch (error) {
-    console.error('Token refresh failed:', error);
-    clearRefreshTimer();
+let refreshInFlight = null;
+
+// Trades the refresh token for a new pair and resolves to the new access token.
+// Shared by the refresh timer, the 401 interceptor and the chat stream: concurrent
+// callers wait for the same request, since a rotated refresh token works only once.
+export const refreshAccessToken = () => {
+  if (!refreshInFlight) {
+    refreshInFlight = (async () => {
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (!refreshToken) {
+        clearTokens();
+        throw new Error('No refresh token available');
+      }
+      try {
+        const response = await apiClient.post('/api/auth/refresh', { refresh_token: refreshToken });
+        const { access_token, refresh_token } = response.data;
+
+        localStorage.setItem('access_token', access_token);
+        // Refresh tokens are rotated on every refresh
+        if (refresh_token) localStorage.setItem('refresh_token', refresh_token);
+        setAuthHeader(access_token);
+        return access_token;
+      } catch (error) {
+        // The session is over (expired, revoked or replayed token); don't retry with it
+        clearTokens();
+        throw error;
+      }
+    })().finally(() => {
+      refreshInFlight = null;
+    });
   }
+  return refreshInFlight;
 };
 
 // Initialize auth token if exists
@@ -68,43 +91,16 @@ apiClient.interceptors.response.use(
   async error => {
     const originalRequest = error.config;
     
-    // If 401 and not a refresh request
+    // If 401 and not a refresh request (or a login, whose 401 means wrong credentials)
     if (error.response?.status === 401 &&
         !originalRequest._retry &&
-        !originalRequest.url.includes('/auth/refresh')) {
+        !originalRequest.url.includes('/auth/refresh') &&
+        !originalRequest.url.includes('/auth/login')) {
       originalRequest._retry = true;
-      
-      try {
-        const refreshToken = localStorage.getItem('refresh_token');
-        if (!refreshToken) {
-          // No refresh token available - clear everything
-          localStorage.removeItem('access_token');
-          localStorage.removeItem('refresh_token');
-          setAuthHeader(null);
-          return Promise.reject(new Error('No refresh token available'));
-        }
-        
-        const refreshResponse = await apiClient.post('/api/auth/refresh', { refresh_token: refreshToken });
-        const { access_token } = refreshResponse.data;
-        
-        localStorage.setItem('access_token', access_token);
-        setAuthHeader(access_token);
-        originalRequest.headers['Authorization'] = `Bearer ${access_token}`;
-        
-        return apiClient(originalRequest);
-      } catch (refreshError) {
-        // Clear tokens if refresh fails and prevent infinite loop
-        localStorage.removeItem('access_token');
-        localStorage.removeItem('refresh_token');
-        setAuthHeader(null);
-        
-        // Only reject if this isn't already a refresh request
-        if (!originalRequest.url.includes('/auth/refresh')) {
-          return Promise.reject(refreshError);
-        }
-        // For refresh failures, return original error to prevent loop
-        return Promise.reject(error);
-      }
+
+      const accessToken = await refreshAccessToken();
+      originalRequest.headers['Authorization'] = `Bearer ${accessToken}`;
+      return apiClient(originalRequest);
     }
     return Promise.reject(error);
   }
@@ -132,12 +128,25 @@ export const cleanupDocuments = () => {
   return apiClient.post('/api/documents/cleanup');
 };
 
-export const fetchConversations = () => {
-  return apiClient.get('/api/chat/conversations');
+// Walks a cursor-paginated listing; onPage receives the items loaded so far after every page
+const fetchAllPages = async (url, onPage) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const response = await apiClient.get(url, { params: cursor ? { cursor } : {} });
+    items.push(...response.data.items);
+    cursor = response.data.next_cursor;
+    if (onPage) onPage([...items]);
+  } while (cursor);
+  return { data: items };
+};
+
+export const fetchConversations = (onPage) => {
+  return fetchAllPages('/api/chat/conversations', onPage);
 };
 
 export const fetchMessagesForConversation = (conversationId) => {
-  return apiClient.get(`/api/chat/conversations/${conversationId}/messages`);
+  return fetchAllPages(`/api/chat/conversations/${conversationId}/messages`);
 };
 
 export const createNewChat = (title) => {
@@ -169,11 +178,14 @@ export const streamChatResponse = (payload, { signal, webSearchEnabled, ragEnabl
         model: payload.model,
         web_search_enabled: webSearchEnabled,
         rag_enabled: ragEnabled,
-        token: localStorage.getItem('access_token') // Add token to payload
     };
+    // Authenticated like every other API call
+    const headers = { Authorization: `Bearer ${localStorage.getItem('access_token')}` };
+    // On a 401 the stream refreshes the tokens the way the axios interceptor does and retries once
+    const reauthenticate = async () => ({ Authorization: `Bearer ${await refreshAccessToken()}` });
 
     // Pass the properly structured payload and signal to the streaming service
-    return streamResponse(url, { ...requestPayload, signal });
+    return streamResponse(url, { ...requestPayload, signal, headers }, { reauthenticate });
 };
 
 export const saveMessage = (message) => {
@@ -215,6 +227,12 @@ export const updateUser = (userData) => {
 };
 
 export const logout = () => {
+  // Ends the session on the server too, so the refresh token cannot be used again
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (refreshToken) {
+    apiClient.post('/api/auth/logout', { refresh_token: refreshToken })
+      .catch(error => console.error('Logout request failed:', error));
+  }
   localStorage.removeItem('access_token');
   localStorage.removeItem('refresh_token');
   setAuthHeader(null);
@@ -9,6 +9,20 @@ async function* parseStreamByTags(textStream) {
 
         let i = 0;
         while (i < buffer.length) {
+            // The backend stored the reply; sent last, whatever state the model left the stream in
+            if (buffer.startsWith('<saved>', i)) {
+                const end = buffer.indexOf('</saved>', i);
+                if (end === -1) break; // wait for more data
+                try {
+                    const saved = JSON.parse(buffer.substring(i + '<saved>'.length, end));
+                    yield { event: 'message.saved', data: saved };
+                } catch (e) {
+                    console.error('Malformed saved message event:', e);
+                }
+                i = end + '</saved>'.length;
+                state = 'seeking';
+                continue;
+            }
             if (state === 'seeking') {
                 // Status tags for web search and RAG
                 if (buffer.startsWith('<websearch>', i)) {
@@ -97,16 +111,27 @@ async function* openAIStreamToText(sseReader) {
     }
 }
 
-export async function* streamResponse(url, requestOptions) {
-    const { signal, ...bodyPayload } = requestOptions;
+// reauthenticate: optional async function returning fresh auth headers; called once
+// when the server answers 401, after which the request is sent again
+export async function* streamResponse(url, requestOptions, { reauthenticate } = {}) {
+    const { signal, headers, ...bodyPayload } = requestOptions;
 
-    const response = await fetch(url, {
+    const send = (authHeaders) => fetch(url, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', ...authHeaders },
         body: JSON.stringify(bodyPayload),
         signal: signal,
     });
 
+    let response = await send(headers);
+    if (response.status === 401 && reauthenticate) {
+        response = await send({ ...headers, ...(await reauthenticate()) });
+    }
+
+    if (!response.ok) {
+        throw new Error(`Chat request failed with status ${response.status}`);
+    }
+
     if (!response.body) {
         throw new Error('Response body is null');
     }
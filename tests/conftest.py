@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# backend.config and backend.database read these at import; the tests never reach a server
+os.environ.setdefault("SECRET_KEY", "test-secret-key-of-at-least-thirty-two-chars")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "shiancochat_test")
+os.environ.setdefault("LLM_BASE_URL", "http://localhost:1234")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
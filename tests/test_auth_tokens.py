@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from jose import jwt
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from backend.config import config
+from backend.services.auth.sessions import RefreshSessions
+from backend.services.auth.tokens import ALGORITHM, TokenError, TokenService
+
+SECRET = "0123456789abcdef0123456789abcdef"
+
+
+class FakeSessions:
+    """The few refresh_sessions operations RefreshSessions uses, kept in a dict."""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(doc, query):
+        return all(doc.get(k) == v for k, v in query.items())
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate _id")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, query):
+        return next((dict(d) for d in self.docs.values() if self._matches(d, query)), None)
+
+    async def find_one_and_update(self, query, update, return_document=ReturnDocument.BEFORE):
+        doc = next((d for d in self.docs.values() if self._matches(d, query)), None)
+        if doc is None:
+            return None
+        for key, step in update.get("$inc", {}).items():
+            doc[key] += step
+        doc.update(update.get("$set", {}))
+        return dict(doc)
+
+    async def update_one(self, query, update):
+        doc = await self.find_one_and_update(query, update)
+        return SimpleNamespace(modified_count=int(doc is not None))
+
+    async def update_many(self, query, update):
+        docs = [d for d in self.docs.values() if self._matches(d, query)]
+        for doc in docs:
+            doc.update(update["$set"])
+        return SimpleNamespace(modified_count=len(docs))
+
+    def find(self, query, projection=None):
+        async def rows():
+            for doc in list(self.docs.values()):
+                if self._matches(doc, query):
+                    yield dict(doc)
+        return rows()
+
+
+@pytest.fixture
+def tokens():
+    return TokenService(SECRET)
+
+
+@pytest.fixture
+def db():
+    return SimpleNamespace(refresh_sessions=FakeSessions())
+
+
+async def _login(db, sessions, tokens, email="user@example.com"):
+    family, expires_at = await sessions.start(db, email)
+    token, _ = tokens.create_refresh_token(email, family, expires_at)
+    return token
+
+
+def test_refresh_token_claims_round_trip(tokens):
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    token, _ = tokens.create_refresh_token("user@example.com", "fam1", expires_at, generation=3)
+    claims = tokens.verify_refresh(token)
+    assert claims.email == "user@example.com"
+    assert claims.family == "fam1"
+    assert claims.generation == 3
+    assert abs((claims.expires_at - expires_at).total_seconds()) < 1
+
+
+def test_access_token_is_not_a_refresh_token(tokens):
+    with pytest.raises(TokenError):
+        tokens.verify_refresh(tokens.create_access_token("user@example.com"))
+    with pytest.raises(TokenError):
+        tokens.verify_refresh("not-a-jwt")
+
+
+def test_legacy_refresh_token_has_no_claims(tokens):
+    # Tokens from before self-contained refresh tokens only carried an expiry
+    legacy = jwt.encode({"exp": datetime.now(timezone.utc) + timedelta(days=1)}, SECRET, algorithm=ALGORITHM)
+    assert tokens.verify_refresh(legacy) is None
+
+
+def test_rotation_keeps_family_and_expiry(tokens):
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    token, _ = tokens.create_refresh_token("user@example.com", "fam1", expires_at)
+    claims = tokens.verify_refresh(token)
+    rotated, rotated_expiry = tokens.rotate_refresh_token(claims, 1)
+    rotated_claims = tokens.verify_refresh(rotated)
+    assert rotated != token
+    assert rotated_claims.family == "fam1"
+    assert rotated_claims.generation == 1
+    assert rotated_expiry == claims.expires_at
+
+
+@pytest.mark.asyncio
+async def test_only_the_newest_token_refreshes(db, tokens, monkeypatch):
+    monkeypatch.setattr(config, "refresh_token_reuse_grace_seconds", 0.0)
+    sessions = RefreshSessions()
+    first = tokens.verify_refresh(await _login(db, sessions, tokens))
+
+    generation = await sessions.advance(db, first)
+    assert generation == 1
+    second = tokens.verify_refresh(tokens.rotate_refresh_token(first, generation)[0])
+
+    # Replaying the first token revokes the login, so the second stops working too
+    assert await sessions.advance(db, first) is None
+    assert sessions.replays == 1
+    assert await sessions.advance(db, second) is None
+    assert db.refresh_sessions.docs[first.family]["revoked"] is True
+
+
+@pytest.mark.asyncio
+async def test_racing_refresh_within_grace_gets_current_generation(db, tokens, monkeypatch):
+    monkeypatch.setattr(config, "refresh_token_reuse_grace_seconds", 30.0)
+    sessions = RefreshSessions()
+    claims = tokens.verify_refresh(await _login(db, sessions, tokens))
+    assert await sessions.advance(db, claims) == 1
+    assert await sessions.advance(db, claims) == 1
+    assert sessions.grace_reuses == 1
+    assert sessions.replays == 0
+
+
+@pytest.mark.asyncio
+async def test_revoked_family_is_rejected_by_other_processes(db, tokens):
+    sessions = RefreshSessions()
+    claims = tokens.verify_refresh(await _login(db, sessions, tokens))
+    await sessions.revoke(db, claims.family)
+    # A process that did not see the logout finds the revocation in Mongo
+    assert await RefreshSessions().advance(db, claims) is None
+
+
+@pytest.mark.asyncio
+async def test_unknown_family_is_rejected(db, tokens):
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    token, _ = tokens.create_refresh_token("user@example.com", "expired-family", expires_at)
+    assert await RefreshSessions().advance(db, tokens.verify_refresh(token)) is None
+
+
+@pytest.mark.asyncio
+async def test_token_without_generation_is_adopted_once(db, tokens, monkeypatch):
+    monkeypatch.setattr(config, "refresh_token_reuse_grace_seconds", 0.0)
+    sessions = RefreshSessions()
+    token = jwt.encode({
+        "sub": "user@example.com",
+        "typ": "refresh",
+        "fam": "fam-before-generations",
+        "jti": "1",
+        "exp": datetime.now(timezone.utc) + timedelta(days=1),
+    }, SECRET, algorithm=ALGORITHM)
+    claims = tokens.verify_refresh(token)
+    assert claims.generation is None
+    assert await sessions.advance(db, claims) == 1
+    assert await sessions.advance(db, claims) is None
+
+
+@pytest.mark.asyncio
+async def test_revoke_user_ends_every_login(db, tokens):
+    sessions = RefreshSessions()
+    a = tokens.verify_refresh(await _login(db, sessions, tokens))
+    b = tokens.verify_refresh(await _login(db, sessions, tokens))
+    await sessions.revoke_user(db, "user@example.com")
+    assert await RefreshSessions().advance(db, a) is None
+    assert await RefreshSessions().advance(db, b) is None
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services.chat.context_cache import ConversationContextCache, clean_message_text
+
+T0 = datetime(2024, 5, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self._docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    async def __aiter__(self):
+        for doc in self._docs:
+            # Yield to the loop like a real cursor, so concurrent reads interleave
+            await asyncio.sleep(0)
+            yield dict(doc)
+
+
+class FakeMessages:
+    def __init__(self):
+        self.docs = []
+        self.finds = 0
+
+    def add(self, msg_id, sender, text, timestamp):
+        self.docs.append({"id": msg_id, "conversation_id": "c", "sender": sender, "text": text,
+                          "clean_text": clean_message_text(sender, text), "timestamp": timestamp})
+
+    def find(self, query, projection):
+        self.finds += 1
+        since = query.get("timestamp", {}).get("$gte")
+        return FakeCursor([
+            d for d in self.docs
+            if d["conversation_id"] == query["conversation_id"] and (since is None or d["timestamp"] >= since)
+        ])
+
+
+@pytest.fixture
+def db():
+    return SimpleNamespace(messages=FakeMessages())
+
+
+def test_assistant_text_is_cleaned():
+    assert clean_message_text("assistant", "<think>hmm</think><answer>Hi</answer>") == "Hi"
+    assert clean_message_text("user", "<answer>kept</answer>") == "<answer>kept</answer>"
+
+
+@pytest.mark.asyncio
+async def test_incremental_read_appends_only_new_messages(db):
+    cache = ConversationContextCache(max_conversations=10, ttl_seconds=60)
+    db.messages.add("m1", "user", "hello", T0)
+    db.messages.add("m2", "assistant", "<think>x</think><answer>hi</answer>", T0 + timedelta(seconds=1))
+    assert await cache.get_history(db, "c") == [
+        {"role": "user", "content": "hello"}, {"role": "assistant", "content": "hi"}
+    ]
+    # Same timestamp as the last message held: read again by the $gte query, skipped by id
+    db.messages.add("m3", "user", "again", T0 + timedelta(seconds=1))
+    history = await cache.get_history(db, "c")
+    assert [m["content"] for m in history] == ["hello", "hi", "again"]
+    assert cache.full_loads == 1
+    assert cache.incremental_loads == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_do_not_duplicate(db):
+    cache = ConversationContextCache(max_conversations=10, ttl_seconds=60)
+    db.messages.add("m1", "user", "one", T0)
+    await cache.get_history(db, "c")
+    for i in range(2, 6):
+        db.messages.add(f"m{i}", "user", str(i), T0 + timedelta(seconds=i))
+    results = await asyncio.gather(*(cache.get_history(db, "c") for _ in range(5)))
+    expected = ["one", "2", "3", "4", "5"]
+    assert all([m["content"] for m in r] == expected for r in results)
+
+
+@pytest.mark.asyncio
+async def test_recorded_message_is_not_read_twice(db):
+    cache = ConversationContextCache(max_conversations=10, ttl_seconds=60)
+    db.messages.add("m1", "user", "one", T0)
+    await cache.get_history(db, "c")
+    db.messages.add("m2", "assistant", "two", T0 + timedelta(seconds=1))
+    cache.record_message("c", "m2", "assistant", "two", T0 + timedelta(seconds=1))
+    assert [m["content"] for m in await cache.get_history(db, "c")] == ["one", "two"]
+
+
+@pytest.mark.asyncio
+async def test_backdated_message_forces_a_full_reload(db):
+    cache = ConversationContextCache(max_conversations=10, ttl_seconds=60)
+    db.messages.add("m2", "user", "later", T0 + timedelta(seconds=5))
+    await cache.get_history(db, "c")
+    db.messages.add("m1", "user", "earlier", T0)
+    cache.record_message("c", "m1", "user", "earlier", T0)
+    assert [m["content"] for m in await cache.get_history(db, "c")] == ["earlier", "later"]
+    assert cache.full_loads == 2
+
+
+@pytest.mark.asyncio
+async def test_returned_history_is_a_copy(db):
+    cache = ConversationContextCache(max_conversations=10, ttl_seconds=60)
+    db.messages.add("m1", "user", "hello", T0)
+    history = await cache.get_history(db, "c")
+    history[0]["content"] = "changed"
+    history.append({"role": "user", "content": "extra"})
+    assert await cache.get_history(db, "c") == [{"role": "user", "content": "hello"}]
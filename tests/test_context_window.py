@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from pymongo.errors import PyMongoError
+
+from backend.config import config
+from backend.services.chat import context_window as context_window_module
+from backend.services.chat.context_window import MESSAGE_OVERHEAD_TOKENS, ContextWindow, TokenCounter
+from backend.services.llm.endpoint_router import EndpointRouter
+
+CONTENT = "x" * 36  # 9 estimated tokens
+COST = 9 + MESSAGE_OVERHEAD_TOKENS
+
+
+@pytest.fixture(scope="module")
+def counter():
+    # No tokenizer file: counts are estimated from text length, which keeps them predictable
+    return TokenCounter(tokenizer_path="/nonexistent/tokenizer.json")
+
+
+@pytest.fixture
+def window(counter):
+    return ContextWindow(counter)
+
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": CONTENT} for i in range(n)]
+
+
+def test_estimate_counts_cjk_per_character(counter):
+    assert not counter.exact
+    assert counter.count("") == 0
+    assert counter.count("abcd" * 10) == 10
+    assert counter.count("你好世界") == 4
+
+
+@pytest.mark.asyncio
+async def test_everything_fits(window, monkeypatch):
+    monkeypatch.setattr(config, "chat_context_token_budget", 1000)
+    history = _history(4)
+    current = {"role": "user", "content": CONTENT}
+    messages, usage = await window.fit(None, "c", history, current)
+    assert messages == history + [current]
+    assert usage.prompt_tokens == 5 * COST
+    assert (usage.kept_messages, usage.dropped_messages, usage.summarized_messages) == (4, 0, 0)
+    assert window.trimmed_requests == 0
+
+
+@pytest.mark.asyncio
+async def test_newest_messages_are_kept_within_budget(window, monkeypatch):
+    monkeypatch.setattr(config, "chat_context_token_budget", 3 * COST)
+    history = _history(6)
+    current = {"role": "user", "content": CONTENT}
+    # No summary stored for the conversation yet
+    messages, usage = await window.fit(None, "c", history, current, conversation={})
+    assert messages == history[-2:] + [current]
+    assert usage.prompt_tokens <= usage.budget
+    assert (usage.kept_messages, usage.dropped_messages, usage.summary_covers) == (2, 4, 0)
+    assert window.trimmed_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_summary_replaces_older_messages(window, monkeypatch):
+    monkeypatch.setattr(config, "chat_context_token_budget", 4 * COST)
+    history = _history(6)
+    current = {"role": "user", "content": CONTENT}
+    conversation = {"context_summary": "x" * 36, "context_summary_covers": 3}
+    messages, usage = await window.fit(None, "c", history, current, conversation=conversation)
+    assert messages[0]["role"] == "system"
+    assert messages[0]["content"].endswith("x" * 36)
+    assert messages[-1] == current
+    assert usage.prompt_tokens <= usage.budget
+    # The summary took the place of kept messages; the gap between it and the window is dropped
+    assert messages[1:-1] == history[-usage.kept_messages:]
+    assert 0 < usage.kept_messages < 3
+    assert usage.summarized_messages == 3
+    assert usage.summarized_messages + usage.dropped_messages + usage.kept_messages == 6
+    assert set(usage.headers()) == {
+        "X-Context-Tokens", "X-Context-Budget", "X-Context-Kept-Messages",
+        "X-Context-Summarized-Messages", "X-Context-Dropped-Messages",
+    }
+
+
+
+class FakeConversations:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Routes summary requests to a handler through a fresh endpoint router."""
+    router = EndpointRouter(["http://llm-a"])
+    replies = {}
+
+    def handler(request):
+        status, body = replies["next"]
+        return httpx.Response(status, json=body)
+
+    client = httpx.AsyncClient(base_url="http://llm-a", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(context_window_module, "endpoint_router", router)
+    monkeypatch.setattr(context_window_module.llm_client_pool, "get", lambda base_url: client)
+    monkeypatch.setattr(config, "chat_summary_enabled", True)
+    return SimpleNamespace(router=router, replies=replies)
+
+
+async def _summarize(window, db):
+    await window._refresh(db, "c", _history(4), None, "model")
+
+
+@pytest.mark.asyncio
+async def test_summary_is_stored_and_tracked(window, llm):
+    llm.replies["next"] = (200, {"choices": [{"message": {"content": "<think>t</think>the gist"}}]})
+    db = SimpleNamespace(conversations=FakeConversations())
+    await _summarize(window, db)
+    assert window.summaries_generated == 1
+    assert db.conversations.updates[0][1]["$set"] == {"context_summary": "the gist", "context_summary_covers": 4}
+    health = llm.router.health("http://llm-a")
+    assert (health.total_requests, health.total_failures, health.in_flight) == (1, 0, 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [
+    {"choices": []},
+    {"choices": [{"message": None}]},
+    {"choices": [None]},
+    ["not", "an", "object"],
+    {"choices": [{"message": {"content": ""}}]},
+])
+async def test_malformed_summary_reply_is_counted(window, llm, body):
+    llm.replies["next"] = (200, body)
+    db = SimpleNamespace(conversations=FakeConversations())
+    await _summarize(window, db)
+    assert window.summary_errors == 1
+    assert window.summaries_generated == 0
+    assert db.conversations.updates == []
+    assert window.stats()["summaries_in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_summary_failures_count_against_the_endpoint(window, llm):
+    llm.replies["next"] = (503, {"error": "overloaded"})
+    await _summarize(window, SimpleNamespace(conversations=FakeConversations()))
+    assert window.summary_errors == 1
+    assert llm.router.health("http://llm-a").total_failures == 1
+
+
+@pytest.mark.asyncio
+async def test_store_failure_is_counted(window, llm):
+    class FailingConversations:
+        async def update_one(self, query, update):
+            raise PyMongoError("connection reset")
+
+    llm.replies["next"] = (200, {"choices": [{"message": {"content": "the gist"}}]})
+    await _summarize(window, SimpleNamespace(conversations=FailingConversations()))
+    assert window.summary_errors == 1
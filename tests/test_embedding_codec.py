@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from bson import BSON
+from bson.binary import Binary
+
+from backend.utils.embedding_codec import decode_embedding, decode_embeddings, encode_embedding
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).standard_normal(384).astype(np.float32)
+
+
+def _through_bson(fields):
+    # What Mongo hands back: BinData comes back as bytes
+    return BSON.decode(BSON.encode(fields))
+
+
+def test_float32_round_trip_is_exact(vector):
+    fields = encode_embedding(vector, "float32")
+    assert isinstance(fields["embedding"], Binary)
+    assert len(fields["embedding"]) == vector.size * 4
+    decoded = decode_embedding(_through_bson(fields))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, vector)
+
+
+def test_float16_round_trip(vector):
+    fields = encode_embedding(vector, "float16")
+    assert len(fields["embedding"]) == vector.size * 2
+    decoded = decode_embedding(_through_bson(fields))
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, vector, rtol=1e-3, atol=1e-3)
+
+
+def test_int8_round_trip(vector):
+    fields = encode_embedding(vector, "int8")
+    assert len(fields["embedding"]) == vector.size
+    assert fields["embedding_scale"] == pytest.approx(np.abs(vector).max() / 127)
+    decoded = decode_embedding(_through_bson(fields))
+    assert decoded.dtype == np.float32
+    # Within half a quantization step everywhere; the direction is all but unchanged
+    assert np.max(np.abs(decoded - vector)) <= fields["embedding_scale"] / 2 + 1e-6
+    cosine = decoded @ vector / (np.linalg.norm(decoded) * np.linalg.norm(vector))
+    assert cosine > 0.999
+
+
+def test_int8_zero_vector():
+    decoded = decode_embedding(_through_bson(encode_embedding(np.zeros(8, dtype=np.float32), "int8")))
+    np.testing.assert_array_equal(decoded, np.zeros(8, dtype=np.float32))
+
+
+def test_legacy_list_and_missing_embedding(vector):
+    fields = encode_embedding(vector, "list")
+    assert isinstance(fields["embedding"], list)
+    np.testing.assert_array_equal(decode_embedding(_through_bson(fields)), vector)
+    assert decode_embedding({"text": "no vector yet"}) is None
+
+
+def test_unknown_format_is_rejected(vector):
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "float64")
+
+
+def test_decode_embeddings_stacks_mixed_formats(vector):
+    docs = [_through_bson(encode_embedding(vector, fmt)) for fmt in ("list", "float32", "float16", "int8")]
+    matrix = decode_embeddings(docs)
+    assert matrix.shape == (4, vector.size)
+    assert matrix.dtype == np.float32
+    assert decode_embeddings([]).shape == (0, 0)
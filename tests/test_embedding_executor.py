@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from backend.services.embeddings.executor import EmbeddingExecutor
+
+
+class BlockingModel:
+    """Encodes to zeros once ``release`` is set; records how many encodes ran at once."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        self.release.wait(5)
+        with self._lock:
+            self.running -= 1
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def model():
+    model = BlockingModel()
+    yield model
+    model.release.set()
+
+
+async def _until(predicate, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        assert loop.time() < deadline
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_embed_splits_into_batches(model):
+    model.release.set()
+    executor = EmbeddingExecutor(lambda: model, max_workers=2, max_queue=4, batch_size=3)
+    vectors = await executor.embed([str(i) for i in range(7)])
+    assert vectors.shape == (7, 4)
+    assert executor.texts_embedded == 7
+    assert executor.admitted == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_its_slot_until_the_job_finishes(model):
+    executor = EmbeddingExecutor(lambda: model, max_workers=2, max_queue=1, batch_size=8)
+    first = asyncio.create_task(executor.embed(["a"]))
+    await _until(lambda: model.running == 1)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    # The encode is still on the thread, so the slot stays taken
+    assert executor.admitted == 1
+
+    second = asyncio.create_task(executor.embed(["b"]))
+    await asyncio.sleep(0.1)
+    assert model.running == 1
+    assert not second.done()
+
+    model.release.set()
+    assert (await second).shape == (1, 4)
+    assert model.peak == 1
+    await _until(lambda: executor.admitted == 0)
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_caller_cancelled_while_waiting_for_a_slot(model):
+    executor = EmbeddingExecutor(lambda: model, max_workers=1, max_queue=1, batch_size=8)
+    first = asyncio.create_task(executor.embed(["a"]))
+    await _until(lambda: model.running == 1)
+    waiting = asyncio.create_task(executor.embed(["b"]))
+    await asyncio.sleep(0.05)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    model.release.set()
+    await first
+    await _until(lambda: executor.admitted == 0)
+    assert executor.queue_depth == 0
+    # The slot is free again
+    assert (await executor.embed(["c"])).shape == (1, 4)
+    executor.shutdown()
@@ -0,0 +1,216 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from backend.config import config
+from backend.models import StreamRequestPayload
+from backend.routers import openai as openai_router
+from backend.services.llm import endpoint_router as endpoint_router_module
+from backend.services.llm.endpoint_router import (
+    DEFAULT_TTFB_SECONDS,
+    CircuitState,
+    EndpointHealth,
+    EndpointRouter,
+    is_endpoint_failure,
+)
+
+A, B, C = "http://llm-a", "http://llm-b", "http://llm-c"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(endpoint_router_module, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(config, "llm_circuit_failure_threshold", 3)
+    monkeypatch.setattr(config, "llm_circuit_cooldown_seconds", 30)
+    return clock
+
+
+@pytest.mark.parametrize("status_code, failure", [
+    (500, True), (502, True), (503, True), (429, True),
+    (400, False), (401, False), (404, False), (413, False), (422, False), (200, False),
+])
+def test_only_5xx_and_429_are_endpoint_failures(status_code, failure):
+    assert is_endpoint_failure(status_code) is failure
+
+
+def test_circuit_opens_at_the_failure_threshold(clock):
+    health = EndpointHealth(A)
+    health.record_failure()
+    health.record_failure()
+    assert health.state == CircuitState.CLOSED
+    health.record_failure()
+    assert health.state == CircuitState.OPEN
+    assert health.opened_at == clock.now
+
+
+def test_success_resets_the_failure_count(clock):
+    health = EndpointHealth(A)
+    health.record_failure()
+    health.record_failure()
+    health.record_success(0.1)
+    health.record_failure()
+    health.record_failure()
+    assert health.state == CircuitState.CLOSED
+    assert health.consecutive_failures == 2
+
+
+def test_open_endpoint_is_skipped_until_its_cooldown(clock):
+    router = EndpointRouter([A, B])
+    for _ in range(3):
+        router.health(A).record_failure()
+    assert router.candidates() == [B]
+
+    for _ in range(3):
+        router.health(B).record_failure()
+    # Everything open and nothing cooled down yet
+    assert router.candidates() == []
+    clock.now += 29
+    assert router.candidates() == []
+    clock.now += 1
+    # Cooled down: oldest opened first
+    assert router.candidates() == [A, B]
+
+
+def test_half_open_probe_closes_or_reopens(clock):
+    router = EndpointRouter([A, B])
+    health = router.health(A)
+    for _ in range(3):
+        health.record_failure()
+    clock.now += 30
+    assert health.cooldown_elapsed()
+
+    # A half-open endpoint gets one trial request, behind the healthy ones
+    health.state = CircuitState.HALF_OPEN
+    assert router.candidates() == [B, A]
+    health.in_flight = 1
+    assert router.candidates() == [B]
+    health.in_flight = 0
+
+    # One failure in half-open reopens it, whatever the threshold
+    health.consecutive_failures = 0
+    health.record_failure()
+    assert health.state == CircuitState.OPEN
+    assert health.opened_at == clock.now
+    assert not health.cooldown_elapsed()
+
+    health.state = CircuitState.HALF_OPEN
+    health.record_success(0.2)
+    assert health.state == CircuitState.CLOSED
+    assert health.opened_at is None
+
+
+def test_score_weighs_load_latency_and_errors(clock):
+    health = EndpointHealth(A)
+    assert health.score() == pytest.approx(DEFAULT_TTFB_SECONDS)
+    health.record_success(0.5)
+    health.in_flight = 2
+    assert health.score() == pytest.approx(3 * 0.5)
+    health.record_failure()
+    # error_rate = 0.2 after one failure from zero
+    assert health.score() == pytest.approx(3 * 0.5 * (1 + 4 * 0.2))
+
+
+def test_candidates_are_ordered_by_score(clock):
+    router = EndpointRouter([A, B, C])
+    router.health(A).record_success(1.0)
+    router.health(B).record_success(0.2)
+    router.health(C).record_success(0.5)
+    assert router.candidates() == [B, C, A]
+    # Load on the fastest endpoint pushes it back
+    router.health(B).in_flight = 4
+    assert router.candidates() == [C, A, B]
+    # Errors push an endpoint back too
+    router.health(C).record_failure()
+    router.health(C).record_failure()
+    assert router.candidates()[0] == A
+
+
+@pytest.mark.asyncio
+async def test_track_counts_in_flight(clock):
+    router = EndpointRouter([A])
+    async with router.track(A) as health:
+        assert health.in_flight == 1
+        async with router.track(A):
+            assert health.in_flight == 2
+    assert health.in_flight == 0
+    with pytest.raises(RuntimeError):
+        async with router.track(A):
+            raise RuntimeError("stream failed")
+    assert router.health(A).in_flight == 0
+
+
+class _NoMessages:
+    def sort(self, *args):
+        return self
+
+    async def __aiter__(self):
+        return
+        yield
+
+
+class _FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def update_one(self, *args, **kwargs):
+        pass
+
+    async def find_one(self, *args, **kwargs):
+        return {"id": "conv-1", "user_email": "user@example.com"}
+
+    def find(self, *args, **kwargs):
+        return _NoMessages()
+
+
+async def _chat(monkeypatch, status_code):
+    """Stream one chat turn against two endpoints that both answer ``status_code``."""
+    router = EndpointRouter([A, B])
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(status_code, json={"error": {"message": "context length exceeded"}})
+
+    monkeypatch.setattr(openai_router, "endpoint_router", router)
+    monkeypatch.setattr(openai_router.llm_client_pool, "get",
+                        lambda base_url: httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(config, "llm_max_retries", 1)
+    monkeypatch.setattr(config, "llm_retry_backoff_seconds", 0.01)
+    db = SimpleNamespace(messages=_FakeCollection(), conversations=_FakeCollection())
+    user = SimpleNamespace(email="user@example.com")
+    payload = StreamRequestPayload(conversation_id="conv-1", text="hello there", model="m",
+                                   web_search_enabled=False, rag_enabled=False)
+    response = await openai_router.chat_with_openai(payload, None, user, db)
+    body = "".join([c if isinstance(c, str) else c.decode() async for c in response.body_iterator])
+    return router, calls, body
+
+
+@pytest.mark.asyncio
+async def test_client_error_passes_through_without_tripping_the_breaker(clock, monkeypatch):
+    router, calls, body = await _chat(monkeypatch, 400)
+    # One call: every endpoint would reject the same request
+    assert len(calls) == 1
+    assert "LLM rejected the request (400)" in body
+    assert [h.total_failures for h in router._health.values()] == [0, 0]
+    assert all(h.state == CircuitState.CLOSED for h in router._health.values())
+
+
+@pytest.mark.asyncio
+async def test_server_error_fails_over_and_counts(clock, monkeypatch):
+    router, calls, _ = await _chat(monkeypatch, 503)
+    # Both endpoints, two rounds
+    assert len(calls) == 4
+    assert [h.total_failures for h in router._health.values()] == [2, 2]
@@ -0,0 +1,45 @@
+import base64
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from backend.utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip():
+    stamp = datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    cursor = encode_cursor(stamp, "conv-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (stamp, "conv-1")
+
+
+def test_cursor_round_trip_naive_timestamp():
+    stamp = datetime(2024, 5, 1, 12, 30)
+    assert decode_cursor(encode_cursor(stamp, "m")) == (stamp, "m")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64 !",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'["a list"]').decode(),
+    base64.urlsafe_b64encode(b'{"id": "x"}').decode(),
+    base64.urlsafe_b64encode(b'{"t": "yesterday", "id": "x"}').decode(),
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "Invalid cursor"
+
+
+def test_keyset_filter_direction():
+    stamp = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    cursor = encode_cursor(stamp, "b")
+    assert keyset_filter("last_updated", cursor, descending=True) == {
+        "$or": [{"last_updated": {"$lt": stamp}}, {"last_updated": stamp, "id": {"$lt": "b"}}]
+    }
+    assert keyset_filter("timestamp", cursor, descending=False) == {
+        "$or": [{"timestamp": {"$gt": stamp}}, {"timestamp": stamp, "id": {"$gt": "b"}}]
+    }
@@ -0,0 +1,81 @@
+import json
+
+from backend.services.chat.replies import StreamedReply
+
+
+def _sse(*contents):
+    lines = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": c}}]}) + "\n\n"
+        for c in contents
+    ]
+    return "".join(lines).encode() + b"data: [DONE]\n\n"
+
+
+def _fed(data: bytes, chunk_size: int) -> StreamedReply:
+    reply = StreamedReply("conv-1", started=0.0)
+    for i in range(0, len(data), chunk_size):
+        reply.feed(data[i:i + chunk_size])
+    reply.finish()
+    return reply
+
+
+def test_think_and_answer_are_split():
+    reply = _fed(_sse("<think>", "pondering", "</think>", "<answer>", "Hello", " world", "</answer>"), 4096)
+    assert "".join(reply.thinking) == "pondering"
+    assert "".join(reply.answer) == "Hello world"
+    assert reply.to_message().text == "<think>pondering</think><answer>Hello world</answer>"
+
+
+def test_parsing_does_not_depend_on_chunking():
+    data = _sse("<thi", "nk>a<", "/think", "><ans", "wer>b < c</ans", "wer>")
+    expected = _fed(data, 4096)
+    assert "".join(expected.thinking) == "a"
+    assert "".join(expected.answer) == "b < c"
+    for size in (1, 2, 3, 7, 13):
+        reply = _fed(data, size)
+        assert (reply.thinking, "".join(reply.answer)) == (expected.thinking, "b < c")
+
+
+def test_text_outside_tags_is_answer():
+    reply = _fed(_sse("plain reply"), 4096)
+    assert reply.thinking == []
+    assert "".join(reply.answer) == "plain reply"
+
+
+def test_non_json_data_is_answer_text():
+    reply = _fed(b"data: Error: upstream unavailable\n\n", 4096)
+    assert "".join(reply.answer) == "Error: upstream unavailable"
+
+
+def test_crlf_lines_and_unterminated_last_line():
+    reply = StreamedReply("conv-1", started=0.0)
+    reply.feed(b'data: {"choices": [{"delta": {"content": "a"}}]}\r\n\r\n')
+    reply.feed(b'data: {"choices": [{"delta": {"content": "b"}}]}')
+    reply.finish()
+    assert "".join(reply.answer) == "ab"
+
+
+def test_unfinished_tag_is_kept_as_text():
+    reply = _fed(_sse("<answer>x <thi"), 4096)
+    assert "".join(reply.answer) == "x <thi"
+
+
+def test_partial_reply_is_marked():
+    reply = StreamedReply("conv-1", started=0.0)
+    assert not reply.has_content
+    reply.feed(_sse("<think>half a thought")[:-len(b"data: [DONE]\n\n")])
+    assert reply.has_content
+    reply.finish()
+    message = reply.to_message(partial=True)
+    assert message.partial is True
+    assert message.sender == "assistant"
+    assert message.conversation_id == "conv-1"
+    assert reply.to_message().partial is None
+
+
+def test_thinking_duration_is_measured_to_the_first_answer_token():
+    reply = StreamedReply("conv-1", started=0.0)
+    reply.add_text("<think>t</think>")
+    assert reply.thinking_duration is None
+    reply.add_text("<answer>a")
+    assert reply.thinking_duration is not None and reply.thinking_duration > 0
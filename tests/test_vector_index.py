@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from backend.config import config
+from backend.services.embeddings.vector_index import IndexPartition, VectorIndex, train_ivf
+
+DIM = 16
+NOW = time.time()
+
+
+def _unit(seed, n=1):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _add(part, document_id, seed, n=3, conversation_id="conv-1", expires_at=np.inf, replace=True):
+    vectors = _unit(seed, n)
+    part.add(document_id, conversation_id, list(range(n)), vectors, NOW - 60, expires_at, replace=replace)
+    return vectors
+
+
+def _search(part, query, conversation_id=None, top_k=10):
+    return part.search(query, top_k=top_k, threshold=-1.0, conversation_id=conversation_id, now=NOW)
+
+
+def test_add_search_remove():
+    part = IndexPartition("user@example.com")
+    a = _add(part, "doc-a", seed=1)
+    _add(part, "doc-b", seed=2)
+    assert len(part) == 6
+    best = _search(part, a[1], top_k=1)
+    assert best[0][:2] == ("doc-a", 1)
+
+    assert part.remove(["doc-a"]) == 3
+    assert len(part) == 3
+    assert {doc for doc, _, _ in _search(part, a[1])} == {"doc-b"}
+    assert part.remove(["missing"]) == 0
+
+
+def test_readding_a_document_replaces_its_rows():
+    part = IndexPartition("user@example.com")
+    _add(part, "doc-a", seed=1)
+    _add(part, "doc-a", seed=3, n=2)
+    assert part.document_rows() == {"doc-a": (2, "conv-1")}
+
+
+def test_set_conversation_scopes_search():
+    part = IndexPartition("user@example.com")
+    a = _add(part, "doc-a", seed=1)
+    _add(part, "doc-b", seed=2)
+    long_id = "c" * 50  # wider than the column's initial width
+    assert part.set_conversation("doc-a", long_id)
+    assert not part.set_conversation("doc-a", long_id)
+    assert {d for d, _, _ in _search(part, a[0], conversation_id=long_id)} == {"doc-a"}
+    assert {d for d, _, _ in _search(part, a[0], conversation_id="conv-1")} == {"doc-b"}
+    assert part.document_rows()["doc-a"] == (3, long_id)
+
+
+def test_buffers_grow_without_losing_rows():
+    part = IndexPartition("user@example.com")
+    batches = [_add(part, "doc-a", seed=i, n=300, replace=False) for i in range(10)]
+    assert len(part) == 3000
+    assert part._vectors.shape[0] >= 3000
+    np.testing.assert_allclose(part.vectors, np.vstack(batches), atol=1e-6)
+
+
+def test_expired_rows_are_excluded_and_pruned():
+    part = IndexPartition("user@example.com")
+    old = _add(part, "doc-old", seed=1, expires_at=NOW - 1)
+    _add(part, "doc-new", seed=2)
+    assert {d for d, _, _ in _search(part, old[0])} == {"doc-new"}
+    assert part.prune_expired(NOW) == 3
+    assert set(part.document_rows()) == {"doc-new"}
+
+
+def test_ivf_install_is_rejected_after_a_removal(monkeypatch):
+    monkeypatch.setattr(config, "vector_index_ivf_min_size", 100)
+    part = IndexPartition("user@example.com")
+    _add(part, "doc-a", seed=1, n=150)
+    _add(part, "doc-b", seed=2, n=150)
+    assert part.ivf_due()
+    generation, size = part.generation, len(part)
+    centroids, assignments = train_ivf(part.vectors)
+
+    part.remove(["doc-a"])
+    assert not part.install_ivf(centroids, assignments, size, generation)
+    assert part.centroids is None
+
+    generation, size = part.generation, len(part)
+    centroids, assignments = train_ivf(part.vectors)
+    # Rows appended while training get assigned on install
+    _add(part, "doc-c", seed=3, n=10, replace=False)
+    assert part.install_ivf(centroids, assignments, size, generation)
+    assert part.assignments.shape == (len(part),)
+    assert not part.ivf_due()
+
+
+def test_save_load_round_trip(tmp_path):
+    part = IndexPartition("user@example.com")
+    a = _add(part, "doc-a", seed=1)
+    _add(part, "doc-b", seed=2, conversation_id=None)
+    path = tmp_path / "part.npz"
+    part.save(path)
+    assert not part.dirty
+    assert list(tmp_path.iterdir()) == [path]
+
+    loaded = IndexPartition.load("user@example.com", path)
+    assert len(loaded) == len(part)
+    assert loaded.document_rows() == part.document_rows()
+    np.testing.assert_array_equal(loaded.vectors, part.vectors)
+    assert _search(loaded, a[2]) == _search(part, a[2])
+    # Appending after a load grows the loaded arrays
+    _add(loaded, "doc-c", seed=3, replace=False)
+    assert len(loaded) == 9
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "vector_index_flush_seconds", 0.05)
+    monkeypatch.setattr(config, "vector_index_reconcile_seconds", 3600)
+    index = VectorIndex(tmp_path)
+    part = IndexPartition("user@example.com")
+    # Loaded and reconciled already, so nothing reads Mongo
+    part.reconciled_at = time.monotonic()
+    index._partitions["user@example.com"] = part
+    return index
+
+
+async def _add_document(index, document_id, seed):
+    await index.add_document("user@example.com", document_id, "conv-1", [0, 1], _unit(seed, 2),
+                             None, None)
+
+
+@pytest.mark.asyncio
+async def test_changes_are_written_once_after_a_delay(index):
+    path = index._path("user@example.com")
+    await _add_document(index, "doc-a", 1)
+    await _add_document(index, "doc-b", 2)
+    await index.set_conversation("user@example.com", "doc-a", "conv-2")
+    assert not path.exists()
+    await asyncio.sleep(0.2)
+    assert index.flushes == 1
+    assert IndexPartition.load("user@example.com", path).document_rows() == {
+        "doc-a": (2, "conv-2"), "doc-b": (2, "conv-1"),
+    }
+    # Nothing changed: no timer, no write
+    await index.set_conversation("user@example.com", "doc-a", "conv-2")
+    await asyncio.sleep(0.1)
+    assert index.flushes == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_pending_changes(index, monkeypatch):
+    monkeypatch.setattr(config, "vector_index_flush_seconds", 60)
+    await _add_document(index, "doc-a", 1)
+    await index.remove_documents("user@example.com", ["doc-a"])
+    await _add_document(index, "doc-b", 2)
+    await index.flush()
+    assert index.flushes == 1
+    assert index.stats()["dirty_partitions"] == 0
+    loaded = IndexPartition.load("user@example.com", index._path("user@example.com"))
+    assert set(loaded.document_rows()) == {"doc-b"}
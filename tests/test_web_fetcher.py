@@ -0,0 +1,144 @@
+import http.server
+import threading
+
+import pytest
+
+from backend.config import config
+from backend.utils.web_search import fetcher as fetcher_module
+from backend.utils.web_search.fetcher import BlockedURL, WebPageFetcher, check_public_url
+
+ETAG = '"v1"'
+PAGE = b"<html><head><title>Stub page</title></head><body><nav>Home | About</nav><main>" \
+       + b"<p>" + b"The quick brown fox jumps over the lazy dog. " * 10 + b"</p>" \
+       + b"<p>" + b"Pack my box with five dozen liquor jugs. " * 10 + b"</p></main></body></html>"
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/redirect-to-metadata":
+            self.send_response(302)
+            self.send_header("Location", "http://169.254.169.254/latest/meta-data/")
+            self.end_headers()
+            return
+        if self.path == "/large":
+            body = b"x" * 100_000
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    # The stub listens on loopback, which the fetcher refuses by default
+    monkeypatch.setattr(config, "web_fetch_allow_private_hosts", True)
+    StubHandler.requests.clear()
+    return WebPageFetcher()
+
+
+@pytest.mark.asyncio
+async def test_etag_revalidation_round_trip(fetcher, stub_server, monkeypatch):
+    url = f"{stub_server}/page"
+    page = await fetcher.fetch(url)
+    assert page.title == "Stub page"
+    assert "quick brown fox" in page.text
+    assert "Home | About" not in page.text
+    assert page.etag == ETAG
+
+    # Fresh: served from memory without a request
+    assert await fetcher.fetch(url) == page
+    assert fetcher.cache_hits == 1
+    assert len(StubHandler.requests) == 1
+
+    # Stale: revalidated with If-None-Match, and the 304 keeps the cached text
+    monkeypatch.setattr(config, "web_fetch_revalidate_seconds", 0)
+    revalidated = await fetcher.fetch(url)
+    assert StubHandler.requests[-1] == ("/page", ETAG)
+    assert fetcher.not_modified == 1
+    assert revalidated.text == page.text
+    assert revalidated.fetched_at >= page.fetched_at
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_body_is_capped(fetcher, stub_server, monkeypatch):
+    monkeypatch.setattr(config, "web_fetch_max_bytes", 1000)
+    page = await fetcher.fetch(f"{stub_server}/large")
+    assert len(page.text) == 1000
+    assert fetcher.truncated == 1
+    assert fetcher.bytes_read == 1000
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_private_hosts_are_refused(fetcher, stub_server, monkeypatch):
+    monkeypatch.setattr(config, "web_fetch_allow_private_hosts", False)
+    assert await fetcher.fetch(f"{stub_server}/page") is None
+    assert fetcher.blocked == 1
+    assert StubHandler.requests == []
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_redirects_are_checked(fetcher, stub_server, monkeypatch):
+    async def loopback_is_public(url):
+        # Let the stub through, as if it were a public host, but nothing else
+        if not url.startswith(stub_server):
+            await check_public_url(url)
+
+    monkeypatch.setattr(config, "web_fetch_allow_private_hosts", False)
+    monkeypatch.setattr(fetcher_module, "check_public_url", loopback_is_public)
+    assert await fetcher.fetch(f"{stub_server}/redirect-to-metadata") is None
+    assert fetcher.blocked == 1
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", [
+    "ftp://example.com/file",
+    "http://127.0.0.1/",
+    "http://localhost/",
+    "http://10.1.2.3/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::ffff:127.0.0.1]/",
+    "http://[::1]/",
+])
+async def test_check_public_url_blocks(url, monkeypatch):
+    monkeypatch.setattr(config, "web_fetch_allow_private_hosts", False)
+    with pytest.raises(BlockedURL):
+        await check_public_url(url)
+
+
+@pytest.mark.asyncio
+async def test_check_public_url_allows_public_address(monkeypatch):
+    monkeypatch.setattr(config, "web_fetch_allow_private_hosts", False)
+    await check_public_url("https://93.184.216.34/")
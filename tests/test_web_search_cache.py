@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from backend.config import config
+from backend.utils.web_search.cache import SearchOutcome, WebSearchCache
+from backend.utils.web_search.models import SearchResult
+
+ENGINES = ["duckduckgo"]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(config, "web_search_cache_mongo", False)
+    return WebSearchCache()
+
+
+def _result(title):
+    return SearchResult(title=title, url=f"https://example.com/{title}", snippet=title, source="duckduckgo")
+
+
+class SlowSearch:
+    """A search that blocks until released, counting how often it ran."""
+
+    def __init__(self, title="a"):
+        self.title = title
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return SearchOutcome([_result(self.title)], True)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_searches_run_once(cache):
+    search = SlowSearch()
+    tasks = [asyncio.create_task(cache.get_or_search("k", ENGINES, search)) for _ in range(5)]
+    await asyncio.sleep(0)
+    search.release.set()
+    results = await asyncio.gather(*tasks)
+    assert search.calls == 1
+    assert all(r[0].title == "a" for r in results)
+    assert cache.coalesced == 4
+    # Served from memory afterwards
+    assert (await cache.get_or_search("k", ENGINES, search))[0].title == "a"
+    assert search.calls == 1
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_follower_leaves_the_search_running(cache):
+    search = SlowSearch()
+    leader = asyncio.create_task(cache.get_or_search("k", ENGINES, search))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_search("k", ENGINES, search))
+    await asyncio.sleep(0)
+    follower.cancel()
+    await asyncio.sleep(0)
+    search.release.set()
+    assert (await leader)[0].title == "a"
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_the_search_to_a_follower(cache):
+    first = SlowSearch("first")
+    second = SlowSearch("second")
+    leader = asyncio.create_task(cache.get_or_search("k", ENGINES, first))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_search("k", ENGINES, second))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    await asyncio.sleep(0)
+    # The follower was not cancelled: it searched again itself
+    assert not follower.done()
+    second.release.set()
+    assert (await follower)[0].title == "second"
+    assert second.calls == 1
+    assert cache.retried == 1
+    assert cache.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failure_is_shared_and_not_cached(cache):
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("engine down")
+
+    tasks = [asyncio.create_task(cache.get_or_search("k", ENGINES, failing)) for _ in range(3)]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        await cache.get_or_search("k", ENGINES, failing)
+    assert calls == 2
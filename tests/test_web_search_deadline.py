@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.config import config
+from backend.utils.web_search import main
+from backend.utils.web_search.models import SearchResult
+from backend.utils.web_search.registry import WebSearchEngineRegistry, web_search_registry
+
+
+def _results(engine, n=2):
+    return [SearchResult(title=f"{engine} {i}", url=f"https://{engine}.example/{i}", snippet="snippet", source=engine)
+            for i in range(n)]
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """Fake engines: each entry is (delay in seconds, results); a delay of None raises."""
+    table = {}
+
+    async def search(name, query, max_results, timeout=10):
+        delay, results = table[name]
+        if delay is None:
+            raise RuntimeError(f"{name} is down")
+        await asyncio.sleep(delay)
+        return results
+
+    monkeypatch.setattr(WebSearchEngineRegistry, "proxy_configured", property(lambda self: True))
+    monkeypatch.setattr(web_search_registry, "get", lambda name: object() if name in table else None)
+    monkeypatch.setattr(web_search_registry, "search", search)
+    monkeypatch.setattr(config, "web_search_deadline_seconds", 0.3)
+    return table
+
+
+@pytest.mark.asyncio
+async def test_all_engines_answer_in_time(engines):
+    engines["duckduckgo"] = (0, _results("duckduckgo"))
+    engines["brave"] = (0.01, _results("brave"))
+    outcome = await main._search_uncached("q", 5, ["duckduckgo", "brave"], None)
+    assert outcome.complete
+    assert len(outcome.results) == 4
+
+
+@pytest.mark.asyncio
+async def test_slow_engine_is_cut_off_at_the_deadline(engines):
+    engines["duckduckgo"] = (0, _results("duckduckgo"))
+    engines["brave"] = (5, _results("brave"))
+    started = time.monotonic()
+    outcome = await main._search_uncached("q", 5, ["duckduckgo", "brave"], None)
+    assert time.monotonic() - started < 1
+    assert not outcome.complete
+    assert {r.source for r in outcome.results} == {"duckduckgo"}
+
+
+@pytest.mark.asyncio
+async def test_deadline_covers_the_fallback(engines):
+    engines["sougou"] = (None, [])
+    engines["duckduckgo"] = (5, _results("duckduckgo"))
+    started = time.monotonic()
+    outcome = await main._search_uncached("q", 5, ["sougou"], None)
+    assert time.monotonic() - started < 1
+    assert outcome.results == []
+    assert not outcome.complete
+
+
+@pytest.mark.asyncio
+async def test_domain_filter_and_dedup(engines):
+    engines["duckduckgo"] = (0, _results("duckduckgo") + _results("brave"))
+    engines["brave"] = (0, _results("brave"))
+    outcome = await main._search_uncached("q", 5, ["duckduckgo", "brave"], "brave.example")
+    assert sorted(r.url for r in outcome.results) == ["https://brave.example/0", "https://brave.example/1"]